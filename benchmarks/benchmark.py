@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+#----------------------------------------------------------------------
+# benchmark.py from https://github.com/guyc/py-gaugette
+#
+# Reproducible micro-benchmarks for the rendering, SPI transfer and
+# input decoding hot paths.  All hardware is replaced by the
+# gaugette.simulator backends so this runs on any Linux box.
+#
+# Usage:
+#
+#     python3 benchmarks/benchmark.py                      # run everything
+#     python3 benchmarks/benchmark.py -k draw_text         # only matching names
+#     python3 benchmarks/benchmark.py -o run.json          # save results
+#     python3 benchmarks/benchmark.py -c base.json         # compare with a saved run
+#
+# Each case is timed over `number` calls, repeated `repeat` times, and the
+# best round is reported.  Cases that drive the simulated SPI bus also
+# report bytes and writebytes calls per operation.
+#----------------------------------------------------------------------
+
+import argparse
+import importlib
+import json
+import math
+import os
+import pkgutil
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import gaugette.animation
+import gaugette.fontgen
+import gaugette.framebuffer
+import gaugette.fonts
+import gaugette.gpiomem
+import gaugette.monochrome
+import gaugette.needles
+import gaugette.rotary_encoder
+import gaugette.sh1106
+import gaugette.simulator
+import gaugette.ssd1306
+import gaugette.ssd1351
+import gaugette.widgets
+
+TEXT = 'Gaugette 451\177F'
+
+cases = []
+
+
+#----------------------------------------------------------------------
+# A case is registered with a setup function returning the callable to
+# time.  The setup may also return (callable, metrics) where metrics has
+# reset() and is called with the best round time and call counts.
+#----------------------------------------------------------------------
+def case(name, number):
+    def register(setup):
+        cases.append((name, number, setup))
+        return setup
+    return register
+
+
+def font_names():
+    return sorted(name for _, name, _ in pkgutil.iter_modules(gaugette.fonts.__path__))
+
+
+def load_font(name):
+    return importlib.import_module('gaugette.fonts.' + name)
+
+
+def make_ssd1306(rows=32, buffer_cols=128):
+    gpio = gaugette.simulator.GPIO()
+    spi = gaugette.simulator.SPI()
+    led = gaugette.ssd1306.SSD1306(gpio, spi, reset_pin=15, dc_pin=16, rows=rows, cols=128,
+                                   buffer_cols=buffer_cols)
+    return led
+
+
+def make_ssd1351():
+    gpio = gaugette.simulator.GPIO()
+    spi = gaugette.simulator.SPI()
+    return gaugette.ssd1351.SSD1351(reset_pin=15, dc_pin=16, rows=128, cols=128, gpio=gpio, spi=spi)
+
+
+# Reports per-call SPI and GPIO traffic for the timed rounds.
+class BusMetrics:
+    def __init__(self, spi, gpio):
+        self.spi = spi
+        self.gpio = gpio
+
+    def reset(self):
+        self.spi.reset_counters()
+        self.gpio.reset_counters()
+
+    def __call__(self, best, calls, number):
+        bytes_per_call = self.spi.bytes_written / calls
+        return {
+            'bytes_per_call': bytes_per_call,
+            'writebytes_per_call': self.spi.writebytes_count / calls,
+            'gpio_writes_per_call': self.gpio.output_count / calls,
+            'bytes_per_sec': bytes_per_call * number / best if best > 0 else None,
+        }
+
+
+for font_name in font_names():
+    def draw_text_setup(font_name=font_name):
+        font = load_font(font_name)
+        bitmap = gaugette.ssd1306.SSD1306.Bitmap(256, 64)
+        return lambda: bitmap.draw_text(0, 0, TEXT, font)
+    case('bitmap.draw_text[%s]' % font_name, 5)(draw_text_setup)
+
+    def text_width_setup(font_name=font_name):
+        font = load_font(font_name)
+        bitmap = gaugette.ssd1306.SSD1306.Bitmap(256, 64)
+        return lambda: bitmap.text_width(TEXT, font)
+    case('bitmap.text_width[%s]' % font_name, 200)(text_width_setup)
+
+
+@case('bitmap.draw_text[stencil_33, compressed]', 5)
+def _():
+    font = gaugette.fontgen.compress(gaugette.fontgen.from_module(load_font('stencil_33')))
+    bitmap = gaugette.ssd1306.SSD1306.Bitmap(256, 64)
+    return lambda: bitmap.draw_text(0, 0, TEXT, font)
+
+
+# Decoding every glyph, as on the first draw.
+@case('bitmap.draw_text[stencil_33, compressed, uncached]', 5)
+def _():
+    font = gaugette.fontgen.compress(gaugette.fontgen.from_module(load_font('stencil_33')))
+    bitmap = gaugette.ssd1306.SSD1306.Bitmap(256, 64)
+
+    def draw():
+        gaugette.monochrome.font_glyphs.clear()
+        bitmap.draw_text(0, 0, TEXT, font)
+    return draw
+
+
+@case('ssd1306.draw_text', 20)
+def _():
+    led = make_ssd1306()
+    return lambda: led.draw_text(0, 0, TEXT)
+
+
+@case('ssd1306.draw_text[unaligned]', 20)
+def _():
+    led = make_ssd1306()
+    return lambda: led.draw_text(0, 3, TEXT)
+
+
+@case('ssd1306.draw_text2[size=2]', 5)
+def _():
+    led = make_ssd1306(rows=64)
+    return lambda: led.draw_text2(0, 0, TEXT, 2)
+
+
+@case('ssd1306.draw_text2[size=4]', 5)
+def _():
+    led = make_ssd1306(rows=64)
+    return lambda: led.draw_text2(0, 3, TEXT, 4)
+
+
+@case('ssd1306.draw_text_scaled[x1.5]', 5)
+def _():
+    led = make_ssd1306(rows=64)
+    font = load_font('arial_16')
+    return lambda: led.draw_text_scaled(0, 3, TEXT, font, 1.5)
+
+
+@case('ssd1351.draw_text2[size=2]', 5)
+def _():
+    led = make_ssd1351()
+    return lambda: led.draw_text2(0, 0, TEXT, 0x00FF00, 2)
+
+
+@case('ssd1351.draw_text_scaled[x1.5]', 5)
+def _():
+    led = make_ssd1351()
+    font = load_font('arial_16')
+    return lambda: led.draw_text_scaled(0, 3, TEXT, font, 1.5, 0x00FF00)
+
+
+@case('bitmap.clear[128x64]', 200)
+def _():
+    bitmap = gaugette.ssd1306.SSD1306.Bitmap(128, 64)
+    return bitmap.clear
+
+
+@case('bitmap.clear_block[256x32]', 5)
+def _():
+    bitmap = gaugette.ssd1306.SSD1306.Bitmap(256, 64)
+    return lambda: bitmap.clear_block(0, 32, 256, 32)
+
+
+@case('bitmap.invert_rect[250x29 unaligned]', 5)
+def _():
+    bitmap = gaugette.ssd1306.SSD1306.Bitmap(256, 64)
+    return lambda: bitmap.invert_rect(3, 5, 250, 29)
+
+
+@case('bitmap.blit[64x29 unaligned]', 50)
+def _():
+    src = gaugette.ssd1306.SSD1306.Bitmap(64, 32)
+    src.fill_rect(0, 0, 64, 32)
+    dst = gaugette.ssd1306.SSD1306.Bitmap(128, 64)
+    return lambda: dst.blit(src, 10, 13, 0, 1, 64, 29, gaugette.monochrome.XOR)
+
+
+@case('framebuffer.png_bytes[128x64]', 50)
+def _():
+    bitmap = gaugette.ssd1306.SSD1306.Bitmap(128, 64)
+    bitmap.draw_text(0, 20, TEXT, load_font('arial_24'))
+    return lambda: gaugette.framebuffer.png_bytes(bitmap)
+
+
+@case('framebuffer.unpack_rows[128x64]', 50)
+def _():
+    bitmap = gaugette.ssd1306.SSD1306.Bitmap(128, 64)
+    bitmap.draw_text(0, 20, TEXT, load_font('arial_24'))
+    rows = gaugette.framebuffer.packed_rows(bitmap)
+    return lambda: gaugette.framebuffer.unpack_rows(bitmap, rows, 128, 64)
+
+
+for dither in (gaugette.framebuffer.THRESHOLD, gaugette.framebuffer.BAYER,
+               gaugette.framebuffer.FLOYD_STEINBERG):
+    def from_gray_setup(dither=dither):
+        gray = bytes((x * 2 + y) & 0xFF for y in range(64) for x in range(128))
+        return lambda: gaugette.framebuffer.from_gray(gray, 128, 64, gaugette.ssd1306.SSD1306.Bitmap, dither)
+    case('framebuffer.from_gray[128x64 %s]' % dither, 5)(from_gray_setup)
+
+
+@case('sh1106.bitmap.clear_block[128x32]', 5)
+def _():
+    bitmap = gaugette.sh1106.SH1106.Bitmap(128, 64)
+    return lambda: bitmap.clear_block(0, 32, 128, 32)
+
+
+@case('ssd1306.display[128x32]', 200)
+def _():
+    led = make_ssd1306()
+    return lambda: led.display(), BusMetrics(led.spi, led.gpio)
+
+
+@case('ssd1306.display[instrumented]', 200)
+def _():
+    led = make_ssd1306()
+    led.enable_instrumentation()
+    return lambda: led.display(), BusMetrics(led.spi, led.gpio)
+
+
+# An immediate-mode app redrawing everything, with one readout changing.
+for driver in ('ssd1306', 'sh1106'):
+    def shadow_setup(driver=driver):
+        if driver == 'ssd1306':
+            led = make_ssd1306(rows=64)
+        else:
+            led = gaugette.sh1106.SH1106(gaugette.simulator.GPIO(), gaugette.simulator.SPI(),
+                                         reset_pin=15, dc_pin=16)
+        led.enable_shadow()
+        font = load_font('arial_16')
+        counter = iter(range(1000000000))
+
+        def run():
+            led.clear_display()
+            led.draw_text3(0, 0, TEXT, font)
+            led.draw_text3(0, 24, '%d rpm' % (next(counter) // 4), font)
+            led.display()
+        return run, BusMetrics(led.spi, led.gpio)
+    case('%s.display[shadow]' % driver, 50)(shadow_setup)
+
+
+@case('ssd1306.display_block[128x64]', 200)
+def _():
+    led = make_ssd1306(rows=64)
+    bitmap = led.Bitmap(128, 64)
+    return lambda: led.display_block(bitmap, 0, 0, 128), BusMetrics(led.spi, led.gpio)
+
+
+@case('ssd1306.ScrollingList[2000 items]', 20)
+def _():
+    led = make_ssd1306()
+    font = load_font('arial_16')
+    items = ['Track %d' % i for i in range(2000)]
+    return lambda: led.ScrollingList(led, items, font)
+
+
+@case('widgets.Scene.flush[bar+readout]', 50)
+def _():
+    led = make_ssd1306(rows=64)
+    font = load_font('arial_16')
+    scene = gaugette.widgets.Scene(led)
+    bar = scene.add(gaugette.widgets.Bar(64, 24, 64, 8, 0, 100))
+    readout = scene.add(gaugette.widgets.Readout(64, 0, 64, 16, font, '%d'))
+    scene.flush()
+    values = iter(range(10 ** 9))
+
+    def run():
+        value = next(values)
+        bar.set(value % 100)
+        readout.set(value % 100)
+        scene.flush()
+    return run, BusMetrics(led.spi, led.gpio)
+
+
+@case('needles.NeedleGauge.flush[64x64]', 50)
+def _():
+    led = make_ssd1306(rows=64)
+    scene = gaugette.widgets.Scene(led)
+    gauge = scene.add(gaugette.needles.NeedleGauge(0, 0, 64, 64, 0, 100, thickness=3))
+    scene.flush()
+    values = iter(range(10 ** 9))
+
+    def run():
+        gauge.set(next(values) % 100)
+        scene.flush()
+    return run, BusMetrics(led.spi, led.gpio)
+
+
+@case('animation.Player.show[128x64 bar]', 50)
+def _():
+    led = make_ssd1306(rows=64)
+    frames = []
+    for i in range(32):
+        frame = gaugette.ssd1306.SSD1306.Bitmap(128, 64)
+        frame.draw_text(0, 0, TEXT, load_font('arial_16'))
+        frame.fill_rect(0, 40, i * 4, 8)
+        frames.append(frame)
+    path = os.path.join(tempfile.mkdtemp(), 'bar.anim')
+    gaugette.animation.write(path, frames)
+    player = gaugette.animation.Player(led, path)
+
+    def run():
+        player.show(player.position)
+    return run, BusMetrics(led.spi, led.gpio)
+
+
+@case('ssd1351.SimpleBitmap.display', 5)
+def _():
+    led = make_ssd1351()
+    return lambda: led.bitmap.display(led), BusMetrics(led.spi, led.gpio)
+
+
+@case('ssd1351.display[shadow, second hand]', 50)
+def _():
+    led = make_ssd1351()
+    led.enable_shadow()
+    surface = gaugette.widgets.ColorSurface(led)
+    counter = iter(range(1000000000))
+
+    def run():
+        angle = next(counter) * math.pi / 30
+        led.bitmap.clear()
+        surface.draw_line(64, 64, int(64 + 55 * math.sin(angle)), int(64 - 55 * math.cos(angle)), 0xFF0000)
+        led.display()
+    return run, BusMetrics(led.spi, led.gpio)
+
+
+@case('ssd1351.encode_color', 10000)
+def _():
+    led = make_ssd1351()
+    return lambda: led.encode_color(0x12ABEF)
+
+
+@case('rotary_encoder.update', 10000)
+def _():
+    gpio = gaugette.simulator.GPIO()
+    encoder = gaugette.rotary_encoder.RotaryEncoder(gpio, 7, 9)
+    # quadrature sequence for clockwise rotation as (A, B)
+    states = [(0, 0), (1, 0), (1, 1), (0, 1)]
+    position = [0]
+
+    def step():
+        a, b = states[position[0]]
+        position[0] = (position[0] + 1) & 3
+        gpio.levels[7] = a
+        gpio.levels[9] = b
+        encoder.update()
+    return step
+
+
+def register_file():
+    path = os.path.join(tempfile.mkdtemp(), 'gpiomem')
+    gaugette.gpiomem.create_register_file(path)
+    return gaugette.gpiomem.FileGPIOMem(path)
+
+
+@case('gpiomem.input', 10000)
+def _():
+    gpio = register_file()
+    gpio.setup(7, gpio.IN)
+    return lambda: gpio.input(7)
+
+
+@case('gpiomem.output', 10000)
+def _():
+    gpio = register_file()
+    gpio.setup(16, gpio.OUT)
+    # GPIOMem.output skips the level mirroring done by the file stand-in
+    return lambda: gaugette.gpiomem.GPIOMem.output(gpio, 16, 1)
+
+
+for font_name in font_names():
+    def import_setup(font_name=font_name):
+        module = 'gaugette.fonts.' + font_name
+
+        def reimport():
+            sys.modules.pop(module, None)
+            importlib.import_module(module)
+        return reimport
+    case('font.import[%s]' % font_name, 3)(import_setup)
+
+
+def run_case(name, number, setup, repeat):
+    prepared = setup()
+    if isinstance(prepared, tuple):
+        func, metrics = prepared
+    else:
+        func, metrics = prepared, None
+    func()  # warm up caches before timing
+    if metrics is not None:
+        metrics.reset()
+    times = []
+    timer = time.perf_counter
+    for _ in range(repeat):
+        start = timer()
+        for _ in range(number):
+            func()
+        times.append(timer() - start)
+    best = min(times)
+    result = {
+        'name': name,
+        'number': number,
+        'repeat': repeat,
+        'best': best,
+        'per_call_us': best / number * 1e6,
+    }
+    if metrics is not None:
+        result.update(metrics(best, number * repeat, number))
+    return result
+
+
+def git_revision():
+    try:
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = dict((r['name'], r) for r in json.load(f)['results'])
+    print()
+    print('%-45s %12s %12s %8s' % ('case', 'base us', 'this us', 'ratio'))
+    for r in results:
+        if r['name'] in baseline:
+            base = baseline[r['name']]['per_call_us']
+            print('%-45s %12.2f %12.2f %7.2fx' % (r['name'], base, r['per_call_us'],
+                                                base / r['per_call_us']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gaugette hot path benchmarks')
+    parser.add_argument('-k', '--filter', default='', help='only run cases whose name contains this')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='rounds per case, best is kept')
+    parser.add_argument('-s', '--scale', type=float, default=1.0, help='multiply calls per round')
+    parser.add_argument('-o', '--output', help='write JSON results to this file')
+    parser.add_argument('-c', '--compare', help='compare against a saved JSON run')
+    args = parser.parse_args()
+
+    results = []
+    for name, number, setup in cases:
+        if args.filter not in name:
+            continue
+        number = max(1, int(number * args.scale))
+        result = run_case(name, number, setup, args.repeat)
+        results.append(result)
+        print('%-45s %12.2f us' % (name, result['per_call_us']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': results,
+            }, f, indent=2)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
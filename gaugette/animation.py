@@ -0,0 +1,189 @@
+#----------------------------------------------------------------------
+# animation.py from https://github.com/guyc/py-gaugette
+#
+# Plays pre-packed animations on the SSD1306 and SH1106, for boot
+# animations and small looping sequences.
+#
+# write() packs a sequence of monochrome bitmaps into a frame file ahead
+# of time.  Frames are stored in the displays' page format, page by page,
+# and each frame after the first is stored as just the spans of page
+# bytes that changed from the frame before, unless storing it whole is
+# smaller.  The Player maps the file with mmap, copies each frame's spans
+# into the display's bitmap and sends only the changed areas, so playing
+# costs little more than the bus traffic.
+#
+# File format, little-endian:
+#
+#     header        ANIM_HEADER
+#     index         FRAME_ENTRY per frame: offset, length, kind
+#     KEY frame     rows/8 pages of cols bytes
+#     DELTA frame   spans, each SPAN_HEADER (page, x, count) then count bytes
+#
+# Usage:
+#
+#     frames = [gaugette.framebuffer.load(path, led.Bitmap) for path in sorted(glob.glob('boot/*.pgm'))]
+#     gaugette.animation.write('boot.anim', frames, interval=1/30.0)
+#     ...
+#     player = gaugette.animation.Player(led, 'boot.anim')
+#     player.play()
+#----------------------------------------------------------------------
+
+import mmap
+import struct
+import time
+import gaugette.monochrome
+import gaugette.regions
+
+ANIM_MAGIC = b'GANI'
+ANIM_VERSION = 1
+ANIM_HEADER = '<4sHHHHI'      # magic, version, cols, rows, frame count, frame interval in us
+FRAME_ENTRY = '<IIH'          # offset, length, kind
+SPAN_HEADER = '<BHH'          # page, x, count
+
+KEY = 0
+DELTA = 1
+
+# The bytes of page of a monochrome bitmap.
+def page_bytes(bitmap, page):
+    return bytes(bitmap.data[bitmap.page_slice(page, 0, bitmap.cols)])
+
+# Packs frames, monochrome bitmaps of the same size with whole pages of
+# rows, into a frame file at path.  interval is the time between frames
+# in seconds.  With delta False every frame is stored whole.
+def write(path, frames, interval=1 / 30.0, delta=True):
+    frames = list(frames)
+    cols = frames[0].cols
+    rows = frames[0].rows
+    pages = rows >> 3
+    gap = struct.calcsize(SPAN_HEADER)
+    index = []
+    chunks = []
+    offset = struct.calcsize(ANIM_HEADER) + len(frames) * struct.calcsize(FRAME_ENTRY)
+    previous = None
+    for frame in frames:
+        if frame.cols != cols or frame.rows != rows:
+            raise ValueError("frames must all be %dx%d" % (cols, rows))
+        current = [page_bytes(frame, page) for page in range(pages)]
+        data = b''.join(current)
+        kind = KEY
+        if delta and previous is not None:
+            spans = []
+            for page in range(pages):
+                for (x0, x1) in gaugette.monochrome.changed_spans(previous[page], current[page], gap):
+                    spans.append(struct.pack(SPAN_HEADER, page, x0, x1 - x0) + current[page][x0:x1])
+            spans = b''.join(spans)
+            if len(spans) < len(data):
+                (kind, data) = (DELTA, spans)
+        index.append(struct.pack(FRAME_ENTRY, offset, len(data), kind))
+        chunks.append(data)
+        offset += len(data)
+        previous = current
+    header = struct.pack(ANIM_HEADER, ANIM_MAGIC, ANIM_VERSION, cols, rows, len(frames),
+                         int(round(interval * 1000000)))
+    with open(path, 'wb') as f:
+        f.write(header + b''.join(index) + b''.join(chunks))
+
+
+class Player:
+
+    # display: an SSD1306 or SH1106.  The animation is drawn into its
+    # bitmap with the top left at (x, y), y a multiple of 8, and the
+    # player assumes nothing else draws over that area while it plays.
+    # slack is as for gaugette.regions.merge.
+    def __init__(self, display, path, x=0, y=0, slack=128):
+        self.display = display
+        self.x = x
+        self.page = y >> 3
+        self.slack = slack
+        with open(path, 'rb') as f:
+            self.file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.cols, self.rows, self.frame_count, interval) = \
+            struct.unpack_from(ANIM_HEADER, self.file, 0)
+        if magic != ANIM_MAGIC or version != ANIM_VERSION:
+            self.file.close()
+            raise ValueError("%s is not a gaugette animation" % path)
+        self.interval = interval / 1000000.0
+        self.index_offset = struct.calcsize(ANIM_HEADER)
+        self.span_size = struct.calcsize(SPAN_HEADER)
+        self.position = 0
+        self.next_time = None
+
+    def close(self):
+        self.file.close()
+
+    def frame_entry(self, index):
+        return struct.unpack_from(FRAME_ENTRY, self.file, self.index_offset + index * struct.calcsize(FRAME_ENTRY))
+
+    # Copies frame index into the display's bitmap and returns the
+    # changed rectangles.  Delta frames must follow the frame before.
+    def apply(self, index):
+        (offset, length, kind) = self.frame_entry(index)
+        bitmap = self.display.bitmap
+        x = self.x
+        cols = min(self.cols, bitmap.cols - x)
+        frame = memoryview(self.file)[offset:offset + length]
+        rects = []
+        if kind == KEY:
+            # compare with what is shown, so a key frame sends only changes
+            for page in range(min(self.rows >> 3, (bitmap.rows >> 3) - self.page)):
+                span = bitmap.page_slice(self.page + page, x, x + cols)
+                new = bytes(frame[page * self.cols:page * self.cols + cols])
+                for (x0, x1) in gaugette.monochrome.changed_spans(bytes(bitmap.data[span]), new, self.span_size):
+                    bitmap.data[bitmap.page_slice(self.page + page, x + x0, x + x1)] = new[x0:x1]
+                    rects.append((x + x0, (self.page + page) << 3, x1 - x0, 8))
+        else:
+            pos = 0
+            while pos < length:
+                (page, x0, count) = struct.unpack_from(SPAN_HEADER, frame, pos)
+                pos += self.span_size
+                x1 = min(x0 + count, cols)
+                if x0 < x1 and self.page + page < bitmap.rows >> 3:
+                    bitmap.data[bitmap.page_slice(self.page + page, x + x0, x + x1)] = frame[pos:pos + x1 - x0]
+                    rects.append((x + x0, (self.page + page) << 3, x1 - x0, 8))
+                pos += count
+        frame.release()
+        return rects
+
+    # Shows frame index and sends the changed areas, as one
+    # instrumentation frame.  Jumping to any frame other than the next
+    # one replays from the nearest key frame before it, and sends the
+    # areas changed by every frame replayed.
+    def show(self, index):
+        rects = []
+        if index != self.position:
+            start = index
+            while start > 0 and self.frame_entry(start)[2] != KEY:
+                start -= 1
+            for i in range(start, index):
+                rects.extend(self.apply(i))
+        rects.extend(self.apply(index))
+        display = self.display
+        if display.instrumentation is not None:
+            display.instrumentation.begin_flush()
+        for rect in gaugette.regions.merge(rects, self.slack):
+            display.send_region(*rect)
+        if display.instrumentation is not None:
+            display.instrumentation.end_flush()
+        self.position = (index + 1) % self.frame_count
+
+    # Shows the next frame, waiting until it is due.  Returns False after
+    # the last frame, when the animation has wrapped to the first.
+    def step(self):
+        now = time.time()
+        if self.next_time is None:
+            self.next_time = now
+        elif self.next_time > now:
+            time.sleep(self.next_time - now)
+        # a late frame is not made up for by rushing the ones after
+        self.next_time = max(self.next_time + self.interval, time.time())
+        self.show(self.position)
+        return self.position != 0
+
+    # Plays the animation loops times, or forever if loops is None.
+    def play(self, loops=1):
+        self.next_time = None
+        while loops is None or loops > 0:
+            while self.step():
+                pass
+            if loops is not None:
+                loops -= 1
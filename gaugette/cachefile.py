@@ -0,0 +1,24 @@
+#----------------------------------------------------------------------
+# cachefile.py from https://github.com/guyc/py-gaugette
+#
+# Writes the on-disk caches (needle atlases, converted images).  A cache
+# is only an optimisation, so a failed write is ignored, and files are
+# written then renamed so a reader never sees half a file.
+#----------------------------------------------------------------------
+
+import os
+
+# Writes data to path, returning False if it could not be written.
+def write(path, data):
+    temp = path + '.tmp'
+    try:
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, path)
+    except (IOError, OSError):
+        try:
+            os.remove(temp)
+        except (IOError, OSError):
+            pass
+        return False
+    return True
@@ -0,0 +1,271 @@
+#----------------------------------------------------------------------
+# font.py from https://github.com/guyc/py-gaugette
+#
+# Glyph lookup for the proportional fonts used by draw_text3 and friends.
+#
+# Two font layouts are supported, both as modules (see gaugette.fonts)
+# or as objects with the same attributes:
+#
+# Dense fonts cover start_char to end_char without gaps and carry a full
+# kerning matrix, kerning[left][right], of the advance from one glyph to
+# the next.  All of the original gaugette fonts are dense.
+#
+# Sparse fonts list the characters they contain as a sorted tuple of
+# codepoints, found by binary search, so they can hold any selection of
+# Unicode characters (Latin-1, degree, micro...).  The advance between a
+# pair of glyphs is worked out from the glyph shapes, the closest the two
+# can be placed without their pixels touching on any row, and only pairs
+# that differ from that are stored in kerning_pairs[(left, right)].
+# A sparse font has these attributes:
+#
+#     name, char_height, space_width, gap_width
+#     codepoints   = (33, 34, ... 176, 181)
+#     descriptors  = ((width, offset), ...)     one per codepoint
+#     bitmaps      = (...)                      row bytes, as dense fonts
+#     kerning_pairs = {(left, right): advance, ...}
+#
+# Large glyphs are mostly blank, so a sparse font may be compressed: with
+# compressed = True each glyph is stored run-length encoded (see
+# encode_glyph) and the descriptor offset is that of the encoded data.
+# Glyphs are decoded when first drawn and cached, ready to blit, by
+# gaugette.monochrome.
+#
+# gaugette.fontgen builds sparse fonts from BDF and TrueType files and
+# from the existing dense fonts.  It can also write them as binary packs,
+# loaded with load_pack(), which take far less memory than a module
+# because nothing is held as Python integers:
+#
+#     header        PACK_HEADER, then the name in UTF-8
+#                   flags are PACK_COMPRESSED or 0
+#     codepoints    uint32 each
+#     descriptors   uint16 width, uint32 offset each
+#     bitmaps       bitmap_size bytes
+#     kerning pairs uint16 left, uint16 right, int16 advance each
+#
+# All values are little-endian.
+#----------------------------------------------------------------------
+
+import bisect
+import struct
+
+PACK_MAGIC = b'GFNT'
+PACK_VERSION = 2
+PACK_HEADER = '<4sHHHHHHIIH'  # magic, version, flags, char_height, space_width, gap_width,
+                              # glyph count, bitmap size, pair count, name length
+PACK_COMPRESSED = 1
+
+# A sparse font held in memory.
+class Font:
+
+    def __init__(self, name, char_height, space_width, gap_width, codepoints=(), descriptors=(),
+                 bitmaps=(), kerning_pairs=None, compressed=False):
+        self.name = name
+        self.char_height = char_height
+        self.space_width = space_width
+        self.gap_width = gap_width
+        self.codepoints = tuple(codepoints)
+        self.descriptors = tuple(descriptors)
+        self.bitmaps = bitmaps
+        self.kerning_pairs = {} if kerning_pairs is None else kerning_pairs
+        self.compressed = compressed
+
+# The glyph index of character c in font, or None if it has no glyph.
+def lookup(font, c):
+    codepoints = getattr(font, 'codepoints', None)
+    if codepoints is None:
+        if c < font.start_char or c > font.end_char:
+            return None
+        return ord(c) - ord(font.start_char)
+    code = ord(c)
+    i = bisect.bisect_left(codepoints, code)
+    if i < len(codepoints) and codepoints[i] == code:
+        return i
+    return None
+
+# The character of glyph index pos.
+def character(font, pos):
+    codepoints = getattr(font, 'codepoints', None)
+    if codepoints is None:
+        return chr(ord(font.start_char) + pos)
+    return chr(codepoints[pos])
+
+# The number of glyphs in font.
+def glyph_count(font):
+    return len(font.descriptors)
+
+# Advances worked out from glyph shapes, kept for the pairs drawn.
+ADVANCE_CACHE_SIZE = 4096
+advance_cache = {}
+
+# The distance from the left edge of glyph left to that of glyph right
+# when right follows left, not counting gap_width.
+def advance(font, left, right):
+    kerning = getattr(font, 'kerning', None)
+    if kerning is not None:
+        return kerning[left][right]
+    value = font.kerning_pairs.get((left, right))
+    if value is None:
+        key = (font, left, right)
+        value = advance_cache.get(key)
+        if value is None:
+            if len(advance_cache) >= ADVANCE_CACHE_SIZE:
+                advance_cache.clear()
+            value = advance_cache[key] = shape_advance(profiles(font), left, right)
+    return value
+
+# Compressed glyphs are a string of 4 bit counts, high nibble first.  A
+# count of 15 carries on into the next nibble, so 20 is 15, 5 and 15 is
+# 15, 0.  First come the rows: for each distinct row, how many times it
+# is repeated beyond the first, until char_height rows are covered.  Then
+# the pixels of the distinct rows, left to right and top to bottom, as
+# alternating runs of clear and lit pixels, starting with clear.
+
+def encode_counts(counts):
+    nibbles = []
+    for count in counts:
+        while count >= 15:
+            nibbles.append(15)
+            count -= 15
+        nibbles.append(count)
+    return nibbles
+
+# Compresses a glyph given as rows of width bit integers, the leftmost
+# pixel in the top bit.
+def encode_glyph(width, rows):
+    distinct = []
+    repeats = []
+    for row in rows:
+        if distinct and row == distinct[-1]:
+            repeats[-1] += 1
+        else:
+            distinct.append(row)
+            repeats.append(0)
+    runs = []
+    lit = False
+    run = 0
+    for row in distinct:
+        for bit in range(width - 1, -1, -1):
+            if bool(row >> bit & 1) == lit:
+                run += 1
+            else:
+                runs.append(run)
+                lit = not lit
+                run = 1
+    runs.append(run)
+    nibbles = encode_counts(repeats) + encode_counts(runs)
+    if len(nibbles) & 1:
+        nibbles.append(0)
+    return bytes((nibbles[i] << 4) | nibbles[i + 1] for i in range(0, len(nibbles), 2))
+
+# The row bytes of a compressed glyph starting at offset in data.
+def decode_glyph(data, offset, width, height):
+    state = [offset, 0]     # byte offset, nibble phase
+
+    def count():
+        total = 0
+        while True:
+            b = data[state[0]]
+            if state[1]:
+                nibble = b & 15
+                state[0] += 1
+            else:
+                nibble = b >> 4
+            state[1] ^= 1
+            total += nibble
+            if nibble < 15:
+                return total
+
+    repeats = []
+    rows = 0
+    while rows < height:
+        repeats.append(count() + 1)
+        rows += repeats[-1]
+    total = len(repeats) * width
+    bits = 0
+    filled = 0
+    lit = False
+    while filled < total:
+        run = min(count(), total - filled)
+        bits <<= run
+        if lit:
+            bits |= (1 << run) - 1
+        filled += run
+        lit = not lit
+    bytes_per_row = (width + 7) >> 3
+    pad = (bytes_per_row << 3) - width
+    mask = (1 << width) - 1
+    out = []
+    for (i, repeat) in enumerate(repeats):
+        row = ((bits >> ((len(repeats) - 1 - i) * width)) & mask) << pad
+        out.append(row.to_bytes(bytes_per_row, 'big') * repeat)
+    return b''.join(out)[:height * bytes_per_row]
+
+# The row bytes of glyph pos, char_height rows of (width+7)/8 bytes,
+# with the leftmost pixel in the top bit.
+def glyph_bytes(font, pos):
+    (width, offset) = font.descriptors[pos]
+    size = font.char_height * ((width + 7) >> 3)
+    if getattr(font, 'compressed', False):
+        return decode_glyph(font.bitmaps, offset, width, font.char_height)
+    return bytes(bytearray(font.bitmaps[offset:offset + size]))
+
+# For each row of glyph pos, (first, last) lit column or None if blank.
+def glyph_profile(font, pos):
+    (width, offset) = font.descriptors[pos]
+    bytes_per_row = (width + 7) >> 3
+    data = glyph_bytes(font, pos)
+    profile = []
+    for row in range(font.char_height):
+        start = row * bytes_per_row
+        bits = 0
+        for b in data[start:start + bytes_per_row]:
+            bits = (bits << 8) | b
+        if bits == 0:
+            profile.append(None)
+        else:
+            total = bytes_per_row << 3
+            first = total - bits.bit_length()
+            last = total - 1 - ((bits & -bits).bit_length() - 1)
+            profile.append((first, last))
+    return profile
+
+profile_cache = {}
+
+# The row profiles of every glyph of font, computed once.
+def profiles(font):
+    result = profile_cache.get(font)
+    if result is None:
+        result = profile_cache[font] = [glyph_profile(font, pos) for pos in range(glyph_count(font))]
+    return result
+
+# The smallest advance that keeps the lit pixels of two glyphs apart on
+# every row they share, 0 if they share none.
+def shape_advance(profiles, left, right):
+    value = 0
+    for (a, b) in zip(profiles[left], profiles[right]):
+        if a is not None and b is not None:
+            value = max(value, a[1] + 1 - b[0])
+    return value
+
+# Loads a font written by gaugette.fontgen.write_pack().
+def load_pack(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    (magic, version, flags, char_height, space_width, gap_width, count, bitmap_size, pair_count,
+     name_length) = struct.unpack_from(PACK_HEADER, data, 0)
+    if magic != PACK_MAGIC or version != PACK_VERSION:
+        raise ValueError("%s is not a gaugette font pack" % path)
+    pos = struct.calcsize(PACK_HEADER)
+    name = data[pos:pos + name_length].decode('utf-8')
+    pos += name_length
+    codepoints = struct.unpack_from('<%dI' % count, data, pos)
+    pos += 4 * count
+    fields = struct.unpack_from('<' + 'HI' * count, data, pos)
+    descriptors = list(zip(fields[0::2], fields[1::2]))
+    pos += 6 * count
+    bitmaps = data[pos:pos + bitmap_size]
+    pos += bitmap_size
+    fields = struct.unpack_from('<' + 'HHh' * pair_count, data, pos)
+    kerning_pairs = dict(((fields[i], fields[i + 1]), fields[i + 2]) for i in range(0, len(fields), 3))
+    return Font(name, char_height, space_width, gap_width, codepoints, descriptors, bitmaps, kerning_pairs,
+                bool(flags & PACK_COMPRESSED))
@@ -1,7 +1,9 @@
 class Font5x8:
     cols = 5
     rows = 8
-    bytes = [
+    # Column bytes, 5 per character, top row in bit 0: the same layout
+    # as a page of SSD1306/SH1106 display memory.
+    bytes = bytes([
         0x00, 0x00, 0x00, 0x00, 0x00,
         0x3E, 0x5B, 0x4F, 0x5B, 0x3E,
         0x3E, 0x6B, 0x4F, 0x6B, 0x3E,
@@ -257,4 +259,4 @@ class Font5x8:
         0x00, 0x19, 0x1D, 0x17, 0x12,
         0x00, 0x3C, 0x3C, 0x3C, 0x3C,
         0x00, 0x00, 0x00, 0x00, 0x00,
-        ]
+        ])
@@ -0,0 +1,469 @@
+#----------------------------------------------------------------------
+# fontgen.py from https://github.com/guyc/py-gaugette
+#
+# Builds sparse fonts (see gaugette.font) from BDF bitmap fonts, from
+# TrueType fonts (this needs Pillow) and from the existing gaugette
+# fonts, and writes them out as font modules.  This runs at build time,
+# not on the display.
+#
+# Glyphs are handled here as {codepoint: (width, rows)} where rows holds
+# char_height integers, bit width-1 being the leftmost pixel.  Glyphs are
+# cropped to their lit columns; spacing comes from the kerning rule in
+# gaugette.font.
+#
+# Usage:
+#
+#     import gaugette.fontgen
+#     from gaugette.fonts import arial_16
+#     symbols = gaugette.fontgen.from_bdf('ter-u16n.bdf', ranges=[(0xB0, 0xB0), (0xB5, 0xB5)])
+#     font = gaugette.fontgen.merge(gaugette.fontgen.from_module(arial_16), symbols)
+#     gaugette.fontgen.write_module(font, 'arial_16_latin.py', 'arial_16 + ter-u16n')
+#
+# ranges select codepoints: a list of (first, last) pairs, inclusive,
+# or a string of the characters wanted.  Fonts can also be written as
+# binary packs (see gaugette.font), and there is a command line, below.
+#----------------------------------------------------------------------
+
+import os
+import struct
+import sys
+import gaugette.font
+
+def in_ranges(code, ranges):
+    if ranges is None:
+        return True
+    if isinstance(ranges, str):
+        return chr(code) in ranges
+    for (first, last) in ranges:
+        if first <= code <= last:
+            return True
+    return False
+
+def range_codes(ranges):
+    if isinstance(ranges, str):
+        return sorted(set(ord(c) for c in ranges))
+    codes = set()
+    for (first, last) in ranges:
+        codes.update(range(first, last + 1))
+    return sorted(codes)
+
+# Crops rows of a width pixel glyph to its lit columns.  Returns
+# (width, rows), or None if no pixel is lit.
+def crop(width, rows):
+    ink = 0
+    for row in rows:
+        ink |= row
+    if ink == 0:
+        return None
+    right = (ink & -ink).bit_length() - 1   # lowest lit bit
+    left = ink.bit_length() - 1             # highest lit bit
+    return (left - right + 1, [row >> right for row in rows])
+
+#----------------------------------------------------------------------
+# Reading fonts
+#----------------------------------------------------------------------
+
+# The glyphs of any gaugette font, dense or sparse.
+def glyphs_of(font):
+    glyphs = {}
+    for pos in range(gaugette.font.glyph_count(font)):
+        (width, offset) = font.descriptors[pos]
+        data = gaugette.font.glyph_bytes(font, pos)
+        bytes_per_row = (width + 7) >> 3
+        pad = (bytes_per_row << 3) - width
+        rows = []
+        for row in range(font.char_height):
+            start = row * bytes_per_row
+            rows.append(int.from_bytes(data[start:start + bytes_per_row], 'big') >> pad)
+        glyphs[ord(gaugette.font.character(font, pos))] = (width, rows)
+    return glyphs
+
+# The pair advances of any gaugette font as {(left_code, right_code): advance}.
+# For dense fonts this is every pair of the kerning matrix.
+def pairs_of(font):
+    pairs = {}
+    count = gaugette.font.glyph_count(font)
+    codes = [ord(gaugette.font.character(font, pos)) for pos in range(count)]
+    if hasattr(font, 'kerning'):
+        for left in range(count):
+            for right in range(count):
+                pairs[(codes[left], codes[right])] = font.kerning[left][right]
+    else:
+        for ((left, right), value) in font.kerning_pairs.items():
+            pairs[(codes[left], codes[right])] = value
+    return pairs
+
+# A sparse copy of a gaugette font, optionally only the characters in
+# ranges.  Only kerning pairs that differ from the shape rule are kept.
+def from_module(font, ranges=None, name=None):
+    glyphs = dict((code, glyph) for (code, glyph) in glyphs_of(font).items() if in_ranges(code, ranges))
+    return build(name or font.name, font.char_height, font.space_width, font.gap_width, glyphs,
+                 pairs_of(font))
+
+# Parses a BDF file.  Returns (properties, glyphs) where glyphs is
+# {codepoint: (dwidth, (w, h, xoff, yoff), rows)}, rows being the BITMAP
+# lines as w bit integers.
+def read_bdf(path):
+    properties = {}
+    glyphs = {}
+    with open(path, 'r') as f:
+        lines = iter(f.read().splitlines())
+    for line in lines:
+        words = line.split()
+        if not words:
+            continue
+        keyword = words[0]
+        if keyword == 'STARTPROPERTIES':
+            for line in lines:
+                if line.startswith('ENDPROPERTIES'):
+                    break
+                (key, _, value) = line.partition(' ')
+                value = value.strip()
+                properties[key] = value[1:-1] if value.startswith('"') else value
+        elif keyword == 'FONTBOUNDINGBOX':
+            properties['FONTBOUNDINGBOX'] = tuple(int(v) for v in words[1:5])
+        elif keyword == 'STARTCHAR':
+            code = -1
+            dwidth = 0
+            bbx = (0, 0, 0, 0)
+            rows = []
+            for line in lines:
+                words = line.split()
+                if not words:
+                    continue
+                keyword = words[0]
+                if keyword == 'ENCODING':
+                    code = int(words[1])
+                elif keyword == 'DWIDTH':
+                    dwidth = int(words[1])
+                elif keyword == 'BBX':
+                    bbx = tuple(int(v) for v in words[1:5])
+                elif keyword == 'BITMAP':
+                    for line in lines:
+                        line = line.strip()
+                        if line == 'ENDCHAR':
+                            break
+                        # rows are padded to whole bytes on the right
+                        rows.append(int(line, 16) >> max(len(line) * 4 - bbx[0], 0))
+                    break
+                elif keyword == 'ENDCHAR':
+                    break
+            if code >= 0:
+                glyphs[code] = (dwidth, bbx, rows)
+    return (properties, glyphs)
+
+# A sparse font from a BDF bitmap font.  With kerning='outline' pairs
+# are spaced by the glyph advances (DWIDTH) of the BDF font, as for
+# from_ttf.
+def from_bdf(path, ranges=None, name=None, gap_width=1, kerning='shape'):
+    (properties, bdf_glyphs) = read_bdf(path)
+    (fw, fh, fx, fy) = properties.get('FONTBOUNDINGBOX', (0, 0, 0, 0))
+    ascent = int(properties.get('FONT_ASCENT', fh + fy))
+    descent = int(properties.get('FONT_DESCENT', -fy))
+    char_height = ascent + descent
+    glyphs = {}
+    ink_left = {}
+    for (code, (dwidth, (w, h, xoff, yoff), bitmap)) in bdf_glyphs.items():
+        if not in_ranges(code, ranges):
+            continue
+        rows = [0] * char_height
+        top = ascent - (yoff + h)
+        for (i, bits) in enumerate(bitmap):
+            if 0 <= top + i < char_height:
+                rows[top + i] = bits
+        glyph = crop(w, rows)
+        if glyph is not None:
+            glyphs[code] = glyph
+            ink = 0
+            for row in rows:
+                ink |= row
+            ink_left[code] = xoff + w - ink.bit_length()
+    if 32 in bdf_glyphs:
+        space_width = bdf_glyphs[32][0]
+    else:
+        space_width = max(char_height // 4, 1)
+    if name is None:
+        name = '%s %d' % (properties.get('FAMILY_NAME', os.path.basename(path)), char_height)
+    pairs = None
+    if kerning == 'outline':
+        pairs = {}
+        for left in glyphs:
+            for right in glyphs:
+                distance = bdf_glyphs[left][0] + ink_left[right] - ink_left[left]
+                pairs[(left, right)] = max(distance - gap_width, 0)
+    return build(name, char_height, space_width, gap_width, glyphs, pairs)
+
+# A sparse font rasterised from a TrueType (or OpenType) font at size
+# pixels.  Needs Pillow.  With kerning='outline' each pair is spaced as
+# the font itself places it, kerning table included, rather than by the
+# shape rule; the pairs that differ are stored, so the font is larger.
+def from_ttf(path, size, ranges=None, name=None, gap_width=1, kerning='shape'):
+    try:
+        from PIL import Image, ImageDraw, ImageFont
+    except ImportError:
+        raise ImportError("TrueType fonts need Pillow (pip install Pillow)")
+    ttf = ImageFont.truetype(path, size)
+    (ascent, descent) = ttf.getmetrics()
+    char_height = ascent + descent
+    if ranges is None:
+        ranges = [(0x21, 0x7E)]
+    glyphs = {}
+    ink_left = {}       # first lit column, relative to the pen position
+    for code in range_codes(ranges):
+        c = chr(code)
+        (left, top, right, bottom) = ttf.getbbox(c)
+        shift = -min(left, 0)
+        width = right + shift
+        if width <= 0:
+            continue
+        image = Image.new('1', (width, char_height), 0)
+        ImageDraw.Draw(image).text((shift, 0), c, font=ttf, fill=1)
+        pixels = image.load()
+        rows = []
+        for y in range(char_height):
+            bits = 0
+            for x in range(width):
+                bits = (bits << 1) | (1 if pixels[x, y] else 0)
+            rows.append(bits)
+        glyph = crop(width, rows)
+        if glyph is not None:
+            glyphs[code] = glyph
+            ink = 0
+            for row in rows:
+                ink |= row
+            ink_left[code] = width - ink.bit_length() - shift
+    space_width = int(round(ttf.getlength(' ')))
+    if name is None:
+        name = '%s %d' % (ttf.getname()[0], char_height)
+    pairs = None
+    if kerning == 'outline':
+        pairs = {}
+        for left in glyphs:
+            for right in glyphs:
+                pair = chr(left) + chr(right)
+                pen = ttf.getlength(pair) - ttf.getlength(chr(right))
+                distance = int(round(pen)) + ink_left[right] - ink_left[left]
+                pairs[(left, right)] = max(distance - gap_width, 0)
+    return build(name, char_height, space_width, gap_width, glyphs, pairs)
+
+#----------------------------------------------------------------------
+# Building fonts
+#----------------------------------------------------------------------
+
+# A sparse font from {codepoint: (width, rows)}.  pairs, as returned by
+# pairs_of, are kept where they differ from the shape rule.  Glyphs are
+# run-length encoded if compressed is set.
+def build(name, char_height, space_width, gap_width, glyphs, pairs=None, compressed=False):
+    codepoints = sorted(glyphs)
+    descriptors = []
+    bitmaps = bytearray()
+    for code in codepoints:
+        (width, rows) = glyphs[code]
+        bytes_per_row = (width + 7) >> 3
+        pad = (bytes_per_row << 3) - width
+        descriptors.append((width, len(bitmaps)))
+        rows = (list(rows) + [0] * char_height)[:char_height]
+        if compressed:
+            bitmaps.extend(gaugette.font.encode_glyph(width, rows))
+        else:
+            for row in rows:
+                bitmaps.extend((row << pad).to_bytes(bytes_per_row, 'big'))
+    font = gaugette.font.Font(name, char_height, space_width, gap_width, codepoints, descriptors,
+                              bytes(bitmaps), compressed=compressed)
+    if pairs:
+        index = dict((code, pos) for (pos, code) in enumerate(codepoints))
+        shapes = gaugette.font.profiles(font)
+        for ((left, right), value) in pairs.items():
+            if left in index and right in index:
+                (l, r) = (index[left], index[right])
+                if value != gaugette.font.shape_advance(shapes, l, r):
+                    font.kerning_pairs[(l, r)] = value
+    return font
+
+# A copy of font with its glyphs compressed.
+def compress(font):
+    return build(font.name, font.char_height, font.space_width, font.gap_width, glyphs_of(font),
+                 pairs_of(font), compressed=True)
+
+# Combines fonts.  Where several have a glyph for a character, the first
+# wins.  Glyphs are aligned at the top; the first font sets the metrics.
+def merge(*fonts):
+    first = fonts[0]
+    glyphs = {}
+    pairs = {}
+    char_height = max(font.char_height for font in fonts)
+    for font in reversed(fonts):
+        glyphs.update(glyphs_of(font))
+        pairs.update(pairs_of(font))
+    return build(first.name, char_height, first.space_width, first.gap_width, glyphs, pairs)
+
+#----------------------------------------------------------------------
+# Writing font modules
+#----------------------------------------------------------------------
+
+def glyph_comment(code):
+    c = chr(code)
+    return c if c.isprintable() else 'U+%04X' % code
+
+# The characters used in the string literals of Python source files,
+# as a string for ranges.  Handy for subsetting a font to an app.
+def chars_in_files(paths):
+    import ast
+    chars = set()
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                chars.update(node.value)
+    return ''.join(sorted(chars))
+
+# Writes font as a binary pack for gaugette.font.load_pack().
+def write_pack(font, path):
+    count = gaugette.font.glyph_count(font)
+    name = font.name.encode('utf-8')
+    bitmaps = bytes(bytearray(font.bitmaps))
+    pairs = sorted(font.kerning_pairs.items())
+    flags = gaugette.font.PACK_COMPRESSED if getattr(font, 'compressed', False) else 0
+    chunks = [struct.pack(gaugette.font.PACK_HEADER, gaugette.font.PACK_MAGIC, gaugette.font.PACK_VERSION,
+                          flags, font.char_height, font.space_width, font.gap_width, count, len(bitmaps),
+                          len(pairs), len(name)),
+              name,
+              struct.pack('<%dI' % count, *[ord(gaugette.font.character(font, pos)) for pos in range(count)])]
+    for (width, offset) in font.descriptors:
+        chunks.append(struct.pack('<HI', width, offset))
+    chunks.append(bitmaps)
+    for ((left, right), value) in pairs:
+        chunks.append(struct.pack('<HHh', left, right, value))
+    with open(path, 'wb') as f:
+        f.write(b''.join(chunks))
+
+# Writes font as a sparse font module in the style of gaugette.fonts.
+def write_module(font, path, source=None):
+    module = os.path.splitext(os.path.basename(path))[0]
+    count = gaugette.font.glyph_count(font)
+    lines = ['# coding=utf-8',
+             '# Module %s' % module,
+             '# generated by gaugette.fontgen' + (' from %s' % source if source else ''),
+             '',
+             'name          = %r' % font.name,
+             'char_height   = %d' % font.char_height,
+             'space_width   = %d' % font.space_width,
+             'gap_width     = %d' % font.gap_width]
+    compressed = getattr(font, 'compressed', False)
+    if compressed:
+        lines.append('compressed    = True')
+    lines += ['', 'codepoints = (']
+    for start in range(0, count, 16):
+        codes = [ord(gaugette.font.character(font, pos)) for pos in range(start, min(start + 16, count))]
+        lines.append('    ' + ''.join('%d, ' % code for code in codes).rstrip())
+    lines += [')', '', 'bitmaps = (']
+    for pos in range(count):
+        (width, offset) = font.descriptors[pos]
+        code = ord(gaugette.font.character(font, pos))
+        bytes_per_row = (width + 7) >> 3
+        lines.append("    # @%d '%s' (%d pixels wide)" % (offset, glyph_comment(code), width))
+        if compressed:
+            # the glyph's run-length encoded data, 16 bytes to a line
+            end = font.descriptors[pos + 1][1] if pos + 1 < count else len(font.bitmaps)
+            for start in range(offset, end, 16):
+                lines.append('    ' + ''.join('0x%02X, ' % b for b in font.bitmaps[start:min(start + 16, end)]).rstrip())
+            lines.append('')
+            continue
+        for row in range(font.char_height):
+            start = offset + row * bytes_per_row
+            row_bytes = font.bitmaps[start:start + bytes_per_row]
+            art = ''
+            for b in row_bytes:
+                art += ''.join('O' if b & (0x80 >> bit) else ' ' for bit in range(8))
+            lines.append('    %s #%s' % (''.join('0x%02X, ' % b for b in row_bytes).rstrip(), art[:width].rstrip()))
+        lines.append('')
+    lines += [')', '', 'descriptors = (']
+    for pos in range(count):
+        (width, offset) = font.descriptors[pos]
+        lines.append('    (%d,%d),# %s' % (width, offset, glyph_comment(ord(gaugette.font.character(font, pos)))))
+    lines += [')', '', 'kerning_pairs = {']
+    for ((left, right), value) in sorted(font.kerning_pairs.items()):
+        lines.append('    (%d, %d): %d,' % (left, right, value))
+    lines += ['}', '', '# End of font', '']
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+
+#----------------------------------------------------------------------
+# Command line
+#
+#     python -m gaugette.fontgen SOURCE... -o OUTPUT [options]
+#
+# SOURCE is a .bdf, .ttf or .otf file, a font module file or a module
+# name such as gaugette.fonts.arial_16; several are merged, the first
+# taking precedence.  OUTPUT ending in .py is written as a font module,
+# anything else as a binary pack.  For example, to build just the
+# characters an app draws:
+#
+#     python -m gaugette.fontgen DejaVuSans.ttf --size 16 --chars-from app.py -o app_16.gfn
+#----------------------------------------------------------------------
+
+def parse_range(text):
+    (first, _, last) = text.partition('-')
+    first = int(first, 0)
+    return (first, int(last, 0) if last else first)
+
+def load_source(source, size, ranges, gap_width, kerning):
+    extension = os.path.splitext(source)[1].lower()
+    if extension == '.bdf':
+        return from_bdf(source, ranges, gap_width=gap_width, kerning=kerning)
+    if extension in ('.ttf', '.otf'):
+        if size is None:
+            raise ValueError("--size is needed for %s" % source)
+        return from_ttf(source, size, ranges, gap_width=gap_width, kerning=kerning)
+    if extension == '.py':
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(os.path.basename(source)[:-3], source)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        import importlib
+        module = importlib.import_module(source)
+    return from_module(module, ranges)
+
+def main(args=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m gaugette.fontgen',
+                                     description='Compile BDF, TrueType and gaugette fonts into gaugette '
+                                                 'font modules or binary packs.')
+    parser.add_argument('sources', nargs='+', metavar='SOURCE')
+    parser.add_argument('-o', '--output', required=True, help='.py for a font module, otherwise a pack')
+    parser.add_argument('--size', type=int, help='pixel size for TrueType fonts')
+    parser.add_argument('--chars', default='', help='only these characters')
+    parser.add_argument('--chars-from', nargs='+', default=[], metavar='FILE',
+                        help='only the characters in the string literals of these Python files')
+    parser.add_argument('--range', action='append', default=[], type=parse_range, metavar='FIRST-LAST',
+                        help='only these codepoints, e.g. 0x20-0x7E (may be repeated)')
+    parser.add_argument('--name', help='font name')
+    parser.add_argument('--gap', type=int, default=1, help='pixels between glyphs (default 1)')
+    parser.add_argument('--kerning', choices=('shape', 'outline'), default='shape',
+                        help='space pairs by glyph shape (compact) or by the source font (default shape)')
+    parser.add_argument('--compress', action='store_true', help='store glyphs run-length encoded')
+    options = parser.parse_args(args)
+
+    ranges = None
+    chars = options.chars + chars_in_files(options.chars_from)
+    if chars or options.range:
+        ranges = [(ord(c), ord(c)) for c in set(chars)] + options.range
+    fonts = [load_source(source, options.size, ranges, options.gap, options.kerning)
+             for source in options.sources]
+    font = merge(*fonts) if len(fonts) > 1 else fonts[0]
+    if options.name:
+        font.name = options.name
+    if options.compress:
+        font = compress(font)
+    if options.output.endswith('.py'):
+        write_module(font, options.output, ', '.join(options.sources))
+    else:
+        write_pack(font, options.output)
+    sys.stdout.write('%s: %d glyphs, %d bitmap bytes, %d kerning pairs\n' %
+                     (options.output, gaugette.font.glyph_count(font), len(font.bitmaps),
+                      len(font.kerning_pairs)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+#----------------------------------------------------------------------
+# framebuffer.py from https://github.com/guyc/py-gaugette
+#
+# Exports display bitmaps as images and imports images into them, for
+# rendering screens off the device, comparing them in tests and baking
+# splash screens ahead of time.
+#
+# Monochrome bitmaps (SSD1306.Bitmap, SH1106.Bitmap and Sprites) are
+# converted a page at a time with bytes.translate tables rather than
+# pixel by pixel: each of the 8 rows of a page is one translate of the
+# page's bytes, and packing to one bit per pixel takes 8 strided
+# translates per row.  SSD1351 bitmaps, whose pixels are 565 colours,
+# are converted with a lookup table.
+#
+# PBM, PGM, PPM, PNG and raw files need only the standard library, as
+# does importing greyscale pixels or PGM and PBM files; other image files
+# and to_image need Pillow.
+#
+# Usage:
+#
+#     gaugette.framebuffer.save(led.bitmap, 'screen.png')
+#     splash = gaugette.framebuffer.load('logo.png', led.Bitmap, cache_dir='/var/cache/gaugette')
+#     led.blit(splash, 0, 0, op=gaugette.monochrome.COPY)
+#----------------------------------------------------------------------
+
+import hashlib
+import io
+import os
+import struct
+import zlib
+import gaugette.cachefile
+
+# gray_tables[k] maps a page byte to 0xFF if row k is lit, else 0.
+gray_tables = [bytes(0xFF if b >> k & 1 else 0 for b in range(256)) for k in range(8)]
+
+# pack_tables[k][j] maps a page byte to bit 7-j set if row k is lit, so
+# that ORing the translated bytes of columns j, j+8, ... for j = 0 to 7
+# gives row k packed eight pixels to the byte, leftmost in the top bit.
+pack_tables = [[bytes((b >> k & 1) << (7 - j) for b in range(256)) for j in range(8)] for k in range(8)]
+
+# unpack_tables[j][k] maps a packed row byte to bit k set if pixel j of
+# the byte is lit, the reverse of pack_tables.
+unpack_tables = [[bytes((b >> (7 - j) & 1) << k for b in range(256)) for k in range(8)] for j in range(8)]
+
+def is_monochrome(bitmap):
+    return hasattr(bitmap, 'page_slice')
+
+# The bytes of each page of a monochrome bitmap, padded with blank
+# columns to a whole number of bytes across.
+def padded_pages(bitmap):
+    padding = bytes(-bitmap.cols % 8)
+    return [bytes(bitmap.data[bitmap.page_slice(page, 0, bitmap.cols)]) + padding
+            for page in range(bitmap.rows >> 3)]
+
+# The pixels of a monochrome bitmap, one byte per pixel, 0xFF where lit
+# and 0 where not, row by row.
+def gray_bytes(bitmap):
+    rows = []
+    for page in range(bitmap.rows >> 3):
+        data = bytes(bitmap.data[bitmap.page_slice(page, 0, bitmap.cols)])
+        for k in range(8):
+            rows.append(data.translate(gray_tables[k]))
+    return b''.join(rows)
+
+# The pixels of a monochrome bitmap eight to the byte, leftmost in the
+# top bit, 1 where lit, each row padded to a whole byte.  This is the
+# layout of PIL's '1' mode and of PNG 1 bit greyscale.
+def packed_rows(bitmap):
+    rows = []
+    for data in padded_pages(bitmap):
+        count = len(data) >> 3
+        for k in range(8):
+            row = 0
+            for j in range(8):
+                row |= int.from_bytes(data[j::8].translate(pack_tables[k][j]), 'big')
+            rows.append(row.to_bytes(count, 'big'))
+    return b''.join(rows)
+
+# Fills monochrome bitmap from rows packed as packed_rows() returns
+# them, for as many rows and columns as both have.
+def unpack_rows(bitmap, data, cols, rows):
+    stride = (cols + 7) >> 3
+    width = min(cols, bitmap.cols)
+    for page in range(min(rows, bitmap.rows) >> 3):
+        out = bytearray(stride << 3)
+        for j in range(8):
+            column = 0
+            for k in range(8):
+                start = ((page << 3) + k) * stride
+                column |= int.from_bytes(data[start:start + stride].translate(unpack_tables[j][k]), 'big')
+            out[j::8] = column.to_bytes(stride, 'big')
+        bitmap.data[bitmap.page_slice(page, 0, width)] = out[:width]
+    return bitmap
+
+rgb_table = None
+
+# The RGB bytes of each 565 colour.
+def rgb_lookup():
+    global rgb_table
+    if rgb_table is None:
+        rgb_table = [bytes(((c >> 11) * 255 // 31, (c >> 5 & 0x3F) * 255 // 63, (c & 0x1F) * 255 // 31))
+                     for c in range(0x10000)]
+    return rgb_table
+
+# The pixels of an SSD1351 bitmap as RGB bytes, row by row.
+def rgb_bytes(bitmap):
+    table = rgb_lookup()
+    return b''.join(b''.join(map(table.__getitem__, row)) for row in bitmap.data)
+
+# The bitmap's buffer as it is sent to the display: page bytes for the
+# monochrome bitmaps, 565 colours high byte first for the SSD1351.
+def raw_bytes(bitmap):
+    if is_monochrome(bitmap):
+        return bytes(bitmap.data)
+    return b''.join(struct.pack('>%dH' % len(row), *row) for row in bitmap.data)
+
+#----------------------------------------------------------------------
+# File formats
+#----------------------------------------------------------------------
+
+# Binary PBM.  PBM marks black pixels, so lit pixels are written as 0 to
+# look as they do on the panel.
+def pbm_bytes(bitmap):
+    header = ('P4\n%d %d\n' % (bitmap.cols, bitmap.rows)).encode('ascii')
+    return header + packed_rows(bitmap).translate(bytes(255 - b for b in range(256)))
+
+# Binary PGM for monochrome bitmaps, PPM for the SSD1351.
+def pnm_bytes(bitmap):
+    if is_monochrome(bitmap):
+        return ('P5\n%d %d\n255\n' % (bitmap.cols, bitmap.rows)).encode('ascii') + gray_bytes(bitmap)
+    return ('P6\n%d %d\n255\n' % (bitmap.cols, bitmap.rows)).encode('ascii') + rgb_bytes(bitmap)
+
+def png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data +
+            struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+# PNG, 1 bit greyscale for monochrome bitmaps and 8 bit RGB for the
+# SSD1351.
+def png_bytes(bitmap):
+    if is_monochrome(bitmap):
+        (depth, colour, data) = (1, 0, packed_rows(bitmap))
+    else:
+        (depth, colour, data) = (8, 2, rgb_bytes(bitmap))
+    stride = len(data) // bitmap.rows
+    # each row starts with filter type 0, none
+    lines = b''.join(b'\0' + data[i:i + stride] for i in range(0, len(data), stride))
+    header = struct.pack('>IIBBBBB', bitmap.cols, bitmap.rows, depth, colour, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header) +
+            png_chunk(b'IDAT', zlib.compress(lines, 9)) + png_chunk(b'IEND', b''))
+
+# Writes bitmap to path in the format given by its extension: .png,
+# .pbm, .pgm, .ppm or .raw (see raw_bytes).
+def save(bitmap, path):
+    extension = path.rsplit('.', 1)[-1].lower()
+    if extension == 'png':
+        data = png_bytes(bitmap)
+    elif extension == 'pbm':
+        data = pbm_bytes(bitmap)
+    elif extension in ('pgm', 'ppm'):
+        data = pnm_bytes(bitmap)
+    elif extension == 'raw':
+        data = raw_bytes(bitmap)
+    else:
+        raise ValueError("unknown image format: %s" % path)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+#----------------------------------------------------------------------
+# Pillow
+#----------------------------------------------------------------------
+
+def pil_image():
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("images need Pillow (pip install Pillow)")
+    return Image
+
+# A PIL image of bitmap, mode '1' for monochrome bitmaps and 'RGB' for
+# the SSD1351.
+def to_image(bitmap):
+    Image = pil_image()
+    if is_monochrome(bitmap):
+        return Image.frombytes('1', (bitmap.cols, bitmap.rows), packed_rows(bitmap))
+    return Image.frombytes('RGB', (bitmap.cols, bitmap.rows), rgb_bytes(bitmap))
+
+#----------------------------------------------------------------------
+# Image import
+#
+# Greyscale pixels, one byte each, are reduced to black and white with
+# one of:
+#
+#     THRESHOLD        lit where brighter than threshold
+#     BAYER            ordered dithering with an 8x8 Bayer matrix, for
+#                      even textures that stay still when animated
+#     FLOYD_STEINBERG  error diffusion, the best looking for photos and
+#                      logos but the slowest, a Python loop per pixel
+#
+# and then packed into the page layout eight rows at a time.  load()
+# keeps converted images in a cache directory keyed by a hash of the
+# file and the conversion, so they load without decoding or dithering
+# on the next run.
+#----------------------------------------------------------------------
+
+THRESHOLD = 'threshold'
+BAYER = 'bayer'
+FLOYD_STEINBERG = 'floyd-steinberg'
+
+def bayer_matrix(size):
+    matrix = [[0]]
+    while len(matrix) < size:
+        n = len(matrix)
+        matrix = ([[4 * v for v in row] + [4 * v + 2 for v in row] for row in matrix] +
+                  [[4 * v + 3 for v in row] + [4 * v + 1 for v in row] for row in matrix])
+    return matrix
+
+# bayer_tables[y][x] maps a grey level to 0xFF if it is lit at (x, y),
+# x and y modulo 8.
+bayer_tables = [[bytes(0xFF if v * 64 > level * 256 + 128 else 0 for v in range(256)) for level in row]
+                for row in bayer_matrix(8)]
+
+# mask_tables[k] maps a mask byte to bit k set if it is non-zero.
+mask_tables = [bytes(1 << k if v else 0 for v in range(256)) for k in range(8)]
+
+def threshold_mask(gray, threshold):
+    return bytes(gray).translate(bytes(0xFF if v >= threshold else 0 for v in range(256)))
+
+# Each row is 8 translates, one per column phase, interleaved with
+# strided slice assignment.
+def bayer_mask(gray, cols, rows):
+    mask = bytearray(cols * rows)
+    for y in range(rows):
+        row = bytes(gray[y * cols:(y + 1) * cols])
+        tables = bayer_tables[y & 7]
+        for j in range(min(8, cols)):
+            mask[y * cols + j:(y + 1) * cols:8] = row[j::8].translate(tables[j])
+    return bytes(mask)
+
+# Error diffusion, errors held as 16ths.
+def floyd_steinberg_mask(gray, cols, rows, threshold):
+    mask = bytearray(cols * rows)
+    below = [0] * (cols + 2)
+    for y in range(rows):
+        errors = below
+        below = [0] * (cols + 2)
+        base = y * cols
+        for x in range(cols):
+            value = gray[base + x] + (errors[x + 1] >> 4)
+            if value >= threshold:
+                mask[base + x] = 0xFF
+                error = value - 255
+            else:
+                error = value
+            errors[x + 2] += error * 7
+            below[x] += error * 3
+            below[x + 1] += error * 5
+            below[x + 2] += error
+    return bytes(mask)
+
+# Sets each page of monochrome bitmap from a mask of cols x rows pixels,
+# one byte each, non-zero where lit: a translate per row, ORed 8 rows at
+# a time into page bytes.
+def pack_mask(bitmap, mask, cols, rows):
+    width = min(cols, bitmap.cols)
+    for page in range(min((rows + 7) >> 3, bitmap.rows >> 3)):
+        bits = 0
+        for k in range(min(8, rows - (page << 3))):
+            start = ((page << 3) + k) * cols
+            bits |= int.from_bytes(mask[start:start + width].translate(mask_tables[k]), 'little')
+        bitmap.data[bitmap.page_slice(page, 0, width)] = bits.to_bytes(width, 'little')
+    return bitmap
+
+# A monochrome bitmap of bitmap_class (eg. led.Bitmap) from cols x rows
+# grey levels, one byte each, 0 black to 255 white, row by row.  Rows are
+# rounded up to whole pages.
+def from_gray(gray, cols, rows, bitmap_class, dither=FLOYD_STEINBERG, threshold=128):
+    if dither == FLOYD_STEINBERG:
+        mask = floyd_steinberg_mask(gray, cols, rows, threshold)
+    elif dither == BAYER:
+        mask = bayer_mask(gray, cols, rows)
+    elif dither == THRESHOLD:
+        mask = threshold_mask(gray, threshold)
+    else:
+        raise ValueError("unknown dither: %s" % dither)
+    return pack_mask(bitmap_class(cols, (rows + 7) & ~7), mask, cols, rows)
+
+# A monochrome bitmap of bitmap_class holding a PIL image, see from_gray.
+def from_image(image, bitmap_class, dither=FLOYD_STEINBERG, threshold=128):
+    image = image.convert('L')
+    (cols, rows) = image.size
+    return from_gray(image.tobytes(), cols, rows, bitmap_class, dither, threshold)
+
+# (cols, rows, grey levels) of a binary PGM (P5, 8 bit) or PBM (P4) file.
+def read_pnm(data):
+    fields = []
+    pos = 2
+    while len(fields) < (2 if data[:2] == b'P4' else 3):
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b'#':
+            pos = data.index(b'\n', pos)
+            continue
+        start = pos
+        while not data[pos:pos + 1].isspace():
+            pos += 1
+        fields.append(int(data[start:pos]))
+    pos += 1
+    (cols, rows) = fields[:2]
+    if data[:2] == b'P5':
+        if fields[2] != 255:
+            raise ValueError("only 8 bit PGM files are supported")
+        return (cols, rows, data[pos:pos + cols * rows])
+    # PBM rows are packed, 1 black; expand to one byte per pixel
+    stride = (cols + 7) >> 3
+    gray = bytearray()
+    for y in range(rows):
+        bits = int.from_bytes(data[pos + y * stride:pos + (y + 1) * stride], 'big') >> (stride * 8 - cols)
+        gray += bytes(0 if bits >> (cols - 1 - x) & 1 else 255 for x in range(cols))
+    return (cols, rows, bytes(gray))
+
+IMAGE_MAGIC = b'GIMG'
+IMAGE_VERSION = 1
+IMAGE_HEADER = '<4sHHH'       # magic, version, cols, rows; then packed_rows()
+
+# A monochrome bitmap of bitmap_class from an image file.  Binary PGM
+# and PBM files are read directly, anything else needs Pillow.  If
+# cache_dir is given the converted image is kept there and reused while
+# the file and the conversion are unchanged.
+def load(path, bitmap_class, dither=FLOYD_STEINBERG, threshold=128, cache_dir=None):
+    with open(path, 'rb') as f:
+        data = f.read()
+    cache_path = None
+    if cache_dir is not None:
+        key = hashlib.sha1(data + ('%s %d' % (dither, threshold)).encode('ascii')).hexdigest()
+        cache_path = os.path.join(cache_dir, key + '.gimg')
+        bitmap = load_cached(cache_path, bitmap_class)
+        if bitmap is not None:
+            return bitmap
+    if data[:2] in (b'P4', b'P5'):
+        (cols, rows, gray) = read_pnm(data)
+        bitmap = from_gray(gray, cols, rows, bitmap_class, dither, threshold)
+    else:
+        bitmap = from_image(pil_image().open(io.BytesIO(data)), bitmap_class, dither, threshold)
+    if cache_path is not None:
+        gaugette.cachefile.write(cache_path, struct.pack(IMAGE_HEADER, IMAGE_MAGIC, IMAGE_VERSION, bitmap.cols, bitmap.rows) +
+                                 bytes(packed_rows(bitmap)))
+    return bitmap
+
+# The bitmap cached in path, or None if it is missing or does not match.
+def load_cached(path, bitmap_class):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        (magic, version, cols, rows) = struct.unpack_from(IMAGE_HEADER, data, 0)
+    except (IOError, OSError, struct.error):
+        return None
+    rows_data = data[struct.calcsize(IMAGE_HEADER):]
+    if magic != IMAGE_MAGIC or version != IMAGE_VERSION or len(rows_data) != rows * ((cols + 7) >> 3):
+        return None
+    return unpack_rows(bitmap_class(cols, rows), rows_data, cols, rows)
@@ -7,14 +7,35 @@
 #
 # On the RPi, we use wiringpi.GPIO
 # On the BBB, we use Adafruit_BBIO.GPIO
+# On the simulator platform, we use gaugette.simulator.GPIO
+#
+# The platform is detected when the first GPIO object is created,
+# see gaugette.platform.
+#
+# A backend can also be chosen explicitly:
+#   GPIO(backend='gpiomem')  memory-mapped registers on the RPi, see gaugette.gpiomem
+#   GPIO(backend='gpiochip') the Linux GPIO character device, see gaugette.gpiochip
+#   GPIO(backend=obj)        any object providing setup/output/input and
+#                            the OUT/IN/HIGH/LOW/PUD_* constants
 #
 #----------------------------------------------------------------------
 import gaugette
 import gaugette.platform
 
 class GPIO:
-    def __init__(self):
-        if gaugette.platform.isRaspberryPi:
+    def __init__(self, backend=None):
+        if backend == 'gpiomem':
+            import gaugette.gpiomem as gpiomem
+            self.use_backend(gpiomem.GPIOMem())
+
+        elif backend == 'gpiochip':
+            import gaugette.gpiochip as gpiochip
+            self.use_backend(gpiochip.GPIOChip())
+
+        elif backend is not None:
+            self.use_backend(backend)
+
+        elif gaugette.platform.isRaspberryPi:
             import wiringpi
             self.gpio = wiringpi.GPIO(wiringpi.GPIO.WPI_MODE_PINS)
             self.setup = self.wiringpi_setup
@@ -46,6 +67,10 @@ class GPIO:
             self.PUD_DOWN = self.gpio.PUD_DOWN
             self.PUD_OFF = self.gpio.PUD_OFF
 
+        elif gaugette.platform.isSimulator:
+            import gaugette.simulator as simulator
+            self.use_backend(simulator.GPIO())
+
         else:
             raise NotImplementedError("Platform is not supported.")
 
@@ -56,3 +81,19 @@ class GPIO:
         if pull_up_down is None:
             pull_up_down = self.gpio.PUD_OFF
         self.gpio.pullUpDnControl(channel, pull_up_down)
+
+    #----------------------------------------------------------------------
+    # Use a backend object that already implements this interface.
+    # Optional calls and constants (trigger, watch, EDGE_*, read_bank and
+    # write_bank) are passed through when the backend has them.
+    def use_backend(self, backend):
+        self.gpio = backend
+        self.setup = backend.setup
+        self.output = backend.output
+        self.input = backend.input
+        for name in ('OUT', 'IN', 'HIGH', 'LOW', 'PUD_UP', 'PUD_DOWN', 'PUD_OFF'):
+            setattr(self, name, getattr(backend, name))
+        for name in ('trigger', 'watch', 'read_bank', 'write_bank', 'mask',
+                     'EDGE_FALLING', 'EDGE_RISING', 'EDGE_BOTH'):
+            if hasattr(backend, name):
+                setattr(self, name, getattr(backend, name))
@@ -0,0 +1,348 @@
+#----------------------------------------------------------------------
+# gpiochip.py from https://github.com/guyc/py-gaugette
+#
+# GPIO through the Linux GPIO character device (/dev/gpiochipN).
+#
+# This works on any board with a recent kernel, including the
+# BeagleBone Black, and supports edge detection everywhere.  Edges are
+# queued by the kernel with a nanosecond timestamp, so none are lost
+# while Python is busy, and a single reader thread collects every event
+# pending on all watched lines at each wakeup and hands them over as one
+# batch in timestamp order.
+#
+# Use it through gaugette.gpio.GPIO:
+#
+#     gpio = gaugette.gpio.GPIO(backend='gpiochip')
+#     encoder = gaugette.rotary_encoder.RotaryEncoder(gpio, A_PIN, B_PIN)
+#     encoder.start()   # now edge driven on any platform
+#
+# Pin numbers are line offsets on the chip, which on the Raspberry Pi's
+# gpiochip0 are the BCM GPIO numbers.  Pass numbering='wiringpi' to use
+# wiringpi pin numbers on the Pi instead.
+#
+# In addition to the usual trigger(channel, edge, callback), which calls
+# callback() once per edge, watch(channels, edge, handler) calls
+# handler(events) with a list of (channel, value, timestamp_ns) tuples.
+#
+# The kernel interface is reached through a device object.  PseudoChip
+# implements the same calls in-process, with inject() to raise edges,
+# so code using this backend can be exercised without hardware:
+#
+#     chip = gaugette.gpiochip.PseudoChip()
+#     gpio = gaugette.gpio.GPIO(backend=gaugette.gpiochip.GPIOChip(device=chip))
+#     chip.inject(7, 1)
+#
+# This uses the v1 character device ABI.  Pull-up/down selection needs
+# kernel 5.5 or later.
+#----------------------------------------------------------------------
+
+import fcntl
+import os
+import select
+import struct
+import threading
+import time
+
+DEVICE = '/dev/gpiochip0'
+CONSUMER = b'gaugette'
+
+def IOWR(nr, size):
+    return (3 << 30) | (size << 16) | (0xB4 << 8) | nr
+
+HANDLE_REQUEST_FORMAT = '=64II64B32sIi'
+EVENT_REQUEST_FORMAT = '=III32si'
+EVENT_DATA_FORMAT = '=QI4x'
+EVENT_DATA_SIZE = struct.calcsize(EVENT_DATA_FORMAT)
+HANDLE_DATA_SIZE = 64
+
+GPIO_GET_LINEHANDLE_IOCTL = IOWR(0x03, struct.calcsize(HANDLE_REQUEST_FORMAT))
+GPIO_GET_LINEEVENT_IOCTL = IOWR(0x04, struct.calcsize(EVENT_REQUEST_FORMAT))
+GPIOHANDLE_GET_LINE_VALUES_IOCTL = IOWR(0x08, HANDLE_DATA_SIZE)
+GPIOHANDLE_SET_LINE_VALUES_IOCTL = IOWR(0x09, HANDLE_DATA_SIZE)
+
+GPIOHANDLE_REQUEST_INPUT = 1 << 0
+GPIOHANDLE_REQUEST_OUTPUT = 1 << 1
+GPIOHANDLE_REQUEST_BIAS_PULL_UP = 1 << 5
+GPIOHANDLE_REQUEST_BIAS_PULL_DOWN = 1 << 6
+GPIOHANDLE_REQUEST_BIAS_DISABLE = 1 << 7
+
+GPIOEVENT_REQUEST_RISING_EDGE = 1 << 0
+GPIOEVENT_REQUEST_FALLING_EDGE = 1 << 1
+
+GPIOEVENT_EVENT_RISING_EDGE = 0x01
+GPIOEVENT_EVENT_FALLING_EDGE = 0x02
+
+# Most events read from one line in a single read() call.
+MAX_BATCH = 64
+
+
+#----------------------------------------------------------------------
+# The kernel GPIO character device.  Lines are requested one at a time
+# and each request returns a file descriptor.
+#----------------------------------------------------------------------
+
+class ChipDevice:
+
+    def __init__(self, path=DEVICE):
+        self.fd = os.open(path, os.O_RDWR | os.O_CLOEXEC)
+
+    def close(self):
+        os.close(self.fd)
+
+    def request_line(self, offset, flags, default=0):
+        offsets = [offset] + [0] * 63
+        defaults = [default] + [0] * 63
+        request = bytearray(struct.pack(HANDLE_REQUEST_FORMAT, *(offsets + [flags] + defaults +
+                                                                  [CONSUMER, 1, -1])))
+        fcntl.ioctl(self.fd, GPIO_GET_LINEHANDLE_IOCTL, request, True)
+        return struct.unpack(HANDLE_REQUEST_FORMAT, request)[-1]
+
+    def request_events(self, offset, handle_flags, event_flags):
+        request = bytearray(struct.pack(EVENT_REQUEST_FORMAT, offset, handle_flags, event_flags,
+                                        CONSUMER, -1))
+        fcntl.ioctl(self.fd, GPIO_GET_LINEEVENT_IOCTL, request, True)
+        return struct.unpack(EVENT_REQUEST_FORMAT, request)[-1]
+
+    def get_value(self, fd):
+        data = bytearray(HANDLE_DATA_SIZE)
+        fcntl.ioctl(fd, GPIOHANDLE_GET_LINE_VALUES_IOCTL, data, True)
+        return data[0]
+
+    def set_value(self, fd, value):
+        data = bytearray(HANDLE_DATA_SIZE)
+        data[0] = value
+        fcntl.ioctl(fd, GPIOHANDLE_SET_LINE_VALUES_IOCTL, data, True)
+
+    def release(self, fd):
+        os.close(fd)
+
+
+#----------------------------------------------------------------------
+# In-process stand-in for ChipDevice.  Event file descriptors are pipes
+# that inject() writes kernel-format event records into.
+#----------------------------------------------------------------------
+
+class PseudoChip:
+
+    def __init__(self, lines=64):
+        self.levels = [0] * lines
+        self.lines = {}    # fd -> line offset
+        self.events = {}   # line offset -> (read fd, write fd, event flags)
+
+    def close(self):
+        for fd in list(self.lines):
+            self.release(fd)
+
+    def request_line(self, offset, flags, default=0):
+        read_fd, write_fd = os.pipe()
+        os.close(write_fd)
+        self.lines[read_fd] = offset
+        if flags & GPIOHANDLE_REQUEST_OUTPUT:
+            self.levels[offset] = default
+        elif flags & GPIOHANDLE_REQUEST_BIAS_PULL_UP:
+            self.levels[offset] = 1
+        return read_fd
+
+    def request_events(self, offset, handle_flags, event_flags):
+        read_fd, write_fd = os.pipe()
+        self.lines[read_fd] = offset
+        self.events[offset] = (read_fd, write_fd, event_flags)
+        if handle_flags & GPIOHANDLE_REQUEST_BIAS_PULL_UP:
+            self.levels[offset] = 1
+        return read_fd
+
+    def get_value(self, fd):
+        return self.levels[self.lines[fd]]
+
+    def set_value(self, fd, value):
+        self.levels[self.lines[fd]] = value
+
+    def release(self, fd):
+        offset = self.lines.pop(fd)
+        os.close(fd)
+        if offset in self.events and self.events[offset][0] == fd:
+            _, write_fd, _ = self.events.pop(offset)
+            os.close(write_fd)
+
+    # Drive a line to value as external hardware would, queueing an
+    # edge event if the line is being watched for that edge.
+    def inject(self, offset, value, timestamp=None):
+        previous = self.levels[offset]
+        self.levels[offset] = value
+        if value == previous or offset not in self.events:
+            return
+        _, write_fd, event_flags = self.events[offset]
+        if value and event_flags & GPIOEVENT_REQUEST_RISING_EDGE:
+            event_id = GPIOEVENT_EVENT_RISING_EDGE
+        elif not value and event_flags & GPIOEVENT_REQUEST_FALLING_EDGE:
+            event_id = GPIOEVENT_EVENT_FALLING_EDGE
+        else:
+            return
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+        os.write(write_fd, struct.pack(EVENT_DATA_FORMAT, timestamp, event_id))
+
+
+class GPIOChip:
+
+    OUT = 1
+    IN = 0
+    HIGH = 1
+    LOW = 0
+    PUD_OFF = 0
+    PUD_DOWN = 1
+    PUD_UP = 2
+    EDGE_FALLING = GPIOEVENT_REQUEST_FALLING_EDGE
+    EDGE_RISING = GPIOEVENT_REQUEST_RISING_EDGE
+    EDGE_BOTH = GPIOEVENT_REQUEST_RISING_EDGE | GPIOEVENT_REQUEST_FALLING_EDGE
+
+    bias_flags = {
+        None: 0,
+        PUD_OFF: GPIOHANDLE_REQUEST_BIAS_DISABLE,
+        PUD_UP: GPIOHANDLE_REQUEST_BIAS_PULL_UP,
+        PUD_DOWN: GPIOHANDLE_REQUEST_BIAS_PULL_DOWN,
+    }
+
+    def __init__(self, path=DEVICE, numbering='line', device=None):
+        self.device = device if device is not None else ChipDevice(path)
+        if numbering == 'wiringpi':
+            import gaugette.gpiomem
+            self.pins = gaugette.gpiomem.WIRINGPI_TO_BCM
+        elif numbering == 'line':
+            self.pins = None
+        else:
+            raise ValueError("numbering must be 'line' or 'wiringpi'")
+        self.fds = {}      # channel -> fd of the current line request
+        self.bias = {}     # channel -> bias flags from setup
+        self.watches = {}  # event fd -> (channel, handler)
+        self.lock = threading.Lock()
+        self.worker = None
+
+    def offset(self, channel):
+        return channel if self.pins is None else self.pins[channel]
+
+    def release(self, channel):
+        fd = self.fds.pop(channel, None)
+        if fd is not None:
+            with self.lock:
+                self.watches.pop(fd, None)
+            if self.worker is not None:
+                self.worker.wake()
+            self.device.release(fd)
+
+    # Releases the lines, then stops the reader thread and closes its
+    # wake pipe.
+    def close(self):
+        for channel in list(self.fds):
+            self.release(channel)
+        if self.worker is not None:
+            self.worker.stop()
+            # a handler may close the chip from the reader thread itself,
+            # which then exits once the handler returns
+            if threading.current_thread() is not self.worker:
+                self.worker.join()
+            os.close(self.worker.wake_read)
+            os.close(self.worker.wake_write)
+            self.worker = None
+        self.device.close()
+
+    def setup(self, channel, direction, pull_up_down=None):
+        self.release(channel)
+        bias = self.bias_flags[pull_up_down]
+        self.bias[channel] = bias
+        if direction == self.OUT:
+            flags = GPIOHANDLE_REQUEST_OUTPUT
+        else:
+            flags = GPIOHANDLE_REQUEST_INPUT | bias
+        self.fds[channel] = self.device.request_line(self.offset(channel), flags)
+
+    def output(self, channel, value):
+        self.device.set_value(self.fds[channel], 1 if value else 0)
+
+    def input(self, channel):
+        return self.device.get_value(self.fds[channel])
+
+    # Calls callback() once for every matching edge, like wiringPiISR.
+    def trigger(self, channel, edge, callback):
+        def handler(events):
+            for _ in events:
+                callback()
+        self.watch([channel], edge, handler)
+
+    # Calls handler(events) from the reader thread with the batch of
+    # edges seen on channels since the last call, as a list of
+    # (channel, value, timestamp_ns) tuples in timestamp order.
+    def watch(self, channels, edge, handler):
+        group = []
+        for channel in channels:
+            bias = self.bias.get(channel, 0)
+            self.release(channel)
+            fd = self.device.request_events(self.offset(channel), GPIOHANDLE_REQUEST_INPUT | bias, edge)
+            self.fds[channel] = fd
+            group.append(fd)
+            with self.lock:
+                self.watches[fd] = (channel, handler)
+        if self.worker is None:
+            self.worker = self.Worker(self)
+            self.worker.start()
+        else:
+            self.worker.wake()
+
+    # Reads and dispatches the events pending on the given fds.
+    def dispatch(self, ready):
+        batches = {}
+        for fd in ready:
+            with self.lock:
+                watch = self.watches.get(fd)
+            if watch is None:
+                continue
+            channel, handler = watch
+            try:
+                data = os.read(fd, EVENT_DATA_SIZE * MAX_BATCH)
+            except OSError:
+                continue
+            events = batches.setdefault(handler, [])
+            for timestamp, event_id in struct.iter_unpack(EVENT_DATA_FORMAT, data):
+                events.append((channel, 1 if event_id == GPIOEVENT_EVENT_RISING_EDGE else 0, timestamp))
+        for handler, events in batches.items():
+            events.sort(key=lambda event: event[2])
+            handler(events)
+
+    #----------------------------------------------------------------------
+    # Reader thread, started by the first watch or trigger call.
+    #----------------------------------------------------------------------
+
+    class Worker(threading.Thread):
+        def __init__(self, chip):
+            threading.Thread.__init__(self)
+            self.chip = chip
+            self.daemon = True
+            self.stopping = False
+            self.wake_read, self.wake_write = os.pipe()
+
+        def wake(self):
+            os.write(self.wake_write, b'\0')
+
+        def stop(self):
+            self.stopping = True
+            self.wake()
+
+        # The poll set is rebuilt only when woken because watches changed.
+        def run(self):
+            poll = None
+            while not self.stopping:
+                if poll is None:
+                    poll = select.poll()
+                    poll.register(self.wake_read, select.POLLIN)
+                    with self.chip.lock:
+                        fds = list(self.chip.watches)
+                    for fd in fds:
+                        poll.register(fd, select.POLLIN | select.POLLPRI)
+                ready = []
+                for fd, _ in poll.poll():
+                    if fd == self.wake_read:
+                        os.read(self.wake_read, 64)
+                        poll = None
+                    else:
+                        ready.append(fd)
+                self.chip.dispatch(ready)
@@ -0,0 +1,205 @@
+#----------------------------------------------------------------------
+# gpiomem.py from https://github.com/guyc/py-gaugette
+#
+# Memory-mapped GPIO for the Raspberry Pi.
+#
+# The GPIO register block of the BCM2835/6/7 and BCM2711 is mapped from
+# /dev/gpiomem (which does not need root) and pins are read and written
+# by touching the registers directly.  A pin read or write is a couple of
+# Python integer operations on a memoryview of the mapping, avoiding the
+# call overhead of the wiringpi bindings.
+#
+# Use it through gaugette.gpio.GPIO:
+#
+#     gpio = gaugette.gpio.GPIO(backend='gpiomem')
+#
+# Pin numbers are wiringpi pin numbers by default, as with the wiringpi
+# backend, so existing programs need no changes.  Pass numbering='bcm'
+# to use Broadcom GPIO numbers instead.
+#
+# Whole banks of 32 pins can be read with read_bank() and changed with
+# write_bank() in a single register access.
+#
+# Any file of at least BLOCK_SIZE bytes can stand in for /dev/gpiomem.
+# FileGPIOMem mirrors set/clear writes into the level registers so that
+# reads behave as on hardware, and drive() sets input levels:
+#
+#     gaugette.gpiomem.create_register_file('/tmp/gpio')
+#     gpio = gaugette.gpio.GPIO(backend=gaugette.gpiomem.FileGPIOMem('/tmp/gpio'))
+#
+# Edge triggers are not available from registers, use the RotaryEncoder
+# Worker thread or the gpiochip backend for interrupts.
+#
+# This is not supported on the Raspberry Pi 5, whose GPIO is on the RP1.
+#----------------------------------------------------------------------
+
+import mmap
+import os
+import time
+
+DEVICE = '/dev/gpiomem'
+BLOCK_SIZE = 4096
+
+# Register word offsets (byte offset / 4)
+GPFSEL0 = 0x00 >> 2
+GPSET0 = 0x1C >> 2
+GPCLR0 = 0x28 >> 2
+GPLEV0 = 0x34 >> 2
+GPPUD = 0x94 >> 2
+GPPUDCLK0 = 0x98 >> 2
+GPIO_PUP_PDN_CNTRL_REG0 = 0xE4 >> 2   # BCM2711 only
+
+# wiringpi pin number to BCM GPIO number, board revision 2 and later.
+WIRINGPI_TO_BCM = [
+    17, 18, 27, 22, 23, 24, 25, 4,
+    2, 3, 8, 7, 10, 9, 11, 14,
+    15, 28, 29, 30, 31, 5, 6, 13,
+    19, 26, 12, 16, 20, 21, 0, 1,
+]
+
+# Board revision 1 differs on wiringpi pins 2, 8 and 9.
+WIRINGPI_TO_BCM_REV1 = list(WIRINGPI_TO_BCM)
+WIRINGPI_TO_BCM_REV1[2] = 21
+WIRINGPI_TO_BCM_REV1[8] = 0
+WIRINGPI_TO_BCM_REV1[9] = 1
+
+
+class GPIOMem:
+
+    OUT = 1
+    IN = 0
+    HIGH = 1
+    LOW = 0
+    PUD_OFF = 0
+    PUD_DOWN = 1
+    PUD_UP = 2
+
+    # chip is 'bcm2835' (covers 2836/2837) or 'bcm2711', which differ in
+    # how pull-ups are configured.  By default it is taken from the
+    # detected Raspberry Pi version when mapping /dev/gpiomem, and is
+    # 'bcm2835' for any other file.
+    def __init__(self, path=DEVICE, numbering='wiringpi', chip=None):
+        if chip is None:
+            chip = 'bcm2835'
+            if path == DEVICE:
+                import gaugette.platform
+                if (gaugette.platform.pi_version() or 0) >= 4:
+                    chip = 'bcm2711'
+        self.chip = chip
+        if numbering == 'wiringpi':
+            import gaugette.platform
+            rev1 = False
+            if path == DEVICE:
+                # wiringpi pin numbers differ on revision 1 boards
+                try:
+                    rev1 = gaugette.platform.pi_revision() == 1
+                except RuntimeError:
+                    raise ValueError("numbering='wiringpi' needs the Raspberry Pi revision, which could "
+                                     "not be read from /proc/cpuinfo; use numbering='bcm'")
+            self.pins = WIRINGPI_TO_BCM_REV1 if rev1 else WIRINGPI_TO_BCM
+        elif numbering == 'bcm':
+            self.pins = list(range(54))
+        else:
+            raise ValueError("numbering must be 'wiringpi' or 'bcm'")
+
+        fd = os.open(path, os.O_RDWR | os.O_SYNC)
+        try:
+            self.map = mmap.mmap(fd, BLOCK_SIZE, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+        self.regs = memoryview(self.map).cast('I')
+
+    def close(self):
+        self.regs.release()
+        self.map.close()
+
+    def setup(self, channel, direction, pull_up_down=None):
+        pin = self.pins[channel]
+        regs = self.regs
+        reg = GPFSEL0 + pin // 10
+        shift = (pin % 10) * 3
+        regs[reg] = (regs[reg] & ~(7 << shift)) | ((1 if direction == self.OUT else 0) << shift)
+        if pull_up_down is None:
+            pull_up_down = self.PUD_OFF
+        self.set_pull(pin, pull_up_down)
+
+    def set_pull(self, pin, pull_up_down):
+        regs = self.regs
+        if self.chip == 'bcm2711':
+            # 2 bits per pin: 0 none, 1 up, 2 down
+            bits = {self.PUD_OFF: 0, self.PUD_UP: 1, self.PUD_DOWN: 2}[pull_up_down]
+            reg = GPIO_PUP_PDN_CNTRL_REG0 + (pin >> 4)
+            shift = (pin & 15) << 1
+            regs[reg] = (regs[reg] & ~(3 << shift)) | (bits << shift)
+        else:
+            # The BCM2835 sequence: set the mode, wait 150 cycles, clock it
+            # into the pin, wait 150 cycles, then remove mode and clock.
+            regs[GPPUD] = pull_up_down
+            time.sleep(0.00001)
+            regs[GPPUDCLK0 + (pin >> 5)] = 1 << (pin & 31)
+            time.sleep(0.00001)
+            regs[GPPUD] = 0
+            regs[GPPUDCLK0 + (pin >> 5)] = 0
+
+    def output(self, channel, value):
+        pin = self.pins[channel]
+        if value:
+            self.regs[GPSET0 + (pin >> 5)] = 1 << (pin & 31)
+        else:
+            self.regs[GPCLR0 + (pin >> 5)] = 1 << (pin & 31)
+
+    def input(self, channel):
+        pin = self.pins[channel]
+        return (self.regs[GPLEV0 + (pin >> 5)] >> (pin & 31)) & 1
+
+    # Levels of all pins in a bank as a bit mask.  Bank 0 is BCM GPIO 0-31,
+    # bank 1 is GPIO 32-53.  Bits are BCM numbered regardless of numbering.
+    def read_bank(self, bank=0):
+        return self.regs[GPLEV0 + bank]
+
+    # Sets the pins in set_mask high and those in clear_mask low.
+    def write_bank(self, set_mask, clear_mask=0, bank=0):
+        if set_mask:
+            self.regs[GPSET0 + bank] = set_mask
+        if clear_mask:
+            self.regs[GPCLR0 + bank] = clear_mask
+
+    # BCM bit mask for a list of channels, for use with the bank calls.
+    def mask(self, channels):
+        mask = 0
+        for channel in channels:
+            mask |= 1 << (self.pins[channel] & 31)
+        return mask
+
+
+#----------------------------------------------------------------------
+# File-backed stand-in for testing without hardware.  Set and clear
+# writes are reflected in the level registers and drive() changes the
+# level seen on an input.
+#----------------------------------------------------------------------
+
+class FileGPIOMem(GPIOMem):
+
+    def __init__(self, path, numbering='wiringpi', chip='bcm2835'):
+        GPIOMem.__init__(self, path, numbering, chip)
+
+    def output(self, channel, value):
+        GPIOMem.output(self, channel, value)
+        self.drive(channel, value)
+
+    def write_bank(self, set_mask, clear_mask=0, bank=0):
+        GPIOMem.write_bank(self, set_mask, clear_mask, bank)
+        self.regs[GPLEV0 + bank] = (self.regs[GPLEV0 + bank] | set_mask) & ~clear_mask & 0xFFFFFFFF
+
+    def drive(self, channel, value):
+        pin = self.pins[channel]
+        reg = GPLEV0 + (pin >> 5)
+        if value:
+            self.regs[reg] |= 1 << (pin & 31)
+        else:
+            self.regs[reg] &= ~(1 << (pin & 31)) & 0xFFFFFFFF
+
+
+def create_register_file(path):
+    with open(path, 'wb') as f:
+        f.write(bytes(BLOCK_SIZE))
@@ -0,0 +1,108 @@
+#----------------------------------------------------------------------
+# instrumentation.py from https://github.com/guyc/py-gaugette
+#
+# Opt-in per-frame counters for the display drivers.
+#
+# A frame runs from the end of one display() call to the end of the
+# next.  Time spent before display() is counted as drawing, time spent
+# inside it as flushing.  Bus traffic (commands, data bytes, writebytes
+# calls and D/C pin toggles) is counted as it happens, including
+# traffic outside display() such as SET_START_LINE scrolling.
+#
+# Usage:
+#
+#     def report(stats):
+#         print(stats.frame, stats.data_bytes, stats.flush_time)
+#     led.enable_instrumentation(report)   # callback is optional
+#     ...
+#     led.instrumentation.snapshot()       # or poll for the latest figures
+#     led.disable_instrumentation()
+#
+# When instrumentation is disabled the drivers only pay for a single
+# attribute test per command or data transfer.
+#----------------------------------------------------------------------
+
+import time
+
+
+class FrameStats:
+
+    fields = ('commands', 'command_bytes', 'data_bytes', 'writes', 'dc_toggles',
+              'draw_time', 'flush_time')
+
+    def __init__(self, frame=0):
+        self.frame = frame
+        self.commands = 0
+        self.command_bytes = 0
+        self.data_bytes = 0
+        self.writes = 0
+        self.dc_toggles = 0
+        self.draw_time = 0.0
+        self.flush_time = 0.0
+
+    def as_dict(self):
+        stats = {'frame': self.frame}
+        for field in self.fields:
+            stats[field] = getattr(self, field)
+        return stats
+
+
+class Instrumentation:
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.current = FrameStats(0)
+        self.last = None
+        self.totals = FrameStats()
+        self.frame_start = time.perf_counter()
+        self.flush_start = None
+
+    # Called by the drivers for every command transfer.
+    def command(self, count):
+        current = self.current
+        current.commands += 1
+        current.command_bytes += count
+        current.writes += 1
+
+    # Called by the drivers for every data transfer, with the number of
+    # writebytes calls used.  D/C is raised before and lowered after.
+    def data(self, count, writes):
+        current = self.current
+        current.data_bytes += count
+        current.writes += writes
+        current.dc_toggles += 2
+
+    def begin_flush(self):
+        self.flush_start = time.perf_counter()
+        self.current.draw_time += self.flush_start - self.frame_start
+
+    def end_flush(self):
+        now = time.perf_counter()
+        self.current.flush_time += now - self.flush_start
+        self.end_frame(now)
+
+    # Closes the current frame.  display() does this automatically;
+    # applications that only use display_block can call it themselves.
+    def end_frame(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+        current = self.current
+        if self.flush_start is None:
+            current.draw_time = now - self.frame_start
+        for field in FrameStats.fields:
+            setattr(self.totals, field, getattr(self.totals, field) + getattr(current, field))
+        self.totals.frame = current.frame + 1
+        self.last = current
+        self.current = FrameStats(current.frame + 1)
+        self.frame_start = now
+        self.flush_start = None
+        if self.callback is not None:
+            self.callback(current)
+
+    def snapshot(self):
+        return {
+            'frames': self.totals.frame,
+            'last': self.last.as_dict() if self.last is not None else None,
+            'current': self.current.as_dict(),
+            'totals': self.totals.as_dict(),
+        }
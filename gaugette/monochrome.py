@@ -0,0 +1,351 @@
+#----------------------------------------------------------------------
+# monochrome.py from https://github.com/guyc/py-gaugette
+#
+# Byte level helpers shared by the page organised monochrome bitmaps
+# of the SSD1306 and SH1106 drivers.
+#
+# In both controllers each byte of display memory holds a vertical strip
+# of 8 pixels (a page), least significant bit at the top.  A rectangle
+# therefore covers a run of bytes in each page, all but the first and
+# last pages completely.  Operations on a rectangle compute one bit mask
+# per page and modify each byte once, through slice assignment and
+# bytes.translate with a 256 entry lookup table, so the per-pixel work
+# happens in C rather than in Python loops.
+#
+# blit() copies between bitmaps at any row offset: each destination page
+# is assembled from two source pages with shift tables, and whole rows of
+# bytes are combined as large integers.
+#
+# Scaled glyphs for the 5x8 font and the proportional fonts are built
+# once as Sprites and cached, so drawing large text is a blit per
+# character.  Proportional font glyphs, at any scale including 1, are
+# held in a bounded cache, decoding compressed fonts as they are needed.
+#----------------------------------------------------------------------
+
+import gaugette.font
+
+# Raster operations.  For rectangles OR sets, AND clears and XOR
+# inverts the covered pixels.
+OR = 0
+AND = 1
+XOR = 2
+COPY = 3
+
+tables = {}
+
+# Returns the translate table mapping each byte b to (b <op> value).
+def byte_table(op, value):
+    key = (op, value)
+    table = tables.get(key)
+    if table is None:
+        if op == OR:
+            table = bytes([b | value for b in range(256)])
+        elif op == AND:
+            table = bytes([b & value for b in range(256)])
+        elif op == XOR:
+            table = bytes([b ^ value for b in range(256)])
+        else:
+            raise ValueError("unsupported operation %r" % op)
+        tables[key] = table
+    return table
+
+# Yields (page, mask) for each page touched by pixel rows y0 to y1-1,
+# where mask has the bits of the rows inside the range set.
+def page_masks(y0, y1):
+    first = y0 >> 3
+    last = (y1 - 1) >> 3
+    for page in range(first, last + 1):
+        mask = 0xFF
+        if page == first:
+            mask &= (0xFF << (y0 & 7)) & 0xFF
+        if page == last:
+            mask &= 0xFF >> (7 - ((y1 - 1) & 7))
+        yield page, mask
+
+# Applies a rectangle operation to the bytes of data selected by span,
+# one page of the rectangle.  count is the number of bytes in the span.
+def apply_mask(data, span, count, op, mask):
+    if mask == 0xFF and op == OR:
+        data[span] = b'\xff' * count
+    elif mask == 0xFF and op == AND:
+        data[span] = bytes(count)
+    elif op == AND:
+        data[span] = data[span].translate(byte_table(AND, ~mask & 0xFF))
+    else:
+        data[span] = data[span].translate(byte_table(op, mask))
+
+# Clips a rectangle to cols x rows.  Returns (x0, y0, x1, y1) with the
+# far edges exclusive, or None if nothing is left.
+def clip(x0, y0, dx, dy, cols, rows):
+    x1 = min(x0 + dx, cols)
+    y1 = min(y0 + dy, rows)
+    x0 = max(x0, 0)
+    y0 = max(y0, 0)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (x0, y0, x1, y1)
+
+
+shift_tables = {}
+
+# Translate table shifting each byte right (count > 0) or left (count < 0).
+def shift_table(count):
+    table = shift_tables.get(count)
+    if table is None:
+        if count >= 0:
+            table = bytes([b >> count for b in range(256)])
+        else:
+            table = bytes([(b << -count) & 0xFF for b in range(256)])
+        shift_tables[count] = table
+    return table
+
+# Returns w bytes holding source rows base to base+7 of columns x0 to
+# x0+w-1 of bitmap src, one byte per column.  base need not be a
+# multiple of 8; rows outside the bitmap read as 0.
+def shifted_row(src, base, x0, w):
+    page = base >> 3
+    shift = base & 7
+    pages = src.rows >> 3
+    low = src.data[src.page_slice(page, x0, x0 + w)] if 0 <= page < pages else bytes(w)
+    if shift == 0:
+        return low
+    high = src.data[src.page_slice(page + 1, x0, x0 + w)] if 0 <= page + 1 < pages else bytes(w)
+    low = int.from_bytes(low.translate(shift_table(shift)), 'little')
+    high = int.from_bytes(high.translate(shift_table(shift - 8)), 'little')
+    return (low | high).to_bytes(w, 'little')
+
+# Combines rectangle w x h at (sx, sy) of bitmap src into bitmap dst at
+# (dx, dy) using op (OR, AND, XOR or COPY), clipped to both bitmaps.
+# Each destination page row is computed from at most two source page
+# rows with table shifts, and the columns of a row are combined at once
+# as one large integer, so there are no per-pixel Python loops.
+# src and dst may be any bitmaps providing rows, cols, data and
+# page_slice(page, x0, x1), and may be the same bitmap if the areas do
+# not overlap.
+def blit(dst, src, dx, dy, sx=0, sy=0, w=None, h=None, op=OR):
+    if w is None:
+        w = src.cols - sx
+    if h is None:
+        h = src.rows - sy
+    # clip to the source
+    if sx < 0:
+        dx -= sx
+        w += sx
+        sx = 0
+    if sy < 0:
+        dy -= sy
+        h += sy
+        sy = 0
+    w = min(w, src.cols - sx)
+    h = min(h, src.rows - sy)
+    # clip to the destination
+    if dx < 0:
+        sx -= dx
+        w += dx
+        dx = 0
+    if dy < 0:
+        sy -= dy
+        h += dy
+        dy = 0
+    w = min(w, dst.cols - dx)
+    h = min(h, dst.rows - dy)
+    if w <= 0 or h <= 0:
+        return
+
+    data = dst.data
+    offset = dy - sy   # destination row = source row + offset
+    for page, mask in page_masks(dy, dy + h):
+        span = dst.page_slice(page, dx, dx + w)
+        row = shifted_row(src, (page << 3) - offset, sx, w)
+        if op == COPY and mask == 0xFF:
+            data[span] = row
+            continue
+        source = int.from_bytes(row, 'little')
+        masks = int.from_bytes(bytes([mask]) * w, 'little')
+        target = int.from_bytes(data[span], 'little')
+        if op == OR:
+            target |= source & masks
+        elif op == AND:
+            target &= source | (masks ^ ((1 << (w << 3)) - 1))
+        elif op == XOR:
+            target ^= source & masks
+        elif op == COPY:
+            target = (target & ~masks) | (source & masks)
+        else:
+            raise ValueError("unsupported operation %r" % op)
+        data[span] = target.to_bytes(w, 'little')
+
+# Maps a byte to 1 if it is non-zero.
+nonzero_table = bytes([0]) + bytes([1]) * 255
+
+# The (start, end) ranges of bytes that differ between old and new, two
+# byte strings of the same length.  Ranges separated by fewer than gap
+# unchanged bytes are joined, for when sending a few extra bytes is
+# cheaper than starting another transfer.  The search runs in C: the
+# strings are XORed as integers and the runs found with bytes.find.
+def changed_spans(old, new, gap=1):
+    if old == new:
+        return []
+    count = len(new)
+    changed = (int.from_bytes(old, 'little') ^ int.from_bytes(new, 'little')).to_bytes(count, 'little')
+    changed = changed.translate(nonzero_table)
+    quiet = bytes(max(gap, 1))
+    spans = []
+    start = changed.find(1)
+    while start >= 0:
+        end = changed.find(quiet, start)
+        if end < 0:
+            end = count
+        spans.append((start, end))
+        start = changed.find(1, end)
+    if spans:
+        # trim the unchanged bytes a gap run may have left at the end
+        (start, end) = spans[-1]
+        spans[-1] = (start, changed.rfind(1, start, end) + 1)
+    return spans
+
+
+#----------------------------------------------------------------------
+# Sprites are small column-major bitmaps in the SSD1306 layout, used for
+# cached glyphs.  They can be blitted into SSD1306 and SH1106 bitmaps.
+#----------------------------------------------------------------------
+
+class Sprite:
+
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.bytes_per_col = rows >> 3
+        self.data = bytearray(cols * self.bytes_per_col)
+
+    def page_slice(self, page, x0, x1):
+        step = self.bytes_per_col
+        return slice(page + x0 * step, page + x1 * step, step)
+
+# The (x, y) of every lit pixel of a bitmap or sprite.
+def lit_pixels(bitmap):
+    points = []
+    for page in range(bitmap.rows >> 3):
+        row = page << 3
+        for (col, bits) in enumerate(bitmap.data[bitmap.page_slice(page, 0, bitmap.cols)]):
+            y = row
+            while bits:
+                if bits & 1:
+                    points.append((col, y))
+                bits >>= 1
+                y += 1
+    return points
+
+expand_tables = {}
+
+# Table of each byte with every bit repeated size times, as size bytes.
+def expand_table(size):
+    table = expand_tables.get(size)
+    if table is None:
+        table = []
+        for b in range(256):
+            value = 0
+            for bit in range(8):
+                if b & (1 << bit):
+                    value |= ((1 << size) - 1) << (bit * size)
+            table.append(value.to_bytes(size, 'little'))
+        expand_tables[size] = table
+    return table
+
+glyphs = {}
+
+# The glyph for code of a fixed size column font such as Font5x8
+# (font.bytes holds font.cols bytes per character, one per column, with
+# the top row in bit 0) magnified size times.  Each glyph is built once.
+def scaled_glyph(font, code, size):
+    key = (font, code, size)
+    glyph = glyphs.get(key)
+    if glyph is None:
+        table = expand_table(size)
+        cols = font.cols
+        glyph = Sprite(cols * size, font.rows * size)
+        columns = font.bytes[code * cols:(code + 1) * cols]
+        glyph.data[:] = b''.join([table[b] * size for b in columns])
+        glyphs[key] = glyph
+    return glyph
+
+# Glyphs of proportional fonts, bounded so that many large fonts can be
+# used without holding every glyph of all of them.
+FONT_GLYPH_CACHE_SIZE = 256
+font_glyphs = {}
+
+# The glyph at index pos of a proportional font from gaugette.fonts
+# scaled by any factor, eg. 1.5, with nearest neighbour sampling.
+# Compressed fonts are decoded here, a glyph at a time.
+def scaled_font_glyph(font, pos, scale):
+    key = (font, pos, scale)
+    glyph = font_glyphs.get(key)
+    if glyph is None:
+        if len(font_glyphs) >= FONT_GLYPH_CACHE_SIZE:
+            font_glyphs.clear()
+        (width, offset) = font.descriptors[pos]
+        data = gaugette.font.glyph_bytes(font, pos)
+        height = font.char_height
+        cols = int(round(width * scale))
+        rows = int(round(height * scale))
+        glyph = Sprite(cols, (rows + 7) & ~7)
+        bytes_per_row = (width + 7) >> 3
+        pages = glyph.bytes_per_col
+        source_cols = [min(int(i / scale), width - 1) for i in range(cols)]
+        for j in range(rows):
+            start = min(int(j / scale), height - 1) * bytes_per_row
+            bit = 1 << (j & 7)
+            for i in range(cols):
+                sx = source_cols[i]
+                if data[start + (sx >> 3)] & (0x80 >> (sx & 7)):
+                    glyph.data[(j >> 3) + i * pages] |= bit
+        font_glyphs[key] = glyph
+    return glyph
+
+# As Bitmap.text_width for text drawn with draw_text_scaled.
+def text_width_scaled(string, font, scale):
+    x = 0.0
+    prev_char = None
+    for c in string:
+        pos = gaugette.font.lookup(font, c)
+        if pos is None:
+            if prev_char != None:
+                x += (font.space_width + prev_width + font.gap_width) * scale
+            prev_char = None
+        else:
+            (width, offset) = font.descriptors[pos]
+            if prev_char != None:
+                x += (gaugette.font.advance(font, prev_char, pos) + font.gap_width) * scale
+            prev_char = pos
+            prev_width = width
+    if prev_char != None:
+        x += prev_width * scale
+    return int(round(x))
+
+# As Bitmap.draw_text, with the font scaled by any factor.  Glyphs are
+# ORed in with blit from the scaled glyph cache.  Returns the x position
+# after the text.  draw is called with (glyph, x, y) instead of blitting
+# into bitmap if given.
+def draw_text_scaled(bitmap, x, y, string, font, scale, draw=None):
+    x = float(x)
+    prev_char = None
+    for c in string:
+        pos = gaugette.font.lookup(font, c)
+        if pos is None:
+            if prev_char != None:
+                x += (font.space_width + prev_width + font.gap_width) * scale
+            prev_char = None
+        else:
+            (width, offset) = font.descriptors[pos]
+            if prev_char != None:
+                x += (gaugette.font.advance(font, prev_char, pos) + font.gap_width) * scale
+            prev_char = pos
+            prev_width = width
+            glyph = scaled_font_glyph(font, pos, scale)
+            if draw is None:
+                blit(bitmap, glyph, int(round(x)), y)
+            else:
+                draw(glyph, int(round(x)), y)
+    if prev_char != None:
+        x += prev_width * scale
+    return int(round(x))
@@ -0,0 +1,193 @@
+#----------------------------------------------------------------------
+# needles.py from https://github.com/guyc/py-gaugette
+#
+# Pre-rendered needles for analog gauges.
+#
+# A NeedleAtlas renders a needle at every position it can show (by
+# default one per degree of the sweep) into small monochrome sprites,
+# cropped to the needle, once at startup.  Rendering a thick needle is
+# slow on a small board, so the atlas can be cached on disk and loaded
+# on the next run.
+#
+# NeedleGauge is a widget for gaugette.widgets.Scene that uses an atlas.
+# Its dial face is also rendered once, so moving the needle costs two
+# sprite-sized blits (restore the face, draw the new needle) and sends
+# only the area covered by the old and new needles, however big the
+# gauge is.  It works on the SSD1306, SH1106 and SSD1351.
+#
+# Usage:
+#
+#     gauge = scene.add(gaugette.needles.NeedleGauge(0, 0, 64, 64, 0, 8000,
+#                       thickness=2, cache_dir='/var/cache/gaugette'))
+#     gauge.set(rpm)
+#     scene.flush()
+#----------------------------------------------------------------------
+
+import math
+import os
+import struct
+import gaugette.cachefile
+import gaugette.regions
+import gaugette.ssd1306
+import gaugette.widgets
+
+ATLAS_MAGIC = b'GNDL'
+ATLAS_VERSION = 1
+ATLAS_HEADER = '<4sHH'        # magic, version, sprite count
+SPRITE_HEADER = '<hhHH'       # x offset, y offset, cols, rows
+
+
+class NeedleAtlas:
+
+    # length:     pivot to tip in pixels
+    # start_angle, end_angle: the sweep, as for widgets.Gauge
+    # steps:      number of positions, default one per degree
+    # thickness:  needle width in pixels
+    # cache_dir:  directory to load the atlas from and save it to
+    def __init__(self, length, start_angle=225, end_angle=-45, steps=None, thickness=1, cache_dir=None):
+        self.length = length
+        self.start_angle = start_angle
+        self.end_angle = end_angle
+        if steps is None:
+            steps = int(abs(end_angle - start_angle)) + 1
+        self.steps = max(steps, 2)
+        self.thickness = thickness
+        # (x offset, y offset, bitmap) for each position, offsets are
+        # from the pivot to the top left of the bitmap
+        self.sprites = None
+        path = None
+        if cache_dir is not None:
+            path = os.path.join(cache_dir, self.cache_name())
+            self.sprites = self.load(path)
+        if self.sprites is None:
+            self.sprites = [self.render(self.angle(i)) for i in range(self.steps)]
+            if path is not None:
+                self.save(path)
+
+    def cache_name(self):
+        return 'needle-%d-%g-%g-%d-%d.atlas' % (self.length, self.start_angle, self.end_angle,
+                                               self.steps, self.thickness)
+
+    def angle(self, index):
+        return self.start_angle + (self.end_angle - self.start_angle) * index / float(self.steps - 1)
+
+    # The position nearest to fraction (0 to 1) of the sweep.
+    def index(self, fraction):
+        fraction = max(0.0, min(1.0, fraction))
+        return int(round(fraction * (self.steps - 1)))
+
+    # The rectangle covered by a sprite with the pivot at (cx, cy).
+    def rect(self, index, cx, cy):
+        (ox, oy, bitmap) = self.sprites[index]
+        return (cx + ox, cy + oy, bitmap.cols, bitmap.rows)
+
+    def render(self, angle):
+        radians = math.radians(angle)
+        tx = int(round(self.length * math.cos(radians)))
+        ty = -int(round(self.length * math.sin(radians)))
+        r = self.thickness // 2
+        # the pen is a disc of the needle's thickness
+        pen = [(px, py) for px in range(-r, r + 1) for py in range(-r, r + 1)
+               if px * px + py * py <= r * r + r]
+        x0 = min(0, tx) - r
+        y0 = min(0, ty) - r
+        cols = abs(tx) + 2 * r + 1
+        rows = (abs(ty) + 2 * r + 1 + 7) & ~7
+        bitmap = gaugette.ssd1306.SSD1306.Bitmap(cols, rows)
+        steps = max(abs(tx), abs(ty), 1)
+        for i in range(steps + 1):
+            x = int(round(tx * i / float(steps))) - x0
+            y = int(round(ty * i / float(steps))) - y0
+            for (px, py) in pen:
+                bitmap.draw_pixel(x + px, y + py)
+        return (x0, y0, bitmap)
+
+    def save(self, path):
+        chunks = [struct.pack(ATLAS_HEADER, ATLAS_MAGIC, ATLAS_VERSION, len(self.sprites))]
+        for (ox, oy, bitmap) in self.sprites:
+            chunks.append(struct.pack(SPRITE_HEADER, ox, oy, bitmap.cols, bitmap.rows))
+            chunks.append(bytes(bitmap.data))
+        gaugette.cachefile.write(path, b''.join(chunks))
+
+    # Returns the sprites stored in path, or None if it is missing or
+    # does not match.
+    def load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return None
+        try:
+            (magic, version, count) = struct.unpack_from(ATLAS_HEADER, data, 0)
+            if magic != ATLAS_MAGIC or version != ATLAS_VERSION or count != self.steps:
+                return None
+            pos = struct.calcsize(ATLAS_HEADER)
+            sprites = []
+            for i in range(count):
+                (ox, oy, cols, rows) = struct.unpack_from(SPRITE_HEADER, data, pos)
+                pos += struct.calcsize(SPRITE_HEADER)
+                bitmap = gaugette.ssd1306.SSD1306.Bitmap(cols, rows)
+                size = len(bitmap.data)
+                if pos + size > len(data):
+                    return None
+                bitmap.data[:] = data[pos:pos + size]
+                pos += size
+                sprites.append((ox, oy, bitmap))
+        except struct.error:
+            return None
+        return sprites
+
+
+class NeedleGauge(gaugette.widgets.Widget):
+
+    # As widgets.Gauge, with the needle drawn from an atlas.  atlas may be
+    # shared between gauges of the same size; otherwise one is made with
+    # the given steps, thickness and cache_dir.
+    def __init__(self, x, y, w, h, minimum=0, maximum=100, value=0, color=gaugette.widgets.WHITE,
+                 start_angle=225, end_angle=-45, ticks=9, atlas=None, steps=None, thickness=1,
+                 cache_dir=None):
+        gaugette.widgets.Widget.__init__(self, x, y, w, h, value, color)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cx = x + (w - 1) // 2
+        self.cy = y + (h - 1) // 2
+        radius = (min(w, h) - 1) // 2
+        if atlas is None:
+            atlas = NeedleAtlas(radius - 3, start_angle, end_angle, steps, thickness, cache_dir)
+        self.atlas = atlas
+        self.face = self.render_face(w, h, start_angle, end_angle, ticks, radius)
+
+    # The scale and hub, drawn once into a bitmap the size of the box.
+    def render_face(self, w, h, start_angle, end_angle, ticks, radius):
+        face = gaugette.ssd1306.SSD1306.Bitmap(w, (h + 7) & ~7)
+        canvas = gaugette.widgets.MonochromeSurface(None, face)
+        (x, y) = self.bbox[:2]
+        cx = self.cx - x
+        cy = self.cy - y
+        for i in range(ticks):
+            radians = math.radians(start_angle + (end_angle - start_angle) * i / float(max(ticks - 1, 1)))
+            (c, s) = (math.cos(radians), math.sin(radians))
+            canvas.draw_line(cx + int(round(radius * c)), cy - int(round(radius * s)),
+                             cx + int(round((radius - 2) * c)), cy - int(round((radius - 2) * s)))
+        canvas.fill_rect(cx - 1, cy - 1, 3, 3)
+        return face
+
+    # the atlas position shown
+    def state(self):
+        fraction = (self.value - self.minimum) / (float(self.maximum - self.minimum) or 1.0)
+        return self.atlas.index(fraction)
+
+    def changed_rect(self, previous):
+        old = self.atlas.rect(previous, self.cx, self.cy)
+        new = self.atlas.rect(self.state(), self.cx, self.cy)
+        return gaugette.regions.union(old, new)
+
+    # Restores the face under the area being redrawn (all of it when
+    # redrawn because of an overlapping widget) and draws the needle.
+    def draw(self, surface):
+        (x, y, w, h) = self.bbox
+        (ax, ay, aw, ah) = self.dirty_rect if self.dirty_rect is not None else self.bbox
+        surface.blit(self.face, ax, ay, ax - x, ay - y, aw, ah, self.color)
+        index = self.state()
+        (ox, oy, bitmap) = self.atlas.sprites[index]
+        surface.blit(bitmap, self.cx + ox, self.cy + oy, 0, 0, None, None, self.color)
@@ -18,38 +18,127 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import os
 import re
-import platform
 
 # Platform identification constants.
 UNKNOWN = 0
 RASPBERRY_PI = 1
 BEAGLEBONE_BLACK = 2
+SIMULATOR = 3
 
-isBeagleBoneBlack = False
-isRaspberryPi = False
+# Names accepted by set_platform() and the GAUGETTE_PLATFORM environment
+# variable, eg. GAUGETTE_PLATFORM=simulator to run without hardware.
+names = {
+    'unknown': UNKNOWN,
+    'rpi': RASPBERRY_PI,
+    'bbb': BEAGLEBONE_BLACK,
+    'simulator': SIMULATOR,
+}
+
+ENVIRONMENT_VARIABLE = 'GAUGETTE_PLATFORM'
+
+# Detection is deferred until something asks for the platform, normally
+# when the first GPIO or SPI object is created, and the result is cached.
+# The legacy module attributes platform, isRaspberryPi and
+# isBeagleBoneBlack are computed on access (see __getattr__ below).
+detected = None
+cpuinfo = None
+
+
+def get_platform():
+    """Return the platform type, detecting it on first use.  An explicit
+    set_platform() or the GAUGETTE_PLATFORM environment variable takes
+    precedence over detection."""
+    global detected
+    if detected is None:
+        override = os.environ.get(ENVIRONMENT_VARIABLE)
+        if override:
+            detected = platform_id(override)
+        else:
+            detected = platform_detect()
+    return detected
+
+
+def set_platform(value):
+    """Override the detected platform with a platform constant or one of
+    the names in gaugette.platform.names.  Pass None to detect again on
+    next use."""
+    global detected
+    detected = None if value is None else platform_id(value)
+
+
+def platform_id(value):
+    if isinstance(value, int):
+        return value
+    try:
+        return names[value.lower()]
+    except KeyError:
+        raise ValueError('Unknown platform %r, expected one of %s' % (value, ', '.join(sorted(names))))
+
+
+def register(name, value, detector=None):
+    """Register a platform name, and optionally a detector function that
+    returns True when running on it.  Detectors are tried in order of
+    registration."""
+    names[name] = value
+    if detector is not None:
+        detectors.append((value, detector))
+
+
+def read_cpuinfo():
+    """Return the contents of /proc/cpuinfo, or an empty string where it
+    is not available (eg. some containers).  Read once and cached."""
+    global cpuinfo
+    if cpuinfo is None:
+        try:
+            with open('/proc/cpuinfo', 'r') as infile:
+                cpuinfo = infile.read()
+        except IOError:
+            cpuinfo = ''
+    return cpuinfo
+
+
+def device_tree_model():
+    """Return the board model from the device tree, or None."""
+    try:
+        with open('/proc/device-tree/model', 'r') as infile:
+            return infile.read().rstrip('\0\n')
+    except IOError:
+        return None
+
+
+def is_raspberry_pi():
+    return pi_version() is not None
+
+
+def is_beaglebone_black():
+    model = device_tree_model()
+    if model is not None and 'beaglebone' in model.lower():
+        return True
+    # Older kernels without a device tree model, fall back on the
+    # distribution string.
+    import platform as python_platform
+    plat = python_platform.platform().lower()
+    for signature in ('armv7l-with-debian', 'armv7l-with-ubuntu', 'armv7l-with-glibc2.4', 'armv7l-with-arch'):
+        if plat.find(signature) > -1:
+            return True
+    return False
+
+
+detectors = [
+    (RASPBERRY_PI, is_raspberry_pi),
+    (BEAGLEBONE_BLACK, is_beaglebone_black),
+]
 
 
 def platform_detect():
     """Detect if running on the Raspberry Pi or Beaglebone Black and return the
-    platform type.  Will return RASPBERRY_PI, BEAGLEBONE_BLACK, or UNKNOWN."""
-    # Handle Raspberry Pi
-    pi = pi_version()
-    if pi is not None:
-        return RASPBERRY_PI
-
-    # Handle Beaglebone Black
-    # TODO: Check the Beaglebone Black /proc/cpuinfo value instead of reading
-    # the platform.
-    plat = platform.platform()
-    if plat.lower().find('armv7l-with-debian') > -1:
-        return BEAGLEBONE_BLACK
-    elif plat.lower().find('armv7l-with-ubuntu') > -1:
-        return BEAGLEBONE_BLACK
-    elif plat.lower().find('armv7l-with-glibc2.4') > -1:
-        return BEAGLEBONE_BLACK
-    elif plat.lower().find('armv7l-with-arch') > -1:
-        return BEAGLEBONE_BLACK
+    platform type.  Will return RASPBERRY_PI, BEAGLEBONE_BLACK, or UNKNOWN,
+    or the value of any platform added with register()."""
+    for value, detector in detectors:
+        if detector():
+            return value
     # Couldn't figure out the platform, just return unknown.
     return UNKNOWN
 
@@ -58,46 +147,67 @@ def pi_revision():
     """Detect the revision number of a Raspberry Pi, useful for changing
     functionality like default I2C bus based on revision."""
     # Revision list available at: http://elinux.org/RPi_HardwareHistory#Board_Revision_History
-    with open('/proc/cpuinfo', 'r') as infile:
-        for line in infile:
-            # Match a line of the form "Revision : 0002" while ignoring extra
-            # info in front of the revsion (like 1000 when the Pi was over-volted).
-            match = re.match('Revision\s+:\s+.*(\w{4})$', line, flags=re.IGNORECASE)
-            if match and match.group(1) in ['0000', '0002', '0003']:
-                # Return revision 1 if revision ends with 0000, 0002 or 0003.
-                return 1
-            elif match:
-                # Assume revision 2 if revision ends with any other 4 chars.
-                return 2
-        # Couldn't find the revision, throw an exception.
-        raise RuntimeError('Could not determine Raspberry Pi revision.')
+    for line in read_cpuinfo().splitlines():
+        # Match a line of the form "Revision : 0002" while ignoring extra
+        # info in front of the revsion (like 1000 when the Pi was over-volted).
+        match = re.match('Revision\s+:\s+.*(\w{4})$', line, flags=re.IGNORECASE)
+        if match and match.group(1) in ['0000', '0002', '0003']:
+            # Return revision 1 if revision ends with 0000, 0002 or 0003.
+            return 1
+        elif match:
+            # Assume revision 2 if revision ends with any other 4 chars.
+            return 2
+    # Couldn't find the revision, throw an exception.
+    raise RuntimeError('Could not determine Raspberry Pi revision.')
+
+
+# Processor field (bits 12-15) of new style revision codes.
+pi_processors = {0: 1, 1: 2, 2: 3, 3: 4, 4: 5}
 
 
 def pi_version():
-    """Detect the version of the Raspberry Pi.  Returns either 1, 2, 3 or
-    None depending on if it's a Raspberry Pi 1 (model A, B, A+, B+),
-    Raspberry Pi 2 (model B+), Raspberry Pi 3 or not a Raspberry Pi.
+    """Detect the version of the Raspberry Pi.  Returns 1 to 5 or None
+    depending on if it's a Raspberry Pi 1 (model A, B, A+, B+),
+    Raspberry Pi 2 (model B+), Raspberry Pi 3, 4, 5 or not a Raspberry Pi.
     """
     # Check /proc/cpuinfo for the Hardware field value.
     # 2708 is pi 1
     # 2709 is pi 2
-    # 2835 is pi 3
+    # 2711 is pi 4
+    # 2835 is reported by all models on newer kernels, so the
+    # revision code decides.
+    # Kernels that report no Hardware line are recognised by the
+    # device tree model.
     # Anything else is not a pi.
-    with open('/proc/cpuinfo', 'r') as infile:
-        cpuinfo = infile.read()
+    info = read_cpuinfo()
     # Match a line like 'Hardware   : BCM2709'
-    match = re.search(r'^Hardware\s+:\s+(\w+)$', cpuinfo,
+    match = re.search(r'^Hardware\s+:\s+(\w+)$', info,
                       flags=re.MULTILINE | re.IGNORECASE)
-    if not match:
-        # Couldn't find the hardware, assume it isn't a pi.
-        return None
-    if match.group(1) == 'BCM2708':
+    if match:
+        hardware = match.group(1)
+    else:
+        model = device_tree_model()
+        if model is None or not model.startswith('Raspberry Pi'):
+            # Couldn't find the hardware, assume it isn't a pi.
+            return None
+        hardware = 'BCM2835'
+    if hardware == 'BCM2708':
         # Pi 1
         return 1
-    elif match.group(1) == 'BCM2709':
+    elif hardware == 'BCM2709':
         # Pi 2
         return 2
-    elif match.group(1) == 'BCM2835':
+    elif hardware == 'BCM2711':
+        # Pi 4
+        return 4
+    elif hardware == 'BCM2835':
+        match = re.search(r'^Revision\s+:\s+([0-9a-f]+)$', info,
+                          flags=re.MULTILINE | re.IGNORECASE)
+        if match:
+            revision = int(match.group(1), 16)
+            if revision & (1 << 23):
+                # New style revision code
+                return pi_processors.get((revision >> 12) & 0xF, 3)
         # Pi 3
         return 3
     else:
@@ -105,6 +215,13 @@ def pi_version():
         return None
 
 
-platform = platform_detect()
-isBeagleBoneBlack = platform == BEAGLEBONE_BLACK
-isRaspberryPi = platform == RASPBERRY_PI
+def __getattr__(name):
+    if name == 'platform':
+        return get_platform()
+    elif name == 'isRaspberryPi':
+        return get_platform() == RASPBERRY_PI
+    elif name == 'isBeagleBoneBlack':
+        return get_platform() == BEAGLEBONE_BLACK
+    elif name == 'isSimulator':
+        return get_platform() == SIMULATOR
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,52 @@
+#----------------------------------------------------------------------
+# regions.py from https://github.com/guyc/py-gaugette
+#
+# Rectangle helpers for partial display updates.  A rectangle is an
+# (x, y, w, h) tuple.
+#
+# Every separately sent region costs a few command bytes to set the
+# address window, so merge() joins rectangles whenever the union costs
+# no more than sending them apart would.  slack is the number of extra
+# pixels worth sending to save one window setup.
+#----------------------------------------------------------------------
+
+def area(rect):
+    return rect[2] * rect[3]
+
+def union(a, b):
+    x0 = min(a[0], b[0])
+    y0 = min(a[1], b[1])
+    x1 = max(a[0] + a[2], b[0] + b[2])
+    y1 = max(a[1] + a[3], b[1] + b[3])
+    return (x0, y0, x1 - x0, y1 - y0)
+
+def intersects(a, b):
+    return (a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and
+            a[1] < b[1] + b[3] and b[1] < a[1] + a[3])
+
+# Grows rect vertically to whole 8 row pages.
+def align_pages(rect):
+    y0 = rect[1] & ~7
+    y1 = (rect[1] + rect[3] + 7) & ~7
+    return (rect[0], y0, rect[2], y1 - y0)
+
+# Merges rectangles while the union of a pair has at most slack more
+# pixels than the pair itself.  Overlapping rectangles are always merged.
+def merge(rects, slack=0):
+    rects = [r for r in rects if r[2] > 0 and r[3] > 0]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a = rects[i]
+                b = rects[j]
+                u = union(a, b)
+                if intersects(a, b) or area(u) <= area(a) + area(b) + slack:
+                    rects[i] = u
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
@@ -82,8 +82,11 @@ class RotaryEncoder:
         return r_seq
 
     def update(self):
+        self.update_sequence(self.rotation_sequence())
+
+    # Advances the step count to the rotation sequence number r_seq.
+    def update_sequence(self, r_seq):
         delta = 0
-        r_seq = self.rotation_sequence()
         if r_seq != self.r_seq:
             delta = (r_seq - self.r_seq) % 4
             if delta == 3:
@@ -118,11 +121,26 @@ class RotaryEncoder:
         self.remainder %= self.steps_per_cycle # remainder always remains positive
         return cycles
 
+    # Counts steps from edge interrupts.  Backends with batched edge
+    # events (see gaugette.gpiochip) deliver the level of each edge in
+    # order, so the pins need not be read again and fast turns that
+    # produce several edges before Python runs are still counted.
     def start(self):
-        def isr():
-            self.update()
-        self.gpio.trigger(self.a_pin, self.gpio.EDGE_BOTH, isr)
-        self.gpio.trigger(self.b_pin, self.gpio.EDGE_BOTH, isr)
+        if hasattr(self.gpio, 'watch'):
+            levels = {self.a_pin: self.gpio.input(self.a_pin),
+                      self.b_pin: self.gpio.input(self.b_pin)}
+            def handler(events):
+                for channel, value, timestamp in events:
+                    levels[channel] = value
+                    a_state = levels[self.a_pin]
+                    b_state = levels[self.b_pin]
+                    self.update_sequence((a_state ^ b_state) | b_state << 1)
+            self.gpio.watch([self.a_pin, self.b_pin], self.gpio.EDGE_BOTH, handler)
+        else:
+            def isr():
+                self.update()
+            self.gpio.trigger(self.a_pin, self.gpio.EDGE_BOTH, isr)
+            self.gpio.trigger(self.b_pin, self.gpio.EDGE_BOTH, isr)
 
     class Worker(threading.Thread):
         def __init__(self, gpio, a_pin, b_pin):
@@ -0,0 +1,121 @@
+#----------------------------------------------------------------------
+# scroll_engine.py from https://github.com/guyc/py-gaugette
+#
+# Frame-timed kinetic scrolling for SSD1306.ScrollingList and
+# SH1106.ScrollingList.
+#
+# The list is moved with the controller's hardware start line, so each
+# frame costs a single SET_START_LINE command however far it moves.
+# Encoder steps add velocity, which decays with friction; once the list
+# has slowed down it eases into the nearest item and the next item in
+# the direction of travel is loaded into the hidden half of the display
+# ram, ready for the next movement.
+#
+# Usage:
+#
+#     slist = led.ScrollingList(led, items, font)
+#     engine = gaugette.scroll_engine.ScrollEngine(slist, fps=60)
+#     while True:
+#         engine.feed(encoder.get_steps())
+#         if not engine.tick():
+#             time.sleep(0.01)          # idle, settled on an item
+#
+# or let run() pace the frames until the list comes to rest:
+#
+#     engine.feed(steps)
+#     engine.run()
+#----------------------------------------------------------------------
+
+import math
+import time
+
+
+class ScrollEngine:
+
+    # fps:        frame rate for run(), and the cap on movement per frame.
+    # friction:   fraction of the velocity left after one second of coasting.
+    # impulse:    velocity in pixels/second added per encoder step,
+    #             default 2 items per second.
+    # snap_speed: pixels/second used to settle on the nearest item,
+    #             default 8 items per second.
+    def __init__(self, scrolling_list, fps=60, friction=0.05, impulse=None, snap_speed=None):
+        self.list = scrolling_list
+        rows = scrolling_list.rows
+        self.frame_time = 1.0 / fps
+        self.friction = friction
+        self.impulse = impulse if impulse is not None else rows * 2.0
+        self.snap_speed = snap_speed if snap_speed is not None else rows * 8.0
+        # never move more than one item per frame
+        self.max_speed = rows * fps
+        # below this the list stops coasting and settles
+        self.min_speed = rows * 1.0
+        self.velocity = 0.0
+        self.remainder = 0.0
+        self.direction = 1
+        self.last_tick = None
+        self.settled = True
+
+    # Adds encoder steps.  Turning against the current motion stops it
+    # and starts moving the other way.
+    def feed(self, steps):
+        if steps == 0:
+            return
+        if self.velocity * steps < 0:
+            self.velocity = 0.0
+        self.velocity += steps * self.impulse
+        self.velocity = max(-self.max_speed, min(self.max_speed, self.velocity))
+        if self.settled:
+            # the first frame after a rest is a normal frame, not the idle gap
+            self.last_tick = None
+        self.settled = False
+
+    def is_idle(self):
+        return self.settled
+
+    # Advances one frame.  Returns False once the list has settled on an item.
+    def tick(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        if self.last_tick is None or self.settled:
+            dt = self.frame_time
+        else:
+            dt = now - self.last_tick
+        self.last_tick = now
+
+        if self.settled:
+            return False
+
+        if abs(self.velocity) >= self.min_speed:
+            move = self.velocity * dt
+            self.velocity *= self.friction ** dt
+        else:
+            self.velocity = 0.0
+            offset = self.list.align_offset() - self.remainder
+            if abs(offset) < 0.5:
+                self.remainder = 0.0
+                self.settled = True
+                self.list.prefetch(self.direction)
+                return False
+            move = math.copysign(min(self.snap_speed * dt, abs(offset)), offset)
+
+        self.remainder += move
+        steps = int(self.remainder)
+        self.remainder -= steps
+        rows = self.list.rows
+        steps = max(-rows, min(rows, steps))
+        if steps != 0:
+            self.direction = 1 if steps > 0 else -1
+            self.list.scroll(steps)
+        return True
+
+    # Runs frames at the frame rate until the list settles.
+    def run(self):
+        deadline = time.monotonic()
+        while self.tick():
+            deadline += self.frame_time
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.monotonic()
+        return self.list.position // self.list.rows
@@ -70,7 +70,11 @@
 import gaugette.platform
 import gaugette.gpio
 import gaugette.spi
+import gaugette.font
 import gaugette.font5x8
+import gaugette.instrumentation
+import gaugette.monochrome
+import collections
 import time
 import sys
 
@@ -124,6 +128,9 @@ class SH1106:
     # We will keep d/c low and bump it high only for commands with data
     # reset is normally HIGH, and pulled LOW to reset the display
 
+    # Addressing a page costs 3 command bytes, about 24 pixels of data
+    SHADOW_SLACK = 24
+
     def __init__(self, gpio, spi, dc_pin="P9_15", reset_pin="P9_13", buffer_rows=64, buffer_cols=132, rows=64, cols=132):
         self.gpio = gpio
         self.spi = spi
@@ -141,29 +148,52 @@ class SH1106:
         self.col_offset = 0
         self.bitmap = self.Bitmap(buffer_cols, buffer_rows)
         self.flipped = False
+        self.instrumentation = None
+        self.shadow = None
+        self.shadow_slack = None
+
+    # Opt-in per-frame bus and timing counters, see gaugette.instrumentation.
+    # callback, if given, is called with the FrameStats of each completed frame.
+    def enable_instrumentation(self, callback=None):
+        self.instrumentation = gaugette.instrumentation.Instrumentation(callback)
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        self.instrumentation = None
+
+    # Opt-in shadow of the display ram.  display() then compares the
+    # bitmap with what was last sent and sends only the changed spans of
+    # each page, joined while that costs no more than slack extra pixels.
+    # The first display() after enabling sends everything, as does the
+    # one after any display_block.  See SSD1306.enable_shadow.
+    def enable_shadow(self, slack=SHADOW_SLACK):
+        self.shadow_slack = slack
+        self.shadow = None
+
+    def disable_shadow(self):
+        self.shadow_slack = None
+        self.shadow = None
 
     def reset(self):
+        self.shadow = None
         self.gpio.output(self.reset_pin, self.gpio.LOW)
         time.sleep(0.010) # 10ms
         self.gpio.output(self.reset_pin, self.gpio.HIGH)
         time.sleep(0.010) # 10ms
 
     def command(self, *bytes):
-        self.spi.writebytes(list(bytes))
+        if self.instrumentation is not None:
+            self.instrumentation.command(len(bytes))
+        with self.spi.bus.lock:
+            self.spi.writebytes(list(bytes))
 
     def data(self, bytes):
-        self.gpio.output(self.dc_pin, self.gpio.HIGH)
-        # chunk data to work around 255 byte limitation in adafruit implementation of writebytes
-        # revisit - change to 1024 when Adafruit_BBIO is fixed.
-        max_xfer = 255 if gaugette.platform.isBeagleBoneBlack else 1024
-        start = 0
-        remaining = len(bytes)
-        while remaining > 0:
-            count = remaining if remaining <= max_xfer else max_xfer
-            remaining -= count
-            self.spi.writebytes(bytes[start:start+count])
-            start += count
-        self.gpio.output(self.dc_pin, self.gpio.LOW)
+        with self.spi.bus.lock:
+            self.gpio.output(self.dc_pin, self.gpio.HIGH)
+            writes = self.spi.write(bytes)
+            self.gpio.output(self.dc_pin, self.gpio.LOW)
+        if self.instrumentation is not None:
+            self.instrumentation.data(len(bytes), writes)
 
     def begin(self, vcc_state=SWITCH_CAP_VCC):
         self.reset()
@@ -219,10 +249,75 @@ class SH1106:
         self.command(self.SET_CONTRAST, contrast)
 
     def display(self):
-        self.display_block(self.bitmap, 0, 0, self.cols, self.col_offset)
+        if self.instrumentation is not None:
+            self.instrumentation.begin_flush()
+        if self.shadow_slack is None:
+            self.display_block(self.bitmap, 0, 0, self.cols, self.col_offset)
+        else:
+            self.display_changes()
+        if self.instrumentation is not None:
+            self.instrumentation.end_flush()
+
+    # The bytes of each page of the bitmap as shown, from col_offset.
+    def shown_pages(self):
+        bitmap = self.bitmap
+        return [bitmap.data[bitmap.page_slice(page, self.col_offset, self.col_offset + self.cols)]
+                for page in range(bitmap.rows >> 3)]
+
+    # Sends the spans of the bitmap that differ from the shadow.  Pages
+    # are addressed one at a time anyway, so spans are only joined along
+    # a page.
+    def display_changes(self):
+        pages = self.shown_pages()
+        if self.shadow is None or len(self.shadow) != len(pages):
+            self.display_block(self.bitmap, 0, 0, self.cols, self.col_offset)
+            self.shadow = pages
+            return
+        gap = self.shadow_slack >> 3
+        for (page, data) in enumerate(pages):
+            for (x0, x1) in gaugette.monochrome.changed_spans(self.shadow[page], data, gap):
+                self.send_region(x0 + self.col_offset, page << 3, x1 - x0, 8)
+
+    # Queues display() on the shared SPI bus, see gaugette.spi.Bus.
+    # A display queued again before it has been flushed is sent only once.
+    def schedule_display(self):
+        self.spi.bus.schedule(self, self.display)
 
     def display_cols(self, start_col, count):
+        if self.instrumentation is not None:
+            self.instrumentation.begin_flush()
         self.display_block(self.bitmap, 0, start_col, count, self.col_offset)
+        if self.instrumentation is not None:
+            self.instrumentation.end_flush()
+
+    # Sends the pages of self.bitmap covering the dx x dy rectangle at
+    # (x0, y0), where x0 is a bitmap column (the display shows columns
+    # col_offset onwards).  Each page is addressed separately as the
+    # SH1106 only has page addressing.
+    def display_region(self, x0, y0, dx, dy):
+        if self.instrumentation is not None:
+            self.instrumentation.begin_flush()
+        self.send_region(x0, y0, dx, dy)
+        if self.instrumentation is not None:
+            self.instrumentation.end_flush()
+
+    # display_region without ending an instrumentation frame.
+    def send_region(self, x0, y0, dx, dy):
+        bitmap = self.bitmap
+        clipped = gaugette.monochrome.clip(x0 - self.col_offset, y0, dx, dy, self.cols, bitmap.rows)
+        if clipped is None:
+            return
+        (x0, y0, x1, y1) = clipped
+        offset = self.col_offset
+        with self.spi.bus.lock:
+            for page in range((y0 >> 3), ((y1 - 1) >> 3) + 1):
+                data = bitmap.data[bitmap.page_slice(page, x0 + offset, x1 + offset)]
+                self.command(self.SET_PAGE_ADDRESS | page)
+                self.command(self.SET_LOW_COLUMN  | (x0 & 0x0F))
+                self.command(self.SET_HIGH_COLUMN | ((x0 >> 4) & 0x0F))
+                self.data(data)
+                if self.shadow is not None:
+                    self.shadow[page][x0:x1] = data
 
     # Transfers data from the passed bitmap (instance of sh1106.Bitmap)
     # starting at row <row> col <col>.
@@ -236,25 +331,29 @@ class SH1106:
     # col_count:  Number of cols to write.
     # col_offset: column offset in buffer to write from
     #
+    # The bus lock is held so the whole block is sent as one transaction.
+    #
     def display_block(self, bitmap, row, col, col_count, col_offset=0):
-        # The code here differs from the SSD1306
-        # since the SH1106 doesn't support SET_COL_ADDRESS
-        # or Vertical memory mode
-        page_count = bitmap.rows >> 3
-        page_start = row >> 3
-        page_end   = page_start + page_count - 1
-        col_start_l = col & 0x0F
-        col_start_h = (col >> 4) & 0x0F
-        col_end    = col + col_count - 1
-
-        length = col_count
-        while (page_start <= page_end):
-            self.command(self.SET_PAGE_ADDRESS | page_start)
-            self.command(self.SET_LOW_COLUMN  | col_start_l)
-            self.command(self.SET_HIGH_COLUMN | col_start_h)
-            start = (col_offset * page_count) + (page_start * bitmap.cols)
-            self.data(bitmap.data[start:start+length])
-            page_start += 1
+        self.shadow = None
+        with self.spi.bus.lock:
+            # The code here differs from the SSD1306
+            # since the SH1106 doesn't support SET_COL_ADDRESS
+            # or Vertical memory mode
+            page_count = bitmap.rows >> 3
+            page_start = row >> 3
+            page_end   = page_start + page_count - 1
+            col_start_l = col & 0x0F
+            col_start_h = (col >> 4) & 0x0F
+            col_end    = col + col_count - 1
+
+            length = col_count
+            while (page_start <= page_end):
+                self.command(self.SET_PAGE_ADDRESS | page_start)
+                self.command(self.SET_LOW_COLUMN  | col_start_l)
+                self.command(self.SET_HIGH_COLUMN | col_start_h)
+                start = (col_offset * page_count) + (page_start * bitmap.cols)
+                self.data(bitmap.data[start:start+length])
+                page_start += 1
 
     # Diagnostic print of the memory buffer to stdout
     def dump_buffer(self):
@@ -263,50 +362,60 @@ class SH1106:
     def draw_pixel(self, x, y, on=True):
         self.bitmap.draw_pixel(x, y, on)
 
+    # The 5x8 font's column bytes are already in page format, so a whole
+    # string is one page of bytes, copied straight into the bitmap when y
+    # is a multiple of 8 and merged into two pages with shifts otherwise.
     def draw_text(self, x, y, string):
         font_bytes = self.font.bytes
-        font_rows = self.font.rows
         font_cols = self.font.cols
-        for c in string:
-            p = ord(c) * font_cols
-            for col in range(0, font_cols):
-                mask = font_bytes[p]
-                p += 1
-                for row in range(0, 8):
-                    self.draw_pixel(x, y + row, mask & 0x1)
-                    mask >>= 1
-                x += 1
-
+        line = b''.join([font_bytes[ord(c) * font_cols:(ord(c) + 1) * font_cols] for c in string])
+        sprite = gaugette.monochrome.Sprite(len(line), 8)
+        sprite.data[:] = line
+        self.bitmap.blit(sprite, x, y, op=gaugette.monochrome.COPY)
+
+    # Each character cell of the 5x8 font is magnified size times and
+    # copied in, lit and unlit pixels alike.  Magnified glyphs are built
+    # once and cached, see gaugette.monochrome.scaled_glyph.
     def draw_text2(self, x, y, string, size=2, space=1):
-        font_bytes = self.font.bytes
-        font_rows = self.font.rows
-        font_cols = self.font.cols
         for c in string:
-            p = ord(c) * font_cols
-            for col in range(0, font_cols):
-                mask = font_bytes[p]
-                p += 1
-                py = y
-                for row in range(0, 8):
-                    for sy in range(0, size):
-                        px = x
-                        for sx in range(0, size):
-                            self.draw_pixel(px, py, mask & 0x1)
-                            px += 1
-                        py += 1
-                    mask >>= 1
-                x += size
-            x += space
+            glyph = gaugette.monochrome.scaled_glyph(self.font, ord(c), size)
+            self.bitmap.blit(glyph, x, y, op=gaugette.monochrome.COPY)
+            x += glyph.cols + space
 
     def clear_block(self, x0, y0, dx, dy):
         self.bitmap.clear_block(x0, y0, dx, dy)
 
+    def fill_rect(self, x0, y0, dx, dy, on=True):
+        self.bitmap.fill_rect(x0, y0, dx, dy, on)
+
+    def invert_rect(self, x0, y0, dx, dy):
+        self.bitmap.invert_rect(x0, y0, dx, dy)
+
+    def draw_hline(self, x0, y, dx, on=True):
+        self.bitmap.draw_hline(x0, y, dx, on)
+
+    def draw_vline(self, x, y0, dy, on=True):
+        self.bitmap.draw_vline(x, y0, dy, on)
+
+    def draw_frame(self, x0, y0, dx, dy, on=True):
+        self.bitmap.draw_frame(x0, y0, dx, dy, on)
+
+    def blit(self, src, dx, dy, sx=0, sy=0, w=None, h=None, op=gaugette.monochrome.OR):
+        self.bitmap.blit(src, dx, dy, sx, sy, w, h, op)
+
     def draw_text3(self, x, y, string, font):
         return self.bitmap.draw_text(x, y, string, font)
 
     def text_width(self, string, font):
         return self.bitmap.text_width(string, font)
 
+    # draw_text3 with the font scaled by any factor, eg. 1.5 or 3.
+    def draw_text_scaled(self, x, y, string, font, scale):
+        return self.bitmap.draw_text_scaled(x, y, string, font, scale)
+
+    def text_width_scaled(self, string, font, scale):
+        return gaugette.monochrome.text_width_scaled(string, font, scale)
+
     class Bitmap:
 
         # No longer column major due to the SH1106 not supporting
@@ -315,11 +424,10 @@ class SH1106:
             self.rows = rows
             self.cols = cols
             self.bytes_per_col = rows >> 3
-            self.data = [0] * (self.cols * self.bytes_per_col)
+            self.data = bytearray(self.cols * self.bytes_per_col)
 
         def clear(self):
-            for i in range(0,len(self.data)):
-                self.data[i] = 0
+            self.data[:] = bytes(len(self.data))
 
         # Diagnostic print of the memory buffer to stdout
         def dump(self):
@@ -349,25 +457,69 @@ class SH1106:
             else:
                 self.data[offset] &= (0xFF - bit_mask)
 
+        # Applies op (gaugette.monochrome.OR, AND or XOR) to every pixel of
+        # the rectangle: OR sets, AND clears and XOR inverts them.  Each
+        # page of the rectangle is one slice of the buffer, so this costs
+        # a few slice operations per page.
+        def rect_op(self, x0, y0, dx, dy, op):
+            clipped = gaugette.monochrome.clip(x0, y0, dx, dy, self.cols, self.rows)
+            if clipped is None:
+                return
+            (x0, y0, x1, y1) = clipped
+            for page, mask in gaugette.monochrome.page_masks(y0, y1):
+                span = self.page_slice(page, x0, x1)
+                gaugette.monochrome.apply_mask(self.data, span, x1 - x0, op, mask)
+
+        # The bytes of one page for columns x0 to x1-1
+        def page_slice(self, page, x0, x1):
+            start = page * self.cols
+            return slice(start + x0, start + x1)
+
+        def fill_rect(self, x0, y0, dx, dy, on=True):
+            self.rect_op(x0, y0, dx, dy, gaugette.monochrome.OR if on else gaugette.monochrome.AND)
+
         def clear_block(self, x0, y0, dx, dy):
-            for x in range(x0, x0 + dx):
-                for y in range(y0, y0 + dy):
-                    self.draw_pixel(x, y, 0)
+            self.rect_op(x0, y0, dx, dy, gaugette.monochrome.AND)
+
+        def invert_rect(self, x0, y0, dx, dy):
+            self.rect_op(x0, y0, dx, dy, gaugette.monochrome.XOR)
+
+        def draw_hline(self, x0, y, dx, on=True):
+            self.fill_rect(x0, y, dx, 1, on)
+
+        def draw_vline(self, x, y0, dy, on=True):
+            self.fill_rect(x, y0, 1, dy, on)
+
+        # Combines the w x h area at (sx, sy) of bitmap src into this
+        # bitmap at (dx, dy).  op is gaugette.monochrome.OR (the default),
+        # AND, XOR or COPY.  The area is clipped to both bitmaps and may
+        # start on any row; src may be an SSD1306 or SH1106 bitmap.
+        def blit(self, src, dx, dy, sx=0, sy=0, w=None, h=None, op=gaugette.monochrome.OR):
+            gaugette.monochrome.blit(self, src, dx, dy, sx, sy, w, h, op)
+
+        # One pixel outline of the rectangle
+        def draw_frame(self, x0, y0, dx, dy, on=True):
+            if dx <= 0 or dy <= 0:
+                return
+            self.draw_hline(x0, y0, dx, on)
+            self.draw_hline(x0, y0 + dy - 1, dx, on)
+            self.draw_vline(x0, y0 + 1, dy - 2, on)
+            self.draw_vline(x0 + dx - 1, y0 + 1, dy - 2, on)
 
         # returns the width in pixels of the string allowing for kerning & interchar-spaces
         def text_width(self, string, font):
             x = 0
             prev_char = None
             for c in string:
-                if c < font.start_char or c > font.end_char:
+                pos = gaugette.font.lookup(font, c)
+                if pos is None:
                     if prev_char != None:
                         x += font.space_width + prev_width + font.gap_width
                     prev_char = None
                 else:
-                    pos = ord(c) - ord(font.start_char)
                     (width, offset) = font.descriptors[pos]
                     if prev_char != None:
-                        x += font.kerning[prev_char][pos] + font.gap_width
+                        x += gaugette.font.advance(font, prev_char, pos) + font.gap_width
                     prev_char = pos
                     prev_width = width
 
@@ -376,37 +528,29 @@ class SH1106:
 
             return x
 
+        # As draw_text with the font scaled by any factor, eg. 1.5.
+        # Scaled glyphs are cached, see gaugette.monochrome.
+        def draw_text_scaled(self, x, y, string, font, scale):
+            return gaugette.monochrome.draw_text_scaled(self, x, y, string, font, scale)
+
         def draw_text(self, x, y, string, font):
-            height = font.char_height
             prev_char = None
 
             for c in string:
-                if c < font.start_char or c > font.end_char:
+                pos = gaugette.font.lookup(font, c)
+                if pos is None:
                     if prev_char != None:
                         x += font.space_width + prev_width + font.gap_width
                     prev_char = None
                 else:
-                    pos = ord(c) - ord(font.start_char)
                     (width, offset) = font.descriptors[pos]
                     if prev_char != None:
-                        x += font.kerning[prev_char][pos] + font.gap_width
+                        x += gaugette.font.advance(font, prev_char, pos) + font.gap_width
                     prev_char = pos
                     prev_width = width
-
-                    bytes_per_row = (width + 7) >> 3
-                    for row in range(0, height):
-                        py = y + row
-                        mask = 0x80
-                        p = offset
-                        for col in range(0, width):
-                            px = x + col
-                            if font.bitmaps[p] & mask:
-                                self.draw_pixel(px, py, 1)  # for kerning, never draw black
-                            mask >>= 1
-                            if mask == 0:
-                                mask = 0x80
-                                p += 1
-                        offset += bytes_per_row
+                    # ORed in, for kerning never draw black
+                    glyph = gaugette.monochrome.scaled_font_glyph(font, pos, 1)
+                    gaugette.monochrome.blit(self, glyph, x, y)
 
             if prev_char != None:
                 x += prev_width
@@ -415,8 +559,14 @@ class SH1106:
 
     # This is a helper class to display a scrollable list of text lines.
     # The list must have at least 1 item.
+    #
+    # list may be any sequence, or a callable returning the current
+    # sequence.  It is read as items are needed, so it can change
+    # (eg. a playlist growing) without rebuilding the ScrollingList.
+    # Items are rendered only when they are about to be shown, and the
+    # last cache_size rendered items are kept, keyed by their text.
     class ScrollingList:
-        def __init__(self, sh1106, list, font):
+        def __init__(self, sh1106, list, font, cache_size=8):
             self.sh1106 = sh1106
             self.list = list
             self.font = font
@@ -425,22 +575,47 @@ class SH1106:
             self.pan_row = -1
             self.pan_offset = 0
             self.pan_direction = 1
-            self.bitmaps = []
+            self.cache = collections.OrderedDict()
+            self.cache_size = cache_size
             self.rows = sh1106.rows
             self.cols = sh1106.cols
             self.bufrows = self.rows * 2
-            downset = (self.rows - font.char_height) >> 1
-            for text in list:
-                width = sh1106.cols
-                text_bitmap = sh1106.Bitmap(width, self.rows)
-                width = text_bitmap.draw_text(0, downset, text, font)
-                if width > 128:
-                    text_bitmap = sh1106.Bitmap(width + 15, self.rows)
-                    text_bitmap.draw_text(0, downset, text, font)
-                self.bitmaps.append(text_bitmap)
+            self.downset = (self.rows - font.char_height) >> 1
 
             # display the first word in the first position
-            self.sh1106.display_block(self.bitmaps[0], 0, 0, self.cols)
+            first = self.item_bitmap(0)
+            self.sh1106.display_block(first, 0, 0, self.cols)
+            # bitmap held in each half of the display ram, None if unknown
+            self.slots = [first, None]
+
+        def items(self):
+            return self.list() if callable(self.list) else self.list
+
+        # Returns the rendered bitmap for item n, rendering it if needed.
+        # items is the current sequence, read from the list if not given.
+        def item_bitmap(self, n, items=None):
+            if items is None:
+                items = self.items()
+            text = items[n]
+            text_bitmap = self.cache.get(text)
+            if text_bitmap is None:
+                text_bitmap = self.render(text)
+                self.cache[text] = text_bitmap
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            else:
+                self.cache.move_to_end(text)
+            return text_bitmap
+
+        def render(self, text):
+            # measured with the display's own bitmap rather than a new one
+            width = self.sh1106.text_width(text, self.font)
+            if width > self.cols:
+                text_bitmap = self.sh1106.Bitmap(width + 15, self.rows)
+            else:
+                text_bitmap = self.sh1106.Bitmap(self.cols, self.rows)
+            text_bitmap.draw_text(0, self.downset, text, self.font)
+            return text_bitmap
 
         # how many steps to the nearest home position
         def align_offset(self):
@@ -460,26 +635,52 @@ class SH1106:
                     self.scroll(sign)
             return self.position // self.rows
 
-        # scroll up or down.  Does multiple one-pixel scrolls if delta is not >1 or <-1
+        # scroll up or down by delta pixels.
+        # The start line is sent once at the end rather than for every pixel,
+        # and at each item boundary passed on the way so the hidden half
+        # really is hidden before it is reloaded.
         def scroll(self, delta):
             if delta == 0:
                 return
 
-            count = len(self.list)
+            items = self.items()
+            count = len(items)
             step = (delta > 0) - (delta < 0) # step = 1 or -1
+            max_position = count * self.rows
+            self.position %= max_position # the list may have shrunk
+            moved = False
             for i in range(0, delta, step):
                 if (self.position % self.rows) == 0:
-                    n = self.position // self.rows
-                    # at even boundary, need to update hidden row
-                    m = (n + step + count) % count
-                    row = (self.offset + self.rows) % self.bufrows
-                    self.sh1106.display_block(self.bitmaps[m], row, 0, self.cols)
-                    if m == self.pan_row:
-                        self.pan_offset = 0
+                    if moved:
+                        self.sh1106.command(self.sh1106.SET_START_LINE | self.offset)
+                        moved = False
+                    # at even boundary, need the next item in the hidden half
+                    self.prefetch(step, items)
                 self.offset = (self.offset + self.bufrows + step) % self.bufrows
-                self.sh1106.command(self.sh1106.SET_START_LINE | self.offset)
-                max_position = count * self.rows
                 self.position = (self.position + max_position + step) % max_position
+                moved = True
+            self.sh1106.command(self.sh1106.SET_START_LINE | self.offset)
+
+        # At a home position, loads the item in direction step (1 or -1)
+        # into the hidden half of the display ram unless it is already there,
+        # so a following scroll starts without a transfer.  items is as
+        # for item_bitmap.
+        def prefetch(self, step, items=None):
+            if (self.position % self.rows) != 0:
+                return
+            if items is None:
+                items = self.items()
+            count = len(items)
+            n = self.position // self.rows
+            m = (n + step + count) % count
+            text_bitmap = self.item_bitmap(m, items)
+            row = (self.offset + self.rows) % self.bufrows
+            slot = row // self.rows
+            if self.slots[slot] is not text_bitmap:
+                self.sh1106.display_block(text_bitmap, row, 0, self.cols)
+                self.slots[slot] = text_bitmap
+                if m == self.pan_row:
+                    self.pan_offset = 0
 
         # pans the current row back and forth repeatedly.
         # Note that this currently only works if we are at a home position.
@@ -489,7 +690,7 @@ class SH1106:
                 self.pan_row = n
                 self.pan_offset = 0
 
-            text_bitmap = self.bitmaps[n]
+            text_bitmap = self.item_bitmap(n)
             if text_bitmap.cols > self.cols:
                 row = self.offset # this only works if we are at a home position
                 if self.pan_direction > 0:
@@ -503,3 +704,5 @@ class SH1106:
                     else:
                         self.pan_direction = 1
                 self.sh1106.display_block(text_bitmap, row, 0, self.cols, self.pan_offset)
+                # a panned item has to be reloaded when it is next shown
+                self.slots[row // self.rows] = None
@@ -0,0 +1,112 @@
+#----------------------------------------------------------------------
+# simulator.py from https://github.com/guyc/py-gaugette
+#
+# Simulated GPIO and SPI backends.  These implement the same interface
+# as gaugette.gpio.GPIO and gaugette.spi.SPI but talk to no hardware,
+# so the display and input drivers can be exercised on any machine
+# (benchmarks, offline rendering, development on a desktop).
+#
+# Both classes keep simple counters of the calls made on them so
+# callers can measure how much bus and pin traffic an operation causes.
+#
+# Setting GAUGETTE_PLATFORM=simulator (or calling
+# gaugette.platform.set_platform('simulator')) makes gaugette.gpio.GPIO
+# and gaugette.spi.SPI use these backends, so unmodified programs run.
+#
+# Usage:
+#
+#     import gaugette.simulator
+#     import gaugette.ssd1306
+#     gpio = gaugette.simulator.GPIO()
+#     spi = gaugette.simulator.SPI(bus=0, device=0)
+#     led = gaugette.ssd1306.SSD1306(gpio, spi, reset_pin=15, dc_pin=16)
+#
+#----------------------------------------------------------------------
+
+import gaugette.spi
+
+class GPIO:
+
+    OUT = 1
+    IN = 0
+    HIGH = 1
+    LOW = 0
+    PUD_OFF = 0
+    PUD_DOWN = 1
+    PUD_UP = 2
+    EDGE_FALLING = 1
+    EDGE_RISING = 2
+    EDGE_BOTH = 3
+
+    def __init__(self):
+        self.levels = {}
+        self.directions = {}
+        self.callbacks = {}
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.setup_count = 0
+        self.output_count = 0
+        self.input_count = 0
+
+    def setup(self, channel, direction, pull_up_down=None):
+        self.setup_count += 1
+        self.directions[channel] = direction
+        if channel not in self.levels:
+            self.levels[channel] = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+
+    def output(self, channel, value):
+        self.output_count += 1
+        self.levels[channel] = value
+
+    def input(self, channel):
+        self.input_count += 1
+        return self.levels.get(channel, self.LOW)
+
+    def trigger(self, channel, edge, callback):
+        self.callbacks[channel] = (edge, callback)
+
+    # Drive an input pin from outside, as the attached hardware would.
+    # Registered trigger callbacks fire on matching edges.
+    def set_input(self, channel, value):
+        previous = self.levels.get(channel, self.LOW)
+        self.levels[channel] = value
+        if channel in self.callbacks and value != previous:
+            edge, callback = self.callbacks[channel]
+            rising = value == self.HIGH
+            if edge == self.EDGE_BOTH or (edge == self.EDGE_RISING) == rising:
+                callback()
+
+
+class SPI:
+
+    # bulk=False emulates a backend without writebytes2, so write() is
+    # split into max_transfer sized writebytes calls.
+    def __init__(self, bus=0, device=0, max_speed_hz=8000000, mode=0, bits_per_word=8, max_transfer=4096,
+                 bulk=True):
+        self.bus = gaugette.spi.get_bus(bus)
+        self.bulk = bulk
+        self.device = device
+        self.max_speed_hz = max_speed_hz
+        self.mode = mode
+        self.bits_per_word = bits_per_word
+        self.max_transfer = max_transfer
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.writebytes_count = 0
+        self.bytes_written = 0
+
+    def writebytes(self, data):
+        self.writebytes_count += 1
+        self.bytes_written += len(data)
+
+    # As in spidev, writebytes2 takes a buffer of any length.
+    def writebytes2(self, data):
+        self.writebytes(data)
+
+    def write(self, data):
+        if self.bulk:
+            self.writebytes2(data)
+            return 1
+        return gaugette.spi.write_chunks(self.writebytes, data, self.max_transfer)
@@ -7,23 +7,249 @@
 #
 # On the RPi, we use spidev
 # On the BBB, we use Adafruit_BBIO.SPI
+# On the simulator platform, we use gaugette.simulator.SPI
+#
+# The platform is detected when the first SPI object is created,
+# see gaugette.platform.
+#
+# The bus clock, mode and word size can be set in the constructor or
+# later through the max_speed_hz, mode and bits_per_word attributes,
+# which are passed through to the underlying device.
+#
+# max_transfer is the largest number of bytes a single writebytes call
+# may be given.  It is queried from the platform (the spidev kernel
+# module's bufsiz on the RPi) and may be lowered in the constructor.
+#
+# write() is the preferred way to send display data.  It accepts a list,
+# bytes, bytearray or memoryview.  When spidev provides writebytes2
+# (py-spidev 3.4 and later) the whole buffer is handed over in one call
+# and spidev splits it into bufsiz transfers internally.  Older backends
+# fall back to chunked writebytes calls of at most max_transfer bytes.
+#
+# Several devices on one bus (one SPI object per chip select) share a
+# Bus object, available as spi.bus.  Drivers hold bus.lock for the whole
+# of a command + data sequence so that displays driven from different
+# threads cannot interleave on the wire, or race on a shared D/C pin.
+#
+# Flushes can also be queued with bus.schedule(device, flush).  Pending
+# flushes run in arrival order, one per device, so a device that keeps
+# redrawing cannot starve the others, and a second flush queued for a
+# device before its first has run is merged with it.  Pending flushes
+# are run by bus.flush(), or continuously by a worker thread:
+#
+#     bus = gaugette.spi.get_bus(0)
+#     bus.start_worker(1/30.0)
+#     ...
+#     led1.schedule_display()
+#     led2.schedule_display()
 #
 #----------------------------------------------------------------------
 import gaugette
 import gaugette.platform
+import collections
+import threading
+import time
+import traceback
+
+# py-spidev's writebytes rejects lists longer than this regardless of
+# the kernel buffer size.
+SPIDEV_MAX_WRITEBYTES = 4096
+SPIDEV_BUFSIZ_PATH = '/sys/module/spidev/parameters/bufsiz'
+
+# Adafruit_BBIO's writebytes is limited to 255 bytes.
+# revisit - change to 1024 when Adafruit_BBIO is fixed.
+BBIO_MAX_WRITEBYTES = 255
+
+#----------------------------------------------------------------------
+# Sends data through a legacy writebytes function that needs lists of
+# at most max_transfer bytes.  Returns the number of writebytes calls.
+def write_chunks(writebytes, data, max_transfer):
+    if type(data) is not list:
+        data = list(data)
+    length = len(data)
+    if length <= max_transfer:
+        writebytes(data)
+        return 1
+    calls = 0
+    for start in range(0, length, max_transfer):
+        writebytes(data[start:start+max_transfer])
+        calls += 1
+    return calls
+
+class Bus:
+
+    def __init__(self, number):
+        self.number = number
+        self.lock = threading.RLock()
+        self.condition = threading.Condition()
+        self.pending = collections.OrderedDict()
+        self.merged = 0
+
+    # Queue flush() to run for device, replacing any flush already
+    # pending for it.  Replacing keeps the device's place in the queue.
+    def schedule(self, device, flush):
+        with self.condition:
+            if device in self.pending:
+                self.merged += 1
+            self.pending[device] = flush
+            self.condition.notify()
+
+    # Runs the flushes pending when called, oldest first, and returns
+    # the number run.  Each flush holds the bus lock while it runs.  A
+    # flush that raises does not stop the rest of the batch; the first
+    # exception is re-raised once the batch is done.
+    def flush(self):
+        with self.condition:
+            batch = list(self.pending.values())
+            self.pending.clear()
+        error = None
+        for flush in batch:
+            try:
+                with self.lock:
+                    flush()
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+        return len(batch)
+
+    # Starts a Worker for this bus and returns it.
+    def start_worker(self, interval=0, on_error=None):
+        worker = self.Worker(self, interval, on_error)
+        worker.start()
+        return worker
+
+    #----------------------------------------------------------------------
+    # Optional thread to run scheduled flushes as they arrive.
+    # interval limits the flush rate, eg. 1/30.0 for at most 30 passes
+    # per second; later requests for a device are merged meanwhile.
+    # A failing flush (eg. a transient IOError from spidev) is passed to
+    # on_error, or printed to stderr, and the worker carries on.
+    #----------------------------------------------------------------------
+
+    class Worker(threading.Thread):
+        def __init__(self, bus, interval=0, on_error=None):
+            threading.Thread.__init__(self)
+            self.bus = bus
+            self.interval = interval
+            self.on_error = on_error
+            self.stopping = False
+            self.daemon = True
+
+        def run(self):
+            condition = self.bus.condition
+            while not self.stopping:
+                with condition:
+                    while not self.bus.pending and not self.stopping:
+                        condition.wait()
+                try:
+                    self.bus.flush()
+                except Exception as e:
+                    if self.on_error is not None:
+                        self.on_error(e)
+                    else:
+                        traceback.print_exc()
+                if self.interval > 0:
+                    time.sleep(self.interval)
+
+        def stop(self):
+            with self.bus.condition:
+                self.stopping = True
+                self.bus.condition.notify()
+
+buses = {}
+buses_lock = threading.Lock()
+
+# Returns the shared Bus object for a bus number.
+def get_bus(number):
+    with buses_lock:
+        if number not in buses:
+            buses[number] = Bus(number)
+        return buses[number]
 
 class SPI:
-    def __init__(self, bus, device):
+    def __init__(self, bus, device, max_speed_hz=None, mode=None, bits_per_word=None, max_transfer=None):
+        self.bus = get_bus(bus)
+        self.device = device
         if gaugette.platform.isRaspberryPi:
             import spidev
             self.spi = spidev.SpiDev()
             self.spi.open(bus, device)
             self.writebytes = self.spi.writebytes
+            self.speed_attr = 'max_speed_hz'
+            self.bits_attr = 'bits_per_word'
+            limit = self.spidev_bufsiz()
+            self.bulk = hasattr(self.spi, 'writebytes2')
 
-        elif gaugette.platform == gaugette.platform.isBeagleBoneBlack:
+        elif gaugette.platform.isBeagleBoneBlack:
             import Adafruit_BBIO.SPI
             self.spi = Adafruit_BBIO.SPI.SPI(bus, device)
             self.writebytes = self.spi.writebytes
+            self.speed_attr = 'msh'
+            self.bits_attr = 'bpw'
+            limit = BBIO_MAX_WRITEBYTES
+            self.bulk = False
+
+        elif gaugette.platform.isSimulator:
+            import gaugette.simulator as simulator
+            self.spi = simulator.SPI(bus, device)
+            self.writebytes = self.spi.writebytes
+            self.speed_attr = 'max_speed_hz'
+            self.bits_attr = 'bits_per_word'
+            limit = self.spi.max_transfer
+            self.bulk = self.spi.bulk
 
         else:
             raise NotImplementedError("This platform is not supported.")
+
+        self.max_transfer = limit if max_transfer is None else min(max_transfer, limit)
+        if max_speed_hz is not None:
+            self.max_speed_hz = max_speed_hz
+        if mode is not None:
+            self.mode = mode
+        if bits_per_word is not None:
+            self.bits_per_word = bits_per_word
+
+    #----------------------------------------------------------------------
+    # Sends a buffer of any length.  Returns the number of backend calls.
+    def write(self, data):
+        if self.bulk:
+            self.spi.writebytes2(data)
+            return 1
+        return write_chunks(self.writebytes, data, self.max_transfer)
+
+    #----------------------------------------------------------------------
+    # The kernel spidev driver rejects transfers larger than its bufsiz
+    # module parameter (4096 unless changed on the kernel command line).
+    def spidev_bufsiz(self):
+        try:
+            with open(SPIDEV_BUFSIZ_PATH) as f:
+                bufsiz = int(f.read())
+        except (IOError, ValueError):
+            bufsiz = SPIDEV_MAX_WRITEBYTES
+        return min(bufsiz, SPIDEV_MAX_WRITEBYTES)
+
+    @property
+    def max_speed_hz(self):
+        return getattr(self.spi, self.speed_attr)
+
+    @max_speed_hz.setter
+    def max_speed_hz(self, value):
+        setattr(self.spi, self.speed_attr, value)
+
+    @property
+    def mode(self):
+        return self.spi.mode
+
+    @mode.setter
+    def mode(self, value):
+        self.spi.mode = value
+
+    @property
+    def bits_per_word(self):
+        return getattr(self.spi, self.bits_attr)
+
+    @bits_per_word.setter
+    def bits_per_word(self, value):
+        setattr(self.spi, self.bits_attr, value)
@@ -53,8 +53,13 @@
 import gaugette.platform
 import gaugette.gpio
 import gaugette.spi
+import gaugette.font
 import gaugette.font5x8
+import gaugette.instrumentation
+import gaugette.monochrome
+import gaugette.regions
 import gaugette.platform
+import collections
 import time
 import sys
 
@@ -75,6 +80,8 @@ class SSD1306:
     LEFT_HORIZ_SCROLL     = 0x27
     VERT_AND_RIGHT_HORIZ_SCROLL = 0x29
     VERT_AND_LEFT_HORIZ_SCROLL = 0x2A
+    RIGHT_CONTENT_SCROLL  = 0x2C
+    LEFT_CONTENT_SCROLL   = 0x2D
     DEACTIVATE_SCROLL     = 0x2E
     ACTIVATE_SCROLL       = 0x2F
     SET_START_LINE        = 0x40
@@ -101,6 +108,12 @@ class SSD1306:
     MEMORY_MODE_VERT  = 0x01
     MEMORY_MODE_PAGE  = 0x02
 
+    # Continuous scroll step interval in frames, and its command code
+    SCROLL_INTERVALS = {2: 0x07, 3: 0x04, 4: 0x05, 5: 0x00, 25: 0x06, 64: 0x01, 128: 0x02, 256: 0x03}
+
+    # Setting up a window costs 8 command bytes, about 64 pixels of data
+    SHADOW_SLACK = 64
+
     # Device name will be /dev/spidev-{bus}.{device}
     # dc_pin is the data/commmand pin.  This line is HIGH for data, LOW for command.
     # We will keep d/c low and bump it high only for commands with data
@@ -123,8 +136,37 @@ class SSD1306:
         self.col_offset = 0
         self.bitmap = self.Bitmap(buffer_cols, buffer_rows)
         self.flipped = False
+        self.instrumentation = None
+        self.shadow = None
+        self.shadow_slack = None
+
+    # Opt-in per-frame bus and timing counters, see gaugette.instrumentation.
+    # callback, if given, is called with the FrameStats of each completed frame.
+    def enable_instrumentation(self, callback=None):
+        self.instrumentation = gaugette.instrumentation.Instrumentation(callback)
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        self.instrumentation = None
+
+    # Opt-in shadow of the display ram.  display() then compares the
+    # bitmap with what was last sent and sends only the changed areas,
+    # so an application can redraw everything each frame and still send
+    # only what changed.  Changed spans of each page become windows,
+    # merged while that costs no more than slack extra pixels (see
+    # gaugette.regions.merge).  The first display() after enabling sends
+    # everything.  display_block writes the display ram directly, so it
+    # makes the next display() send everything again.
+    def enable_shadow(self, slack=SHADOW_SLACK):
+        self.shadow_slack = slack
+        self.shadow = None
+
+    def disable_shadow(self):
+        self.shadow_slack = None
+        self.shadow = None
 
     def reset(self):
+        self.shadow = None
         self.gpio.output(self.reset_pin, self.gpio.LOW)
         time.sleep(0.010) # 10ms
         self.gpio.output(self.reset_pin, self.gpio.HIGH)
@@ -132,21 +174,18 @@ class SSD1306:
     def command(self, *bytes):
         # already low
         # self.gpio.output(self.dc_pin, self.gpio.LOW)
-        self.spi.writebytes(list(bytes))
+        if self.instrumentation is not None:
+            self.instrumentation.command(len(bytes))
+        with self.spi.bus.lock:
+            self.spi.writebytes(list(bytes))
 
     def data(self, bytes):
-        self.gpio.output(self.dc_pin, self.gpio.HIGH)
-        #  chunk data to work around 255 byte limitation in adafruit implementation of writebytes
-        # revisit - change to 1024 when Adafruit_BBIO is fixed.
-        max_xfer = 255 if gaugette.platform.isBeagleBoneBlack else 1024
-        start = 0
-        remaining = len(bytes)
-        while remaining > 0:
-            count = remaining if remaining <= max_xfer else max_xfer
-            remaining -= count
-            self.spi.writebytes(bytes[start:start+count])
-            start += count
-        self.gpio.output(self.dc_pin, self.gpio.LOW)
+        with self.spi.bus.lock:
+            self.gpio.output(self.dc_pin, self.gpio.HIGH)
+            writes = self.spi.write(bytes)
+            self.gpio.output(self.dc_pin, self.gpio.LOW)
+        if self.instrumentation is not None:
+            self.instrumentation.data(len(bytes), writes)
 
     def begin(self, vcc_state=SWITCH_CAP_VCC):
         time.sleep(0.001) # 1ms
@@ -202,11 +241,118 @@ class SSD1306:
     def set_contrast(self, contrast=0x7f):
         self.command(self.SET_CONTRAST, contrast)
 
+    # Starts the controller scrolling pages page_start to page_end
+    # horizontally by one column every <frames> frames (one of the keys
+    # of SCROLL_INTERVALS), wrapping around.  No further transfers are
+    # needed while it runs.  The display ram is altered by scrolling, so
+    # rewrite it after stop_scroll().
+    def start_scroll(self, page_start, page_end, left=True, frames=2):
+        opcode = self.LEFT_HORIZ_SCROLL if left else self.RIGHT_HORIZ_SCROLL
+        self.shadow = None
+        with self.spi.bus.lock:
+            self.command(self.DEACTIVATE_SCROLL)
+            self.command(opcode, 0x00, page_start, self.SCROLL_INTERVALS[frames], page_end, 0x00, 0xFF)
+            self.command(self.ACTIVATE_SCROLL)
+
+    # The display ram no longer matches the shadow after scrolling, so
+    # the next display() sends everything.
+    def stop_scroll(self):
+        self.shadow = None
+        self.command(self.DEACTIVATE_SCROLL)
+
+    # Shifts the block displayed at <row> one column left (step > 0) or
+    # right (step < 0) with the controller's one-shot content scroll, and
+    # sends only the newly exposed column from bitmap.  col_offset is the
+    # new offset into bitmap, as for display_block.
+    # The controller needs at least two frames between content scrolls.
+    # Not all SSD1306 revisions implement content scrolling; Marquee can
+    # fall back to sending whole blocks.
+    def pan_block(self, bitmap, row, col_offset, step):
+        page_start = row >> 3
+        page_end = page_start + (bitmap.rows >> 3) - 1
+        last_col = self.cols - 1
+        with self.spi.bus.lock:
+            if step > 0:
+                self.command(self.LEFT_CONTENT_SCROLL, 0x00, page_start, 0x01, page_end, 0, last_col)
+                self.display_block(bitmap, row, last_col, 1, col_offset + last_col)
+            else:
+                self.command(self.RIGHT_CONTENT_SCROLL, 0x00, page_start, 0x01, page_end, 0, last_col)
+                self.display_block(bitmap, row, 0, 1, col_offset)
+
     def display(self):
-        self.display_block(self.bitmap, 0, 0, self.cols, self.col_offset)
+        if self.instrumentation is not None:
+            self.instrumentation.begin_flush()
+        if self.shadow_slack is None:
+            self.display_block(self.bitmap, 0, 0, self.cols, self.col_offset)
+        else:
+            self.display_changes()
+        if self.instrumentation is not None:
+            self.instrumentation.end_flush()
+
+    # The bytes of each page of the bitmap as shown, from col_offset.
+    def shown_pages(self):
+        bitmap = self.bitmap
+        return [bitmap.data[bitmap.page_slice(page, self.col_offset, self.col_offset + self.cols)]
+                for page in range(bitmap.rows >> 3)]
+
+    # Sends the areas of the bitmap that differ from the shadow.
+    def display_changes(self):
+        pages = self.shown_pages()
+        if self.shadow is None or len(self.shadow) != len(pages):
+            self.display_block(self.bitmap, 0, 0, self.cols, self.col_offset)
+            self.shadow = pages
+            return
+        gap = self.shadow_slack >> 3
+        rects = []
+        for (page, data) in enumerate(pages):
+            for (x0, x1) in gaugette.monochrome.changed_spans(self.shadow[page], data, gap):
+                rects.append((x0 + self.col_offset, page << 3, x1 - x0, 8))
+        for rect in gaugette.regions.merge(rects, self.shadow_slack):
+            self.send_region(*rect)
+
+    # Queues display() on the shared SPI bus, see gaugette.spi.Bus.
+    # A display queued again before it has been flushed is sent only once.
+    def schedule_display(self):
+        self.spi.bus.schedule(self, self.display)
 
     def display_cols(self, start_col, count):
+        if self.instrumentation is not None:
+            self.instrumentation.begin_flush()
         self.display_block(self.bitmap, 0, start_col, count, self.col_offset)
+        if self.instrumentation is not None:
+            self.instrumentation.end_flush()
+
+    # Sends the pages of self.bitmap covering the dx x dy rectangle at
+    # (x0, y0), where x0 is a bitmap column (the display shows columns
+    # col_offset onwards).  Horizontal memory mode is used so that each
+    # page of the rectangle is a single slice of the bitmap.
+    def display_region(self, x0, y0, dx, dy):
+        if self.instrumentation is not None:
+            self.instrumentation.begin_flush()
+        self.send_region(x0, y0, dx, dy)
+        if self.instrumentation is not None:
+            self.instrumentation.end_flush()
+
+    # display_region without ending an instrumentation frame.
+    def send_region(self, x0, y0, dx, dy):
+        bitmap = self.bitmap
+        clipped = gaugette.monochrome.clip(x0 - self.col_offset, y0, dx, dy, self.cols, bitmap.rows)
+        if clipped is None:
+            return
+        (x0, y0, x1, y1) = clipped
+        page_start = y0 >> 3
+        page_end = (y1 - 1) >> 3
+        offset = self.col_offset
+        pages = [bitmap.data[bitmap.page_slice(page, x0 + offset, x1 + offset)]
+                 for page in range(page_start, page_end + 1)]
+        with self.spi.bus.lock:
+            self.command(self.SET_MEMORY_MODE, self.MEMORY_MODE_HORIZ)
+            self.command(self.SET_PAGE_ADDRESS, page_start, page_end)
+            self.command(self.SET_COL_ADDRESS, x0, x1 - 1)
+            self.data(b''.join(pages))
+        if self.shadow is not None:
+            for (page, data) in enumerate(pages, page_start):
+                self.shadow[page][x0:x1] = data
 
     # Transfers data from the passed bitmap (instance of ssd1306.Bitmap)
     # starting at row <row> col <col>.
@@ -220,18 +366,22 @@ class SSD1306:
     # col_count:  Number of cols to write.
     # col_offset: column offset in buffer to write from
     #
+    # The bus lock is held so the whole block is sent as one transaction.
+    #
     def display_block(self, bitmap, row, col, col_count, col_offset=0):
-        page_count = bitmap.rows >> 3
-        page_start = row >> 3
-        page_end   = page_start + page_count - 1
-        col_start  = col
-        col_end    = col + col_count - 1
-        self.command(self.SET_MEMORY_MODE, self.MEMORY_MODE_VERT)
-        self.command(self.SET_PAGE_ADDRESS, page_start, page_end)
-        self.command(self.SET_COL_ADDRESS, col_start, col_end)
-        start = col_offset * page_count
-        length = col_count * page_count
-        self.data(bitmap.data[start:start+length])
+        self.shadow = None
+        with self.spi.bus.lock:
+            page_count = bitmap.rows >> 3
+            page_start = row >> 3
+            page_end   = page_start + page_count - 1
+            col_start  = col
+            col_end    = col + col_count - 1
+            self.command(self.SET_MEMORY_MODE, self.MEMORY_MODE_VERT)
+            self.command(self.SET_PAGE_ADDRESS, page_start, page_end)
+            self.command(self.SET_COL_ADDRESS, col_start, col_end)
+            start = col_offset * page_count
+            length = col_count * page_count
+            self.data(bitmap.data[start:start+length])
 
     # Diagnostic print of the memory buffer to stdout
     def dump_buffer(self):
@@ -240,50 +390,60 @@ class SSD1306:
     def draw_pixel(self, x, y, on=True):
         self.bitmap.draw_pixel(x, y, on)
 
+    # The 5x8 font's column bytes are already in page format, so a whole
+    # string is one page of bytes, copied straight into the bitmap when y
+    # is a multiple of 8 and merged into two pages with shifts otherwise.
     def draw_text(self, x, y, string):
         font_bytes = self.font.bytes
-        font_rows = self.font.rows
         font_cols = self.font.cols
-        for c in string:
-            p = ord(c) * font_cols
-            for col in range(0, font_cols):
-                mask = font_bytes[p]
-                p += 1
-                for row in range(0, 8):
-                    self.draw_pixel(x, y + row, mask & 0x1)
-                    mask >>= 1
-                x += 1
-
+        line = b''.join([font_bytes[ord(c) * font_cols:(ord(c) + 1) * font_cols] for c in string])
+        sprite = gaugette.monochrome.Sprite(len(line), 8)
+        sprite.data[:] = line
+        self.bitmap.blit(sprite, x, y, op=gaugette.monochrome.COPY)
+
+    # Each character cell of the 5x8 font is magnified size times and
+    # copied in, lit and unlit pixels alike.  Magnified glyphs are built
+    # once and cached, see gaugette.monochrome.scaled_glyph.
     def draw_text2(self, x, y, string, size=2, space=1):
-        font_bytes = self.font.bytes
-        font_rows = self.font.rows
-        font_cols = self.font.cols
         for c in string:
-            p = ord(c) * font_cols
-            for col in range(0, font_cols):
-                mask = font_bytes[p]
-                p += 1
-                py = y
-                for row in range(0, 8):
-                    for sy in range(0, size):
-                        px = x
-                        for sx in range(0, size):
-                            self.draw_pixel(px, py, mask & 0x1)
-                            px += 1
-                        py += 1
-                    mask >>= 1
-                x += size
-            x += space
+            glyph = gaugette.monochrome.scaled_glyph(self.font, ord(c), size)
+            self.bitmap.blit(glyph, x, y, op=gaugette.monochrome.COPY)
+            x += glyph.cols + space
 
     def clear_block(self, x0, y0, dx, dy):
         self.bitmap.clear_block(x0, y0, dx, dy)
 
+    def fill_rect(self, x0, y0, dx, dy, on=True):
+        self.bitmap.fill_rect(x0, y0, dx, dy, on)
+
+    def invert_rect(self, x0, y0, dx, dy):
+        self.bitmap.invert_rect(x0, y0, dx, dy)
+
+    def draw_hline(self, x0, y, dx, on=True):
+        self.bitmap.draw_hline(x0, y, dx, on)
+
+    def draw_vline(self, x, y0, dy, on=True):
+        self.bitmap.draw_vline(x, y0, dy, on)
+
+    def draw_frame(self, x0, y0, dx, dy, on=True):
+        self.bitmap.draw_frame(x0, y0, dx, dy, on)
+
+    def blit(self, src, dx, dy, sx=0, sy=0, w=None, h=None, op=gaugette.monochrome.OR):
+        self.bitmap.blit(src, dx, dy, sx, sy, w, h, op)
+
     def draw_text3(self, x, y, string, font):
         return self.bitmap.draw_text(x, y, string, font)
 
     def text_width(self, string, font):
         return self.bitmap.text_width(string, font)
 
+    # draw_text3 with the font scaled by any factor, eg. 1.5 or 3.
+    def draw_text_scaled(self, x, y, string, font, scale):
+        return self.bitmap.draw_text_scaled(x, y, string, font, scale)
+
+    def text_width_scaled(self, string, font, scale):
+        return gaugette.monochrome.text_width_scaled(string, font, scale)
+
     class Bitmap:
 
         # Pixels are stored in column-major order!
@@ -294,11 +454,10 @@ class SSD1306:
             self.rows = rows
             self.cols = cols
             self.bytes_per_col = rows >> 3
-            self.data = [0] * (self.cols * self.bytes_per_col)
+            self.data = bytearray(self.cols * self.bytes_per_col)
 
         def clear(self):
-            for i in range(0, len(self.data)):
-                self.data[i] = 0
+            self.data[:] = bytes(len(self.data))
 
         # Diagnostic print of the memory buffer to stdout
         def dump(self):
@@ -328,25 +487,70 @@ class SSD1306:
             else:
                 self.data[offset] &= (0xFF - bit_mask)
 
+        # Applies op (gaugette.monochrome.OR, AND or XOR) to every pixel of
+        # the rectangle: OR sets, AND clears and XOR inverts them.  Each
+        # page of the rectangle is one slice of the buffer, so this costs
+        # a few slice operations per page.
+        def rect_op(self, x0, y0, dx, dy, op):
+            clipped = gaugette.monochrome.clip(x0, y0, dx, dy, self.cols, self.rows)
+            if clipped is None:
+                return
+            (x0, y0, x1, y1) = clipped
+            for page, mask in gaugette.monochrome.page_masks(y0, y1):
+                span = self.page_slice(page, x0, x1)
+                gaugette.monochrome.apply_mask(self.data, span, x1 - x0, op, mask)
+
+        # The bytes of one page for columns x0 to x1-1, a strided slice as
+        # the buffer is column-major.
+        def page_slice(self, page, x0, x1):
+            step = self.bytes_per_col
+            return slice(page + x0 * step, page + x1 * step, step)
+
+        def fill_rect(self, x0, y0, dx, dy, on=True):
+            self.rect_op(x0, y0, dx, dy, gaugette.monochrome.OR if on else gaugette.monochrome.AND)
+
         def clear_block(self, x0, y0, dx, dy):
-            for x in range(x0, x0 + dx):
-                for y in range(y0, y0 + dy):
-                    self.draw_pixel(x, y, 0)
+            self.rect_op(x0, y0, dx, dy, gaugette.monochrome.AND)
+
+        def invert_rect(self, x0, y0, dx, dy):
+            self.rect_op(x0, y0, dx, dy, gaugette.monochrome.XOR)
+
+        def draw_hline(self, x0, y, dx, on=True):
+            self.fill_rect(x0, y, dx, 1, on)
+
+        def draw_vline(self, x, y0, dy, on=True):
+            self.fill_rect(x, y0, 1, dy, on)
+
+        # Combines the w x h area at (sx, sy) of bitmap src into this
+        # bitmap at (dx, dy).  op is gaugette.monochrome.OR (the default),
+        # AND, XOR or COPY.  The area is clipped to both bitmaps and may
+        # start on any row; src may be an SSD1306 or SH1106 bitmap.
+        def blit(self, src, dx, dy, sx=0, sy=0, w=None, h=None, op=gaugette.monochrome.OR):
+            gaugette.monochrome.blit(self, src, dx, dy, sx, sy, w, h, op)
+
+        # One pixel outline of the rectangle
+        def draw_frame(self, x0, y0, dx, dy, on=True):
+            if dx <= 0 or dy <= 0:
+                return
+            self.draw_hline(x0, y0, dx, on)
+            self.draw_hline(x0, y0 + dy - 1, dx, on)
+            self.draw_vline(x0, y0 + 1, dy - 2, on)
+            self.draw_vline(x0 + dx - 1, y0 + 1, dy - 2, on)
 
         # returns the width in pixels of the string allowing for kerning & interchar-spaces
         def text_width(self, string, font):
             x = 0
             prev_char = None
             for c in string:
-                if c < font.start_char or c > font.end_char:
+                pos = gaugette.font.lookup(font, c)
+                if pos is None:
                     if prev_char != None:
                         x += font.space_width + prev_width + font.gap_width
                     prev_char = None
                 else:
-                    pos = ord(c) - ord(font.start_char)
                     (width, offset) = font.descriptors[pos]
                     if prev_char != None:
-                        x += font.kerning[prev_char][pos] + font.gap_width
+                        x += gaugette.font.advance(font, prev_char, pos) + font.gap_width
                     prev_char = pos
                     prev_width = width
 
@@ -355,47 +559,123 @@ class SSD1306:
 
             return x
 
+        # As draw_text with the font scaled by any factor, eg. 1.5.
+        # Scaled glyphs are cached, see gaugette.monochrome.
+        def draw_text_scaled(self, x, y, string, font, scale):
+            return gaugette.monochrome.draw_text_scaled(self, x, y, string, font, scale)
+
         def draw_text(self, x, y, string, font):
-            height = font.char_height
             prev_char = None
 
             for c in string:
-                if c < font.start_char or c > font.end_char:
+                pos = gaugette.font.lookup(font, c)
+                if pos is None:
                     if prev_char != None:
                         x += font.space_width + prev_width + font.gap_width
                     prev_char = None
                 else:
-                    pos = ord(c) - ord(font.start_char)
                     (width, offset) = font.descriptors[pos]
                     if prev_char != None:
-                        x += font.kerning[prev_char][pos] + font.gap_width
+                        x += gaugette.font.advance(font, prev_char, pos) + font.gap_width
                     prev_char = pos
                     prev_width = width
-
-                    bytes_per_row = (width + 7) >> 3
-                    for row in range(0, height):
-                        py = y + row
-                        mask = 0x80
-                        p = offset
-                        for col in range(0, width):
-                            px = x + col
-                            if font.bitmaps[p] & mask:
-                                self.draw_pixel(px, py, 1)  # for kerning, never draw black
-                            mask >>= 1
-                            if mask == 0:
-                                mask = 0x80
-                                p += 1
-                        offset += bytes_per_row
+                    # ORed in, for kerning never draw black
+                    glyph = gaugette.monochrome.scaled_font_glyph(font, pos, 1)
+                    gaugette.monochrome.blit(self, glyph, x, y)
 
             if prev_char != None:
                 x += prev_width
 
             return x
 
+    # This is a helper class to pan a bitmap wider than the display
+    # back and forth (or with mode='continuous', round and round) in the
+    # band of rows it occupies starting at <row>.
+    #
+    # mode='software'   (default) each step resends the whole band, which
+    #                   works on every controller.
+    # mode='content'    each step shifts the displayed columns with the
+    #                   controller's content scroll and sends only the one
+    #                   newly exposed column (pages + 10 command bytes).
+    #                   Not all SSD1306 revisions implement it, so it is
+    #                   opt-in.
+    # mode='continuous' the controller scrolls by itself with no transfers
+    #                   at all; the bitmap wraps at the display width, so
+    #                   this suits text that fits on the display.
+    #
+    # width is the number of bitmap columns to pan across, default all.
+    # min_interval is the least time between content scroll steps, step()
+    # waits out any remainder.
+    class Marquee:
+        def __init__(self, ssd1306, bitmap, row=0, width=None, mode='software', min_interval=0.035):
+            self.ssd1306 = ssd1306
+            self.bitmap = bitmap
+            self.row = row
+            self.width = bitmap.cols if width is None else width
+            self.mode = mode
+            self.min_interval = min_interval
+            self.offset = 0
+            self.direction = 1
+            self.last_step = 0
+            self.running = False
+
+        # Sends the whole band at the current offset.
+        def show(self):
+            self.ssd1306.display_block(self.bitmap, self.row, 0, self.ssd1306.cols, self.offset)
+
+        # Moves one column, reversing at either end.  Returns the new offset.
+        def step(self):
+            span = self.width - self.ssd1306.cols
+            if span <= 0:
+                return self.offset
+            if self.offset + self.direction < 0 or self.offset + self.direction > span:
+                self.direction = -self.direction
+            self.offset += self.direction
+            if self.mode == 'content':
+                delay = self.last_step + self.min_interval - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                self.ssd1306.pan_block(self.bitmap, self.row, self.offset, self.direction)
+                self.last_step = time.time()
+            else:
+                self.show()
+            return self.offset
+
+        # Steps until the offset reaches target, pausing delay between steps.
+        def pan_to(self, target, delay=0):
+            target = max(0, min(target, self.width - self.ssd1306.cols))
+            if target != self.offset:
+                self.direction = 1 if target > self.offset else -1
+            while self.offset != target:
+                self.step()
+                if delay > 0:
+                    time.sleep(delay)
+
+        # Starts the controller scrolling the band continuously.
+        def start(self, left=True, frames=2):
+            page_start = self.row >> 3
+            page_end = page_start + (self.bitmap.rows >> 3) - 1
+            self.show()
+            self.ssd1306.start_scroll(page_start, page_end, left, frames)
+            self.running = True
+
+        # Stops continuous scrolling and restores the band.
+        def stop(self):
+            if self.running:
+                self.ssd1306.stop_scroll()
+                self.running = False
+                self.show()
+
     # This is a helper class to display a scrollable list of text lines.
     # The list must have at least 1 item.
+    #
+    # list may be any sequence, or a callable returning the current
+    # sequence.  It is read as items are needed, so it can change
+    # (eg. a playlist growing) without rebuilding the ScrollingList.
+    # Items are rendered only when they are about to be shown, and the
+    # last cache_size rendered items are kept, keyed by their text.
     class ScrollingList:
-        def __init__(self, ssd1306, list, font):
+        def __init__(self, ssd1306, list, font, cache_size=8, pan_mode='software'):
             self.ssd1306 = ssd1306
             self.list = list
             self.font = font
@@ -404,22 +684,48 @@ class SSD1306:
             self.pan_row = -1
             self.pan_offset = 0
             self.pan_direction = 1
-            self.bitmaps = []
+            self.pan_mode = pan_mode # 'content' pans with Marquee style single column updates
+            self.cache = collections.OrderedDict()
+            self.cache_size = cache_size
             self.rows = ssd1306.rows
             self.cols = ssd1306.cols
             self.bufrows = self.rows * 2
-            downset = (self.rows - font.char_height) >> 1
-            for text in list:
-                width = ssd1306.cols
-                text_bitmap = ssd1306.Bitmap(width, self.rows)
-                width = text_bitmap.draw_text(0, downset, text, font)
-                if width > 128:
-                    text_bitmap = ssd1306.Bitmap(width + 15, self.rows)
-                    text_bitmap.draw_text(0, downset, text, font)
-                self.bitmaps.append(text_bitmap)
+            self.downset = (self.rows - font.char_height) >> 1
 
             # display the first word in the first position
-            self.ssd1306.display_block(self.bitmaps[0], 0, 0, self.cols)
+            first = self.item_bitmap(0)
+            self.ssd1306.display_block(first, 0, 0, self.cols)
+            # bitmap held in each half of the display ram, None if unknown
+            self.slots = [first, None]
+
+        def items(self):
+            return self.list() if callable(self.list) else self.list
+
+        # Returns the rendered bitmap for item n, rendering it if needed.
+        # items is the current sequence, read from the list if not given.
+        def item_bitmap(self, n, items=None):
+            if items is None:
+                items = self.items()
+            text = items[n]
+            text_bitmap = self.cache.get(text)
+            if text_bitmap is None:
+                text_bitmap = self.render(text)
+                self.cache[text] = text_bitmap
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            else:
+                self.cache.move_to_end(text)
+            return text_bitmap
+
+        def render(self, text):
+            # measured with the display's own bitmap rather than a new one
+            width = self.ssd1306.text_width(text, self.font)
+            if width > self.cols:
+                text_bitmap = self.ssd1306.Bitmap(width + 15, self.rows)
+            else:
+                text_bitmap = self.ssd1306.Bitmap(self.cols, self.rows)
+            text_bitmap.draw_text(0, self.downset, text, self.font)
+            return text_bitmap
 
         # how many steps to the nearest home position
         def align_offset(self):
@@ -439,26 +745,52 @@ class SSD1306:
                     self.scroll(sign)
             return self.position // self.rows
 
-        # scroll up or down.  Does multiple one-pixel scrolls if delta is not >1 or <-1
+        # scroll up or down by delta pixels.
+        # The start line is sent once at the end rather than for every pixel,
+        # and at each item boundary passed on the way so the hidden half
+        # really is hidden before it is reloaded.
         def scroll(self, delta):
             if delta == 0:
                 return
 
-            count = len(self.list)
+            items = self.items()
+            count = len(items)
             step = (delta > 0) - (delta < 0) # step = 1 or -1
+            max_position = count * self.rows
+            self.position %= max_position # the list may have shrunk
+            moved = False
             for i in range(0, delta, step):
                 if (self.position % self.rows) == 0:
-                    n = self.position // self.rows
-                    # at even boundary, need to update hidden row
-                    m = (n + step + count) % count
-                    row = (self.offset + self.rows) % self.bufrows
-                    self.ssd1306.display_block(self.bitmaps[m], row, 0, self.cols)
-                    if m == self.pan_row:
-                        self.pan_offset = 0
+                    if moved:
+                        self.ssd1306.command(self.ssd1306.SET_START_LINE | self.offset)
+                        moved = False
+                    # at even boundary, need the next item in the hidden half
+                    self.prefetch(step, items)
                 self.offset = (self.offset + self.bufrows + step) % self.bufrows
-                self.ssd1306.command(self.ssd1306.SET_START_LINE | self.offset)
-                max_position = count * self.rows
                 self.position = (self.position + max_position + step) % max_position
+                moved = True
+            self.ssd1306.command(self.ssd1306.SET_START_LINE | self.offset)
+
+        # At a home position, loads the item in direction step (1 or -1)
+        # into the hidden half of the display ram unless it is already there,
+        # so a following scroll starts without a transfer.  items is as
+        # for item_bitmap.
+        def prefetch(self, step, items=None):
+            if (self.position % self.rows) != 0:
+                return
+            if items is None:
+                items = self.items()
+            count = len(items)
+            n = self.position // self.rows
+            m = (n + step + count) % count
+            text_bitmap = self.item_bitmap(m, items)
+            row = (self.offset + self.rows) % self.bufrows
+            slot = row // self.rows
+            if self.slots[slot] is not text_bitmap:
+                self.ssd1306.display_block(text_bitmap, row, 0, self.cols)
+                self.slots[slot] = text_bitmap
+                if m == self.pan_row:
+                    self.pan_offset = 0
 
         # pans the current row back and forth repeatedly.
         # Note that this currently only works if we are at a home position.
@@ -468,9 +800,10 @@ class SSD1306:
                 self.pan_row = n
                 self.pan_offset = 0
 
-            text_bitmap = self.bitmaps[n]
+            text_bitmap = self.item_bitmap(n)
             if text_bitmap.cols > self.cols:
                 row = self.offset # this only works if we are at a home position
+                previous = self.pan_offset
                 if self.pan_direction > 0:
                     if self.pan_offset <= (text_bitmap.cols - self.cols):
                         self.pan_offset += 1
@@ -481,4 +814,10 @@ class SSD1306:
                         self.pan_offset -= 1
                     else:
                         self.pan_direction = 1
-                self.ssd1306.display_block(text_bitmap, row, 0, self.cols, self.pan_offset)
+                step = self.pan_offset - previous
+                if self.pan_mode == 'content' and step != 0:
+                    self.ssd1306.pan_block(text_bitmap, row, self.pan_offset, step)
+                else:
+                    self.ssd1306.display_block(text_bitmap, row, 0, self.cols, self.pan_offset)
+                # a panned item has to be reloaded when it is next shown
+                self.slots[row // self.rows] = None
@@ -25,6 +25,9 @@ import gaugette.gpio
 import gaugette.spi
 import gaugette.platform
 import gaugette.font5x8
+import gaugette.instrumentation
+import gaugette.monochrome
+import struct
 import time
 import sys
 
@@ -72,12 +75,21 @@ class SSD1351:
     SSD1351WIDTH           = 128
     SSD1351HEIGHT           = 128
 
+    # Magnified glyphs kept for draw_text2, per character, size and
+    # colour, and lit pixels of the glyphs kept for draw_text_scaled
+    GLYPH_CACHE_SIZE       = 256
+
+    # Shadow defaults, see enable_shadow.  Setting a window costs 7 bus
+    # bytes, about the same as 4 pixels.
+    SHADOW_TILE            = 8
+    SHADOW_SLACK           = 4
+
     # Device name will be /dev/spidev-{bus}.{device}
     # dc_pin is the data/commmand pin.  This line is HIGH for data, LOW for command.
     # We will keep d/c low and bump it high only for commands with data
     # reset is normally HIGH, and pulled LOW to reset the display
 
-    def __init__(self, bus=0, device=0, dc_pin="P9_15", reset_pin="P9_13", buffer_rows=128, buffer_cols=128, rows=32, cols=128, debug=False):
+    def __init__(self, bus=0, device=0, dc_pin="P9_15", reset_pin="P9_13", buffer_rows=128, buffer_cols=128, rows=32, cols=128, debug=False, gpio=None, spi=None):
         self.cols = cols
         self.rows = rows
         self.debug = debug
@@ -85,9 +97,11 @@ class SSD1351:
         self.mem_bytes = self.buffer_rows * self.cols / 8 # total bytes in SSD1306 display ram
         self.dc_pin = dc_pin
         self.reset_pin = reset_pin
-        self.spi = gaugette.spi.SPI(bus, device)
+        # gpio and spi may be passed in (eg. gaugette.simulator backends),
+        # otherwise the platform backends are created here.
+        self.spi = spi if spi is not None else gaugette.spi.SPI(bus, device)
         self.spi.mode = 3 # necessary!
-        self.gpio = gaugette.gpio.GPIO()
+        self.gpio = gpio if gpio is not None else gaugette.gpio.GPIO()
         self.gpio.setup(self.reset_pin, self.gpio.OUT)
         self.gpio.output(self.reset_pin, self.gpio.HIGH)
         self.gpio.setup(self.dc_pin, self.gpio.OUT)
@@ -96,40 +110,180 @@ class SSD1351:
         self.col_offset = 0
         self.bitmap = self.SimpleBitmap(buffer_cols, buffer_rows, self.debug)
         self.flipped = False
+        self.instrumentation = None
+        self.glyph_cache = {}
+        self.point_cache = {}
+        self.shadow = None
+        self.shadow_tile = None
+        self.shadow_slack = None
+
+    # Opt-in per-frame bus and timing counters, see gaugette.instrumentation.
+    # callback, if given, is called with the FrameStats of each completed frame.
+    def enable_instrumentation(self, callback=None):
+        self.instrumentation = gaugette.instrumentation.Instrumentation(callback)
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        self.instrumentation = None
+
+    # Opt-in shadow of the display ram.  display() then compares the
+    # bitmap with what was last sent and sends only the pixels that
+    # changed.  Rows are compared tile pixels at a time, and within a
+    # changed tile only the changed pixels are kept.  Nearby changes are
+    # sent as one rectangle when that costs at most slack more pixels
+    # than sending them apart.  The first display() after enabling sends
+    # everything.
+    def enable_shadow(self, tile=SHADOW_TILE, slack=SHADOW_SLACK):
+        self.shadow_tile = tile
+        self.shadow_slack = slack
+        self.shadow = None
+
+    def disable_shadow(self):
+        self.shadow_tile = None
+        self.shadow_slack = None
+        self.shadow = None
+
+    # Queues a full display of self.bitmap on the shared SPI bus, see
+    # gaugette.spi.Bus.  Queuing again before it is flushed sends it once.
+    def schedule_display(self):
+        self.spi.bus.schedule(self, self.display)
+
+    def display(self):
+        if self.shadow_tile is None:
+            self.bitmap.display(self)
+            return
+        if self.instrumentation is not None:
+            self.instrumentation.begin_flush()
+        self.display_changes()
+        if self.instrumentation is not None:
+            self.instrumentation.end_flush()
+
+    # Sends the areas of the bitmap that differ from the shadow.
+    def display_changes(self):
+        bitmap = self.bitmap
+        cols = min(bitmap.cols, self.SSD1351WIDTH)
+        rows = min(bitmap.rows, self.SSD1351HEIGHT)
+        if self.shadow is None or len(self.shadow) != bitmap.rows or len(self.shadow[0]) != bitmap.cols:
+            self.shadow = [row[:] for row in bitmap.data]
+            self.send_region(0, 0, cols, rows)
+            return
+        for rect in self.changed_rects(cols, rows):
+            self.send_region(*rect)
+
+    # Rectangles covering the pixels that differ from the shadow.  Each
+    # changed row is split into spans of changed pixels, joined across
+    # gaps of up to slack pixels.  A span then extends a rectangle ending
+    # on the row above if the union costs at most slack extra pixels, so
+    # a block of change becomes one rectangle while a thin diagonal line
+    # becomes a chain of small ones rather than its whole bounding box.
+    def changed_rects(self, cols, rows):
+        tile = self.shadow_tile
+        slack = self.shadow_slack
+        data = self.bitmap.data
+        shadow = self.shadow
+        rects = []
+        above = []
+        for r in range(rows):
+            new = data[r]
+            old = shadow[r]
+            if new == old:
+                above = []
+                continue
+            spans = []
+            for x in range(0, cols, tile):
+                if new[x:x + tile] != old[x:x + tile]:
+                    x0 = x
+                    x1 = min(x + tile, cols)
+                    while new[x0] == old[x0]:
+                        x0 += 1
+                    while new[x1 - 1] == old[x1 - 1]:
+                        x1 -= 1
+                    if spans and x0 - spans[-1][1] <= slack:
+                        spans[-1][1] = x1
+                    else:
+                        spans.append([x0, x1])
+            below = []
+            for (x0, x1) in spans:
+                for rect in above:
+                    (rx, ry, rw, rh) = rect
+                    ux0 = min(rx, x0)
+                    ux1 = max(rx + rw, x1)
+                    if (ux1 - ux0) * (rh + 1) - rw * rh - (x1 - x0) <= slack:
+                        rect[0] = ux0
+                        rect[2] = ux1 - ux0
+                        rect[3] = rh + 1
+                        above.remove(rect)
+                        below.append(rect)
+                        break
+                else:
+                    rect = [x0, r, x1 - x0, 1]
+                    rects.append(rect)
+                    below.append(rect)
+            above = below
+        return [tuple(rect) for rect in rects]
+
+    # Sends the dx x dy rectangle at (x0, y0) of self.bitmap, whose
+    # pixels are held encoded (see encode_color), high byte first.
+    def display_region(self, x0, y0, dx, dy):
+        if self.instrumentation is not None:
+            self.instrumentation.begin_flush()
+        self.send_region(x0, y0, dx, dy)
+        if self.instrumentation is not None:
+            self.instrumentation.end_flush()
+
+    # display_region without ending an instrumentation frame.
+    def send_region(self, x0, y0, dx, dy):
+        x1 = min(x0 + dx, self.bitmap.cols, self.SSD1351WIDTH)
+        y1 = min(y0 + dy, self.bitmap.rows, self.SSD1351HEIGHT)
+        x0 = max(x0, 0)
+        y0 = max(y0, 0)
+        if x1 <= x0 or y1 <= y0:
+            return
+        rows = self.bitmap.data
+        pixels = []
+        for r in range(y0, y1):
+            pixels.extend(rows[r][x0:x1])
+        with self.spi.bus.lock:
+            self.command(self.CMD_SETCOLUMN, [x0, x1 - 1])
+            self.command(self.CMD_SETROW, [y0, y1 - 1])
+            self.command(self.CMD_WRITERAM)
+            self.data(struct.pack('>%dH' % len(pixels), *pixels))
+        if self.shadow is not None:
+            for r in range(y0, y1):
+                self.shadow[r][x0:x1] = rows[r][x0:x1]
 
     def reset(self):
+        self.shadow = None
         self.gpio.output(self.reset_pin, self.gpio.LOW)
         time.sleep(0.010) # 10ms
         self.gpio.output(self.reset_pin, self.gpio.HIGH)
 
+    # The bus lock is held so a command and its arguments are sent as
+    # one transaction, see gaugette.spi.Bus.
     def command(self, cmd, cmddata=None):
         # already low
         #self.gpio.output(self.dc_pin, self.gpio.LOW)
 
-        if type(cmd) == list:
-            self.spi.writebytes(cmd)
-        else:
-            self.spi.writebytes([cmd])
+        if type(cmd) != list:
+            cmd = [cmd]
+        if self.instrumentation is not None:
+            self.instrumentation.command(len(cmd))
 
-        if cmddata != None:
-            if type(cmddata) == list:
-                self.data(cmddata)
-            else:
-                self.data([cmddata])
+        with self.spi.bus.lock:
+            self.spi.writebytes(cmd)
+            if cmddata != None:
+                if type(cmddata) == list:
+                    self.data(cmddata)
+                else:
+                    self.data([cmddata])
 
     def data(self, bytes):
-        self.gpio.output(self.dc_pin, self.gpio.HIGH)
-        #  chunk data to work around 255 byte limitation in adafruit implementation of writebytes
-        # revisit - change to 1024 when Adafruit_BBIO is fixed.
-        max_xfer = 255 if gaugette.platform.isBeagleBoneBlack else 1024
-        start = 0
-        remaining = len(bytes)
-        while remaining>0:
-            count = remaining if remaining <= max_xfer else max_xfer
-            remaining -= count
-            self.spi.writebytes(bytes[start:start+count])
-            start += count
-        self.gpio.output(self.dc_pin, self.gpio.LOW)
+        with self.spi.bus.lock:
+            self.gpio.output(self.dc_pin, self.gpio.HIGH)
+            writes = self.spi.write(bytes)
+            self.gpio.output(self.dc_pin, self.gpio.LOW)
+        if self.instrumentation is not None:
+            self.instrumentation.data(len(bytes), writes)
         
     def begin(self):
         time.sleep(0.001) # 1ms
@@ -182,9 +336,10 @@ class SSD1351:
             return
   
         # set x and y coordinate
-        self.command(self.CMD_SETCOLUMN, [x, self.SSD1351WIDTH-1])
-        self.command(self.CMD_SETROW, [y, self.SSD1351HEIGHT-1])
-        self.command(self.CMD_WRITERAM)
+        with self.spi.bus.lock:
+            self.command(self.CMD_SETCOLUMN, [x, self.SSD1351WIDTH-1])
+            self.command(self.CMD_SETROW, [y, self.SSD1351HEIGHT-1])
+            self.command(self.CMD_WRITERAM)
 
     def scale(self, x, inLow, inHigh, outLow, outHigh):
         return ((x - inLow) / float(inHigh) * outHigh) + outLow
@@ -224,15 +379,16 @@ class SSD1351:
         if x+w > self.SSD1351WIDTH:
             w = self.SSD1351WIDTH - x - 1
 
-        # set location
-        self.command(self.CMD_SETCOLUMN, [x, x+w-1])
-        self.command(self.CMD_SETROW, [y, y-h-1])
-        # fill!
-        self.command(self.CMD_WRITERAM)
-
         fillcolor = self.encode_color(fillcolor)
+        self.shadow = None
 
-        self.data([fillcolor >> 8, fillcolor] * (w*h))
+        with self.spi.bus.lock:
+            # set location
+            self.command(self.CMD_SETCOLUMN, [x, x+w-1])
+            self.command(self.CMD_SETROW, [y, y-h-1])
+            # fill!
+            self.command(self.CMD_WRITERAM)
+            self.data([fillcolor >> 8, fillcolor] * (w*h))
 
     def drawPixel(self, x, y, color):
         if x >= self.SSD1351WIDTH or y >= self.SSD1351HEIGHT:
@@ -242,82 +398,69 @@ class SSD1351:
             return
 
         color = self.encode_color(color)
+        self.shadow = None
 
         # set location
-        self.goTo(x, y)
-        self.data([color >> 8, color])
+        with self.spi.bus.lock:
+            self.goTo(x, y)
+            self.data([color >> 8, color])
 
     def drawBitmap(self, x, y, bitmap):
-        h = len(bitmap)
-        w = len(bitmap[0])
+        self.shadow = None
+        with self.spi.bus.lock:
+            h = len(bitmap)
+            w = len(bitmap[0])
 
-        self.command(self.CMD_SETCOLUMN, [x, w])
-        self.command(self.CMD_SETROW, [y, h])
-        self.command(self.CMD_WRITERAM)
+            self.command(self.CMD_SETCOLUMN, [x, w])
+            self.command(self.CMD_SETROW, [y, h])
+            self.command(self.CMD_WRITERAM)
 
-        pixels = []
+            pixels = []
 
-        for r in range(y, y+h):
-            if len(pixels) + 4*w >= 1024:
-                if self.debug:
-                    print("pixels!", pixels)
-                self.data(pixels)
-                pixels = []
+            for r in range(y, y+h):
+                if len(pixels) + 4*w >= 1024:
+                    if self.debug:
+                        print("pixels!", pixels)
+                    self.data(pixels)
+                    pixels = []
 
-            for x in bitmap[r]:
-                pixels = pixels + [(x >> 8) & 0xFF, x & 0xFF]
+                for x in bitmap[r]:
+                    pixels = pixels + [(x >> 8) & 0xFF, x & 0xFF]
 
-        if self.debug:
-            print("pixels!", pixels)
-        self.data(pixels)
+            if self.debug:
+                print("pixels!", pixels)
+            self.data(pixels)
 
     # Diagnostic print of the memory buffer to stdout 
     def dump_buffer(self):
         self.bitmap.dump()
 
     def draw_text(self, x, y, string, color=0xFFFFFF):
-        font_bytes = self.font.bytes
-        font_rows = self.font.rows
-        font_cols = self.font.cols
-
-        for c in string:
-            p = ord(c) * font_cols
-            for col in range(font_cols):
-                mask = font_bytes[p]
-                p += 1
-                for row in range(8):
-                    if (mask & 1) != 0:
-                        # self.drawPixel(x, y+row, color)
-                        self.bitmap.draw_pixel(x, y+row, self.encode_color(color))
-                    else:
-                        # self.drawPixel(x, y+row, 0)
-                        self.bitmap.draw_pixel(x, y+row, 0)
-                    mask >>= 1
-                x += 1
+        self.draw_text2(x, y, string, color, 1, 0)
 
+    # Each character cell of the 5x8 font is magnified size times and
+    # copied in, lit pixels in color and the rest black.
     def draw_text2(self, x, y, string, color=0xFFFFFF, size=2, space=1):
-        font_bytes = self.font.bytes
-        font_rows = self.font.rows
-        font_cols = self.font.cols
+        encoded = self.encode_color(color)
         for c in string:
-            p = ord(c) * font_cols
-            for col in range(0,font_cols):
-                mask = font_bytes[p]
-                p+=1
-                py = y
-                for row in range(0,8):
-                    for sy in range(0,size):
-                        px = x
-                        for sx in range(0,size):
-                            if mask & 1:
-                                self.bitmap.draw_pixel(px, py, self.encode_color(color))
-                            else:
-                                self.bitmap.draw_pixel(px, py, 0)
-                            px += 1
-                        py += 1
-                    mask >>= 1
-                x += size
-            x += space
+            rows = self.glyph_rows(ord(c), size, encoded)
+            self.bitmap.draw_rows(x, y, rows)
+            x += len(rows[0]) + space
+
+    # The rows of pixel values of a magnified glyph in one colour, built
+    # from gaugette.monochrome.scaled_glyph and cached.
+    def glyph_rows(self, code, size, encoded):
+        key = (code, size, encoded)
+        rows = self.glyph_cache.get(key)
+        if rows is None:
+            if len(self.glyph_cache) >= self.GLYPH_CACHE_SIZE:
+                self.glyph_cache.clear()
+            glyph = gaugette.monochrome.scaled_glyph(self.font, code, size)
+            rows = [[0] * glyph.cols for r in range(glyph.rows)]
+            for (px, py) in gaugette.monochrome.lit_pixels(glyph):
+                rows[py][px] = encoded
+            self.glyph_cache[key] = rows
+        return rows
 
     def clear_block(self, x0,y0,dx,dy):
         self.bitmap.clear_block(x0,y0,dx,dy)
@@ -328,6 +471,30 @@ class SSD1351:
     def text_width(self, string, font):
         return self.bitmap.text_width(string, font)
 
+    # Draws text in a proportional font from gaugette.fonts scaled by any
+    # factor, eg. 1.5.  Only the lit pixels are drawn.
+    def draw_text_scaled(self, x, y, string, font, scale, color=0xFFFFFF):
+        encoded = self.encode_color(color)
+        bitmap = self.bitmap
+
+        def draw(glyph, gx, gy):
+            for (px, py) in self.glyph_points(glyph):
+                bitmap.draw_pixel(gx + px, gy + py, encoded)
+        return gaugette.monochrome.draw_text_scaled(None, x, y, string, font, scale, draw)
+
+    # The lit pixels of a scaled glyph from gaugette.monochrome, found
+    # once per glyph and cached.
+    def glyph_points(self, glyph):
+        points = self.point_cache.get(glyph)
+        if points is None:
+            if len(self.point_cache) >= self.GLYPH_CACHE_SIZE:
+                self.point_cache.clear()
+            points = self.point_cache[glyph] = gaugette.monochrome.lit_pixels(glyph)
+        return points
+
+    def text_width_scaled(self, string, font, scale):
+        return gaugette.monochrome.text_width_scaled(string, font, scale)
+
     class SimpleBitmap:
         def __init__(self, cols, rows, debug):
             self.rows = rows
@@ -360,7 +527,26 @@ class SSD1351:
                 for y in range(y0,y0+dy):
                     self.draw_pixel(x,y,0)
 
+        # Copies rows of pixel values in with their top left at (x, y).
+        def draw_rows(self, x, y, rows):
+            width = len(rows[0])
+            x0 = max(x, 0)
+            x1 = min(x + width, self.cols)
+            if x1 <= x0:
+                return
+            for r in range(max(y, 0), min(y + len(rows), self.rows)):
+                self.data[r][x0:x1] = rows[r - y][x0 - x:x1 - x]
+
         def display(self, ssd1351):
+            ssd1351.shadow = None
+            if ssd1351.instrumentation is not None:
+                ssd1351.instrumentation.begin_flush()
+            with ssd1351.spi.bus.lock:
+                self.display_data(ssd1351)
+            if ssd1351.instrumentation is not None:
+                ssd1351.instrumentation.end_flush()
+
+        def display_data(self, ssd1351):
             ssd1351.command(ssd1351.CMD_SETCOLUMN, [0, ssd1351.SSD1351WIDTH])
             ssd1351.command(ssd1351.CMD_SETROW, [0, ssd1351.SSD1351HEIGHT])
             ssd1351.command(ssd1351.CMD_WRITERAM)
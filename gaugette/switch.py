@@ -1,27 +1,36 @@
-import wiringpi
-
 class Switch:
 
     def __init__(self, gpio, pin, pull_up=True):
         self.gpio = gpio
         self.pin = pin
-        self.gpio = wiringpi.GPIO(wiringpi.GPIO.WPI_MODE_PINS)
-        self.gpio.pinMode(self.pin, self.gpio.INPUT)
-        if self.pullUp:
-            self.gpio.pullUpDnControl(self.pin, self.gpio.PUD_UP)
-        else:
-            self.gpio.pullUpDnControl(self.pin, self.gpio.PUD_DOWN)
         self.pull_up = pull_up
         pull_up_mode = gpio.PUD_UP if pull_up else gpio.PUD_DOWN
         self.gpio.setup(self.pin, self.gpio.IN, pull_up_mode)
 
     def get_state(self):
         state = self.gpio.input(self.pin)
+        return self.to_state(state)
+
+    def to_state(self, level):
         if self.pull_up:
             # If we are pulling up and switching
             # to ground, state will be 1 when the switch is open, and 0
             # when it is closed.  We invert the value here to a more
             # conventional representation of 0:open, 1:closed.
-            return 1-state
+            return 1-level
+        else:
+            return level
+
+    # Calls callback(state) from the interrupt thread whenever the switch
+    # changes.  With batched edge events (see gaugette.gpiochip) every
+    # edge is reported with the level it switched to.
+    def start(self, callback):
+        if hasattr(self.gpio, 'watch'):
+            def handler(events):
+                for channel, level, timestamp in events:
+                    callback(self.to_state(level))
+            self.gpio.watch([self.pin], self.gpio.EDGE_BOTH, handler)
         else:
-            return state
+            def isr():
+                callback(self.get_state())
+            self.gpio.trigger(self.pin, self.gpio.EDGE_BOTH, isr)
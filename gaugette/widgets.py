@@ -0,0 +1,463 @@
+#----------------------------------------------------------------------
+# widgets.py from https://github.com/guyc/py-gaugette
+#
+# Retained-mode gauge widgets for the SSD1306, SH1106 and SSD1351.
+#
+# A Scene holds widgets placed at fixed rectangles on a display.  Setting
+# a widget's value marks it dirty only if what it draws would change (a
+# bar whose fill moves by less than a pixel, or a readout whose formatted
+# text is the same, is left alone).  Scene.flush() redraws the dirty
+# widgets, plus any widgets stacked over the same area, into the
+# display's bitmap and sends only the dirty rectangles, merged where one
+# larger transfer is cheaper than several small ones.
+#
+# Usage:
+#
+#     from gaugette.fonts import arial_16
+#     scene = gaugette.widgets.Scene(led)
+#     rpm = scene.add(gaugette.widgets.Gauge(0, 0, 64, 64, 0, 8000))
+#     temp = scene.add(gaugette.widgets.Readout(64, 0, 64, 16, arial_16, '%.1f'))
+#     fuel = scene.add(gaugette.widgets.Bar(64, 24, 64, 8, 0, 100))
+#     while True:
+#         rpm.set(read_rpm())
+#         temp.set(read_temp())
+#         fuel.set(read_fuel())
+#         scene.flush()
+#
+# Colours are 0xRRGGBB integers.  On the monochrome displays any
+# non-zero colour is drawn as lit.  Coordinates are in the display's
+# bitmap.
+#----------------------------------------------------------------------
+
+import collections
+import math
+import gaugette.monochrome
+import gaugette.regions
+import gaugette.ssd1306
+
+WHITE = 0xFFFFFF
+BLACK = 0x000000
+
+#----------------------------------------------------------------------
+# Surfaces adapt the drawing primitives the widgets need to the bitmap
+# of each kind of display.
+#----------------------------------------------------------------------
+
+class Surface:
+
+    # bitmap defaults to the device's own; pass one to draw off-screen.
+    def __init__(self, device, bitmap=None):
+        self.device = device
+        self.bitmap = device.bitmap if bitmap is None else bitmap
+        # scratch bitmap for measuring and rendering text
+        self.scratch = gaugette.ssd1306.SSD1306.Bitmap(8, 8)
+
+    def text_width(self, text, font):
+        return self.scratch.text_width(text, font)
+
+    # Bresenham line from (x0, y0) to (x1, y1) inclusive.
+    def draw_line(self, x0, y0, x1, y1, color=WHITE):
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True:
+            self.draw_pixel(x0, y0, color)
+            if x0 == x1 and y0 == y1:
+                return
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    def draw_frame(self, x, y, w, h, color=WHITE):
+        if w <= 0 or h <= 0:
+            return
+        self.fill_rect(x, y, w, 1, color)
+        self.fill_rect(x, y + h - 1, w, 1, color)
+        self.fill_rect(x, y + 1, 1, h - 2, color)
+        self.fill_rect(x + w - 1, y + 1, 1, h - 2, color)
+
+    # Sends rects as one instrumentation frame.
+    def flush(self, rects):
+        instrumentation = self.device.instrumentation
+        if instrumentation is not None:
+            instrumentation.begin_flush()
+        for (x, y, w, h) in rects:
+            self.device.send_region(x, y, w, h)
+        if instrumentation is not None:
+            instrumentation.end_flush()
+
+
+class MonochromeSurface(Surface):
+
+    # Sending 16 extra bytes is cheaper than another address window.
+    slack = 128
+
+    def align(self, rect):
+        return gaugette.regions.align_pages(rect)
+
+    def draw_pixel(self, x, y, color=WHITE):
+        self.bitmap.draw_pixel(x, y, bool(color))
+
+    def fill_rect(self, x, y, w, h, color=WHITE):
+        self.bitmap.fill_rect(x, y, w, h, bool(color))
+
+    # ORs the lit pixels of part of a monochrome sprite onto the bitmap.
+    def blit(self, sprite, x, y, sx=0, sy=0, w=None, h=None, color=WHITE):
+        self.bitmap.blit(sprite, x, y, sx, sy, w, h)
+
+    # Text is always drawn lit, over whatever is underneath.
+    def draw_text(self, x, y, text, font, color=WHITE):
+        return self.bitmap.draw_text(x, y, text, font)
+
+
+class ColorSurface(Surface):
+
+    # Pixels are 2 bytes, a window setup is about 8.
+    slack = 4
+
+    def __init__(self, device, bitmap=None):
+        Surface.__init__(self, device, bitmap)
+        self.colors = {}
+        self.points = {}
+
+    def align(self, rect):
+        return rect
+
+    def encode(self, color):
+        encoded = self.colors.get(color)
+        if encoded is None:
+            encoded = self.colors[color] = self.device.encode_color(color)
+        return encoded
+
+    def draw_pixel(self, x, y, color=WHITE):
+        self.bitmap.draw_pixel(x, y, self.encode(color))
+
+    def fill_rect(self, x, y, w, h, color=WHITE):
+        clipped = gaugette.monochrome.clip(x, y, w, h, self.bitmap.cols, self.bitmap.rows)
+        if clipped is None:
+            return
+        (x0, y0, x1, y1) = clipped
+        run = [self.encode(color)] * (x1 - x0)
+        for row in self.bitmap.data[y0:y1]:
+            row[x0:x1] = run
+
+    # The lit pixels of a monochrome sprite, found once per sprite.
+    def sprite_points(self, sprite):
+        points = self.points.get(sprite)
+        if points is None:
+            points = self.points[sprite] = gaugette.monochrome.lit_pixels(sprite)
+        return points
+
+    # Draws the lit pixels of part of a monochrome sprite in colour, at a
+    # cost proportional to the number of lit pixels.
+    def blit(self, sprite, x, y, sx=0, sy=0, w=None, h=None, color=WHITE):
+        if w is None:
+            w = sprite.cols - sx
+        if h is None:
+            h = sprite.rows - sy
+        encoded = self.encode(color)
+        rows = self.bitmap.data
+        cols = self.bitmap.cols
+        height = self.bitmap.rows
+        for (px, py) in self.sprite_points(sprite):
+            if sx <= px < sx + w and sy <= py < sy + h:
+                tx = x + px - sx
+                ty = y + py - sy
+                if 0 <= tx < cols and 0 <= ty < height:
+                    rows[ty][tx] = encoded
+
+    # The text is rendered into a monochrome scratch bitmap first and its
+    # lit pixels are copied across in colour.
+    def draw_text(self, x, y, text, font, color=WHITE):
+        width = self.text_width(text, font)
+        if width <= 0:
+            return x
+        scratch = gaugette.ssd1306.SSD1306.Bitmap(width, (font.char_height + 7) & ~7)
+        scratch.draw_text(0, 0, text, font)
+        pages = scratch.bytes_per_col
+        for col in range(width):
+            strip = scratch.data[col * pages:(col + 1) * pages]
+            for page in range(pages):
+                bits = strip[page]
+                row = page << 3
+                while bits:
+                    if bits & 1:
+                        self.draw_pixel(x + col, y + row, color)
+                    bits >>= 1
+                    row += 1
+        return x + width
+
+
+def surface_for(device):
+    if hasattr(device.bitmap, 'page_slice'):
+        return MonochromeSurface(device)
+    return ColorSurface(device)
+
+#----------------------------------------------------------------------
+# Scene
+#----------------------------------------------------------------------
+
+class Scene:
+
+    # background is the colour dirty areas are cleared to before widgets
+    # are redrawn.  slack overrides the surface's merge threshold, see
+    # gaugette.regions.merge.
+    def __init__(self, device, background=BLACK, slack=None):
+        self.device = device
+        self.surface = surface_for(device)
+        self.background = background
+        self.slack = self.surface.slack if slack is None else slack
+        self.widgets = []
+        self.damage = []
+
+    # Adds a widget on top of those already added and returns it.
+    def add(self, widget):
+        widget.scene = self
+        self.widgets.append(widget)
+        widget.invalidate()
+        return widget
+
+    def remove(self, widget):
+        self.widgets.remove(widget)
+        widget.scene = None
+        self.damage.append(widget.bbox)
+
+    # Marks every widget for redrawing, eg. after clear_display().
+    def invalidate(self):
+        for widget in self.widgets:
+            widget.invalidate()
+
+    # Redraws dirty widgets into the bitmap, along with any widgets that
+    # overlap them.  Returns the rectangles that changed.
+    def render(self):
+        rects = self.damage + [w.dirty_rect for w in self.widgets if w.dirty]
+        self.damage = []
+        if not rects:
+            return rects
+        for (x, y, w, h) in rects:
+            self.surface.fill_rect(x, y, w, h, self.background)
+        for widget in self.widgets:
+            if widget.dirty or any(gaugette.regions.intersects(widget.bbox, r) for r in rects):
+                widget.draw(self.surface)
+                widget.dirty = False
+                widget.dirty_rect = None
+        return rects
+
+    # Renders and sends the changed rectangles.  Returns those sent.
+    def flush(self):
+        rects = [self.surface.align(r) for r in self.render()]
+        rects = gaugette.regions.merge(rects, self.slack)
+        if rects:
+            with self.device.spi.bus.lock:
+                self.surface.flush(rects)
+        return rects
+
+    # Queues flush() on the shared SPI bus, see gaugette.spi.Bus.
+    def schedule_flush(self):
+        self.device.spi.bus.schedule(self, self.flush)
+
+#----------------------------------------------------------------------
+# Widgets
+#
+# Each widget draws itself inside its bounding box (x, y, w, h).
+# state() returns whatever determines its appearance; set() only marks
+# the widget dirty if the state changes, and then only the area given
+# by changed_rect(), the whole box unless a widget knows better.
+#----------------------------------------------------------------------
+
+class Widget:
+
+    def __init__(self, x, y, w, h, value=None, color=WHITE):
+        self.bbox = (x, y, w, h)
+        self.value = value
+        self.color = color
+        self.scene = None
+        self.dirty = False
+        self.dirty_rect = None
+
+    def state(self):
+        return self.value
+
+    def set(self, value):
+        previous = self.state()
+        self.value = value
+        if self.state() != previous:
+            self.invalidate(self.changed_rect(previous))
+
+    # The area to redraw after the state changed from previous.
+    def changed_rect(self, previous):
+        return self.bbox
+
+    def invalidate(self, rect=None):
+        if rect is None:
+            rect = self.bbox
+        if self.dirty_rect is not None:
+            rect = gaugette.regions.union(self.dirty_rect, rect)
+        self.dirty_rect = rect
+        self.dirty = True
+
+    def draw(self, surface):
+        pass
+
+
+class Label(Widget):
+
+    # align is 'left', 'right' or 'center' within the box.
+    def __init__(self, x, y, w, h, font, text='', color=WHITE, align='left'):
+        Widget.__init__(self, x, y, w, h, text, color)
+        self.font = font
+        self.align = align
+
+    def text(self):
+        return self.value
+
+    def state(self):
+        return self.text()
+
+    def draw(self, surface):
+        (x, y, w, h) = self.bbox
+        text = self.text()
+        if self.align != 'left':
+            spare = w - surface.text_width(text, self.font)
+            x += spare if self.align == 'right' else spare // 2
+        surface.draw_text(x, y, text, self.font, self.color)
+
+
+class Readout(Label):
+
+    # format is a % format for the value, eg. '%5.1f'.
+    def __init__(self, x, y, w, h, font, format='%d', value=0, color=WHITE, align='right'):
+        Label.__init__(self, x, y, w, h, font, value, color, align)
+        self.format = format
+
+    def text(self):
+        return self.format % self.value
+
+
+class Bar(Widget):
+
+    # A bar graph filling from the left, or from the bottom if vertical.
+    def __init__(self, x, y, w, h, minimum=0, maximum=100, value=0, color=WHITE, vertical=False, frame=True):
+        Widget.__init__(self, x, y, w, h, value, color)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.vertical = vertical
+        self.frame = frame
+
+    # the filled length in pixels
+    def state(self):
+        (x, y, w, h) = self.bbox
+        inset = 2 if self.frame else 0
+        span = (h if self.vertical else w) - 2 * inset
+        fraction = (self.value - self.minimum) / (float(self.maximum - self.minimum) or 1.0)
+        return int(round(max(0.0, min(1.0, fraction)) * span))
+
+    def draw(self, surface):
+        (x, y, w, h) = self.bbox
+        length = self.state()
+        if self.frame:
+            surface.draw_frame(x, y, w, h, self.color)
+            x += 2
+            y += 2
+            w -= 4
+            h -= 4
+        if self.vertical:
+            surface.fill_rect(x, y + h - length, w, length, self.color)
+        else:
+            surface.fill_rect(x, y, length, h, self.color)
+
+
+class Gauge(Widget):
+
+    # A dial with a needle.  Angles are in degrees anticlockwise from 3
+    # o'clock; the default sweeps clockwise from 7:30 to 4:30 like a
+    # speedometer.  The needle pivots at the centre of the box.
+    def __init__(self, x, y, w, h, minimum=0, maximum=100, value=0, color=WHITE,
+                 start_angle=225, end_angle=-45, ticks=9):
+        Widget.__init__(self, x, y, w, h, value, color)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.start_angle = start_angle
+        self.end_angle = end_angle
+        self.cx = x + (w - 1) // 2
+        self.cy = y + (h - 1) // 2
+        self.radius = (min(w, h) - 1) // 2
+        self.needle = self.radius - 3
+        # the scale is fixed, so compute its pixels once
+        self.scale = []
+        for i in range(ticks):
+            angle = start_angle + (end_angle - start_angle) * i / float(max(ticks - 1, 1))
+            self.scale.append((self.point(angle, self.radius), self.point(angle, self.radius - 2)))
+
+    def point(self, angle, radius):
+        radians = math.radians(angle)
+        return (self.cx + int(round(radius * math.cos(radians))),
+                self.cy - int(round(radius * math.sin(radians))))
+
+    def angle(self):
+        fraction = (self.value - self.minimum) / (float(self.maximum - self.minimum) or 1.0)
+        fraction = max(0.0, min(1.0, fraction))
+        return self.start_angle + (self.end_angle - self.start_angle) * fraction
+
+    # the needle tip position
+    def state(self):
+        return self.point(self.angle(), self.needle)
+
+    # Only the boxes swept by the old and new needles need redrawing.
+    def changed_rect(self, previous):
+        rect = (self.cx - 1, self.cy - 1, 3, 3)
+        for (tx, ty) in (previous, self.state()):
+            x0 = min(self.cx, tx)
+            y0 = min(self.cy, ty)
+            rect = gaugette.regions.union(rect, (x0, y0, abs(tx - self.cx) + 1, abs(ty - self.cy) + 1))
+        return rect
+
+    def draw(self, surface):
+        for (outer, inner) in self.scale:
+            surface.draw_line(outer[0], outer[1], inner[0], inner[1], self.color)
+        (tx, ty) = self.state()
+        surface.draw_line(self.cx, self.cy, tx, ty, self.color)
+        surface.fill_rect(self.cx - 1, self.cy - 1, 3, 3, self.color)
+
+
+class Sparkline(Widget):
+
+    # A line plot of the last w values.  The vertical range is fixed if
+    # minimum and maximum are given, otherwise it follows the data.
+    def __init__(self, x, y, w, h, minimum=None, maximum=None, color=WHITE):
+        Widget.__init__(self, x, y, w, h, collections.deque(maxlen=w), color)
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def state(self):
+        return tuple(self.value)
+
+    def set(self, value):
+        self.push(value)
+
+    def push(self, value):
+        self.value.append(value)
+        self.invalidate()
+
+    def draw(self, surface):
+        if not self.value:
+            return
+        (x, y, w, h) = self.bbox
+        low = min(self.value) if self.minimum is None else self.minimum
+        high = max(self.value) if self.maximum is None else self.maximum
+        span = float(high - low) or 1.0
+        previous = None
+        for i, value in enumerate(self.value):
+            fraction = max(0.0, min(1.0, (value - low) / span))
+            point = (x + i, y + h - 1 - int(round(fraction * (h - 1))))
+            if previous is None:
+                surface.draw_pixel(point[0], point[1], self.color)
+            else:
+                surface.draw_line(previous[0], previous[1], point[0], point[1], self.color)
+            previous = point
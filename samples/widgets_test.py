@@ -0,0 +1,44 @@
+#!/usr/bin/python3
+
+import gaugette.ssd1306
+import gaugette.platform
+import gaugette.gpio
+import gaugette.spi
+import gaugette.widgets
+import math
+import time
+from gaugette.fonts import arial_16
+
+ROWS = 64
+
+if gaugette.platform.isRaspberryPi:
+    RESET_PIN = 15
+    DC_PIN    = 16
+else:  # beagebone
+    RESET_PIN = "P9_15"
+    DC_PIN    = "P9_13"
+
+gpio = gaugette.gpio.GPIO()
+spi = gaugette.spi.SPI(bus=0, device=0)
+led = gaugette.ssd1306.SSD1306(gpio, spi, reset_pin=RESET_PIN, dc_pin=DC_PIN, rows=ROWS, cols=128)
+led.begin()
+led.clear_display()
+led.display()
+
+scene = gaugette.widgets.Scene(led)
+dial = scene.add(gaugette.widgets.Gauge(0, 0, 64, 64, 0, 100))
+readout = scene.add(gaugette.widgets.Readout(64, 0, 64, 16, arial_16, '%.1f'))
+bar = scene.add(gaugette.widgets.Bar(64, 24, 64, 8, 0, 100))
+spark = scene.add(gaugette.widgets.Sparkline(64, 40, 64, 24, 0, 100))
+
+# each value changes at its own rate; only what changes is sent
+start = time.time()
+while True:
+    t = time.time() - start
+    dial.set(50 + 50 * math.sin(t))
+    readout.set(50 + 50 * math.sin(t / 3))
+    bar.set(50 + 50 * math.sin(t / 7))
+    if int(t * 4) != int((t - 0.02) * 4):
+        spark.push(50 + 50 * math.sin(t * 2))
+    scene.flush()
+    time.sleep(0.02)